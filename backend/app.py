@@ -15,6 +15,8 @@ from routes.event_discovery_routes import event_discovery_bp
 from routes.roles_routes import role_bp
 from routes.content_creation_routes import content_creation_bp
 from routes.dashboard_routes import dashboard_bp
+from routes.job_routes import job_bp
+from routes.ops_routes import ops_bp
 
 app = Flask(__name__)
 
@@ -69,6 +71,8 @@ app.register_blueprint(event_discovery_bp, url_prefix="/api/discovery")
 app.register_blueprint(role_bp, url_prefix="/api/roles")
 app.register_blueprint(email_validator_bp)
 app.register_blueprint(dashboard_bp, url_prefix="/api/dashboard")
+app.register_blueprint(job_bp, url_prefix="/api/jobs")
+app.register_blueprint(ops_bp, url_prefix="/api/admin")
 
 # 🏠 Health check / Home route
 @app.route("/", methods=["GET"])
@@ -2,13 +2,19 @@ import sqlite3
 import hashlib
 import os
 import secrets
+import json
+import base64
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from services.domain_cache import TTLCache
+
+RECIPIENT_COUNT_TTL_SECONDS = int(os.getenv("RECIPIENT_COUNT_TTL_SECONDS", 60))
 
 class Database:
     def __init__(self):
         load_dotenv()
         self.db_path = os.getenv("DB_PATH", "email_sender.db")
+        self.recipient_counts = TTLCache(1000, RECIPIENT_COUNT_TTL_SECONDS)
         self.create_database_and_tables()
 
     def get_connection(self):
@@ -217,7 +223,8 @@ class Database:
                     ('last_checked', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'),
                     ('created_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'),
                     ('updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'),
-                    ('classification_reason', 'TEXT')  # ADDED THIS COLUMN
+                    ('classification_reason', 'TEXT'),  # ADDED THIS COLUMN
+                    ('added_to_zoho', 'INTEGER DEFAULT 0')
                 ]
                 
                 for column_name, column_type in email_tracking_columns:
@@ -647,6 +654,24 @@ class Database:
                 )
             """)
             
+            # Background jobs for long-running scrape/lead/upload requests
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS background_jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id INTEGER,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    http_status INTEGER,
+                    error TEXT,
+                    created_at TIMESTAMP,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_background_jobs_user ON background_jobs(user_id, created_at)")
+            
             connection.commit()
             print("Database and tables created successfully!")
             
@@ -1425,6 +1450,29 @@ class Database:
                     )
                 """)
                 
+                # Recipient pages filtered by sender seek on this index
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_tracking_campaign_sender ON email_tracking(campaign_id, sender_email, recipient_email)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_sent_emails_campaign_recipient ON sent_emails(campaign_id, recipient_email)")
+                
+                # sender_email is written at send time now; fill it in for rows tracked before that
+                cursor.execute("""
+                    UPDATE email_tracking
+                    SET sender_email = (
+                        SELECT se.sender_email FROM sent_emails se
+                        WHERE se.campaign_id = email_tracking.campaign_id
+                          AND se.recipient_email = email_tracking.recipient_email
+                        ORDER BY se.rowid DESC LIMIT 1
+                    )
+                    WHERE sender_email IS NULL
+                      AND EXISTS (
+                        SELECT 1 FROM sent_emails se
+                        WHERE se.campaign_id = email_tracking.campaign_id
+                          AND se.recipient_email = email_tracking.recipient_email
+                      )
+                """)
+                if cursor.rowcount > 0:
+                    print(f"Backfilled sender_email on {cursor.rowcount} email_tracking row(s)")
+                
                 connection.commit()
                 print("Email tracking table created successfully!")
                 
@@ -1450,11 +1498,12 @@ class Database:
                 existing = cursor.fetchone()
                 
                 if existing:
+                    # Rows created before sending ('ready') get their sender now
                     cursor.execute("""
                         UPDATE email_tracking 
-                        SET status = ?, updated_at = ?, last_checked = ?
+                        SET status = ?, updated_at = ?, last_checked = ?, sender_email = COALESCE(?, sender_email)
                         WHERE campaign_id = ? AND recipient_email = ?
-                    """, (status, current_time, current_time, campaign_id, recipient_email))
+                    """, (status, current_time, current_time, sender_email, campaign_id, recipient_email))
                 else:
                     cursor.execute("""
                         INSERT INTO email_tracking 
@@ -1509,6 +1558,32 @@ class Database:
                 if connection:
                     connection.close()
     
+    def mark_added_to_zoho(self, tracking_ids=(), campaign_recipients=()):
+        """Flag tracking rows whose lead reached Zoho CRM, by id or (campaign_id, recipient_email)"""
+        if not tracking_ids and not campaign_recipients:
+            return True
+        connection = self.get_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                cursor.executemany(
+                    "UPDATE email_tracking SET added_to_zoho = 1 WHERE id = ?",
+                    [(tracking_id,) for tracking_id in tracking_ids]
+                )
+                cursor.executemany(
+                    "UPDATE email_tracking SET added_to_zoho = 1 WHERE campaign_id = ? AND recipient_email = ?",
+                    list(campaign_recipients)
+                )
+                connection.commit()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error marking leads as added to Zoho: {e}")
+                return False
+            finally:
+                if connection:
+                    connection.close()
+        return False
+    
     def insert_reply_record(self, user_id, tracking_id, recipient_email, recipient_name, reply_subject, reply_message, reply_time):
         """Insert a new reply record into replied_users table"""
         connection = self.get_connection()
@@ -2917,61 +2992,87 @@ class Database:
             if connection:
                 connection.close()
 
-    def get_paginated_recipients(self, campaign_id, sender_email=None, page=1, page_size=10):
-        """Get paginated recipients for a campaign or specific sender account"""
-        connection = self.get_connection()
-        if not connection:
-            return {"recipients": [], "totalCount": 0}
-            
+    def _recipients_query(self, campaign_id, sender_email=None, after=None):
+        """SELECT for a campaign's recipients (optionally one sender's), in (recipient_email, id) order"""
+        data_query = """
+            SELECT 
+                id,
+                recipient_email, 
+                recipient_name, 
+                status, 
+                sent_time, 
+                reply_message, 
+                reply_time,
+                sender_email
+            FROM email_tracking
+            WHERE campaign_id = ?
+        """
+        params = [campaign_id]
+        if sender_email:
+            data_query += " AND sender_email = ?"
+            params.append(sender_email)
+        if after:
+            data_query += " AND (recipient_email, id) > (?, ?)"
+            params.extend(after)
+        data_query += " ORDER BY recipient_email, id"
+        return data_query, params
+
+    @staticmethod
+    def encode_recipient_cursor(row):
+        raw = json.dumps([row["recipient_email"], row["id"]]).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    @staticmethod
+    def decode_recipient_cursor(cursor_value):
+        """(recipient_email, id) from a nextCursor value; ValueError if it is malformed"""
         try:
-            cursor = connection.cursor()
-            offset = (page - 1) * page_size
-            
-            # Count total
+            recipient_email, row_id = json.loads(base64.urlsafe_b64decode(cursor_value.encode("ascii")))
+            return str(recipient_email), int(row_id)
+        except (TypeError, ValueError, UnicodeEncodeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor_value}") from e
+
+    def count_recipients(self, cursor, campaign_id, sender_email=None):
+        """Recipient total, cached for RECIPIENT_COUNT_TTL_SECONDS so paging a large campaign counts once"""
+        key = f"{campaign_id}|{sender_email or ''}"
+        total = self.recipient_counts.get(key)
+        if total is None:
             count_query = "SELECT COUNT(*) FROM email_tracking WHERE campaign_id = ?"
             params = [campaign_id]
-            
             if sender_email:
-                count_query += " AND (sender_email = ? OR (sender_email IS NULL AND campaign_id IN (SELECT DISTINCT campaign_id FROM sent_emails WHERE sender_email = ?)))"
-                params.append(sender_email)
+                count_query += " AND sender_email = ?"
                 params.append(sender_email)
-                
             cursor.execute(count_query, tuple(params))
-            total_count = cursor.fetchone()[0]
+            total = cursor.fetchone()[0]
+            self.recipient_counts.set(key, total)
+        return total
+
+    def get_paginated_recipients(self, campaign_id, sender_email=None, page=1, page_size=10, after=None):
+        """Get paginated recipients for a campaign or specific sender account
+
+        ``after`` is the previous page's nextCursor; it seeks straight to the
+        next (recipient_email, id) instead of skipping rows with OFFSET.
+        ``page`` still works for callers that jump to a page number.
+        """
+        connection = self.get_connection()
+        if not connection:
+            return {"recipients": [], "totalCount": 0}
             
-            # Fetch recipients
-            data_query = """
-                SELECT 
-                    recipient_email, 
-                    recipient_name, 
-                    status, 
-                    sent_time, 
-                    reply_message, 
-                    reply_time,
-                    COALESCE(
-                        sender_email,
-                        (
-                            SELECT se.sender_email 
-                            FROM sent_emails se 
-                            WHERE se.campaign_id = email_tracking.campaign_id 
-                              AND se.recipient_email = email_tracking.recipient_email
-                            ORDER BY se.rowid DESC 
-                            LIMIT 1
-                        )
-                    ) AS sender_email
-                FROM email_tracking
-                WHERE campaign_id = ?
-            """
-            if sender_email:
-                data_query += " AND (sender_email = ? OR (sender_email IS NULL AND campaign_id IN (SELECT DISTINCT campaign_id FROM sent_emails WHERE sender_email = ?)))"
-                
-            data_query += " ORDER BY recipient_email LIMIT ? OFFSET ?"
+        try:
+            cursor = connection.cursor()
+            total_count = self.count_recipients(cursor, campaign_id, sender_email)
             
-            data_params = list(params)
-            data_params.extend([page_size, offset])
+            # One extra row tells whether there is a next page
+            data_query, data_params = self._recipients_query(campaign_id, sender_email, after)
+            data_query += " LIMIT ?"
+            data_params.append(page_size + 1)
+            if not after:
+                data_query += " OFFSET ?"
+                data_params.append((page - 1) * page_size)
             
             cursor.execute(data_query, tuple(data_params))
             rows = cursor.fetchall()
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
             
             recipients = [dict(row) for row in rows]
             
@@ -2979,7 +3080,9 @@ class Database:
                 "recipients": recipients,
                 "totalCount": total_count,
                 "pageSize": page_size,
-                "currentPage": page
+                "currentPage": None if after else page,
+                "hasMore": has_more,
+                "nextCursor": self.encode_recipient_cursor(rows[-1]) if has_more else None
             }
         except sqlite3.Error as e:
             print(f"Error in get_paginated_recipients: {e}")
@@ -2988,6 +3091,26 @@ class Database:
             if connection:
                 connection.close()
     
+    def iter_recipients(self, campaign_id, sender_email=None, batch_size=500):
+        """Yield a campaign's recipients as dicts, reading the cursor batch_size rows at a time"""
+        connection = self.get_connection()
+        if not connection:
+            return
+        try:
+            cursor = connection.cursor()
+            data_query, params = self._recipients_query(campaign_id, sender_email)
+            cursor.execute(data_query, tuple(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        except sqlite3.Error as e:
+            print(f"Error in iter_recipients: {e}")
+        finally:
+            connection.close()
+    
     def get_recipient_replies(self, campaign_id, recipient_email):
         """Get all replies from a specific recipient for a campaign"""
         connection = self.get_connection()
@@ -3088,5 +3211,84 @@ class Database:
                 connection.close()
 
 
+    def save_background_job(self, job):
+        """Insert or replace a background job row"""
+        connection = self.get_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                cursor.execute("""
+                    INSERT OR REPLACE INTO background_jobs
+                    (id, user_id, kind, status, progress, result, http_status, error, created_at, started_at, finished_at)
+                    VALUES (:id, :user_id, :kind, :status, :progress, :result, :http_status, :error, :created_at, :started_at, :finished_at)
+                """, job)
+                connection.commit()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error saving background job: {e}")
+                return False
+            finally:
+                if connection:
+                    connection.close()
+        return False
+
+    def get_background_job(self, job_id):
+        connection = self.get_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                cursor.execute("SELECT * FROM background_jobs WHERE id = ?", (job_id,))
+                row = cursor.fetchone()
+                return dict(row) if row else None
+            except sqlite3.Error as e:
+                print(f"Error getting background job: {e}")
+                return None
+            finally:
+                if connection:
+                    connection.close()
+        return None
+
+    def get_user_background_jobs(self, user_id, limit=20):
+        connection = self.get_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                cursor.execute("""
+                    SELECT * FROM background_jobs
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC
+                    LIMIT ?
+                """, (user_id, limit))
+                return [dict(row) for row in cursor.fetchall()]
+            except sqlite3.Error as e:
+                print(f"Error getting background jobs: {e}")
+                return []
+            finally:
+                if connection:
+                    connection.close()
+        return []
+
+    def mark_interrupted_background_jobs(self):
+        """Jobs still queued/running at startup were lost with the previous process"""
+        connection = self.get_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                cursor.execute("""
+                    UPDATE background_jobs
+                    SET status = 'interrupted', finished_at = ?
+                    WHERE status IN ('queued', 'running')
+                """, (self.get_current_timestamp(),))
+                connection.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                print(f"Error marking interrupted background jobs: {e}")
+                return 0
+            finally:
+                if connection:
+                    connection.close()
+        return 0
+
+
 # Global database instance
 db = Database()
\ No newline at end of file
@@ -6,17 +6,24 @@ import io
 import chardet
 from typing import List, Dict, Optional
 import tldextract
-from ddgs import DDGS
 import time
+import socket
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from services.email_service import EmailService
 from services.smtp_verifier import HighAccuracySMTPVerifier
-from config import GENAI_API_KEY
-import google.generativeai as genai
-
-# Configure genai if key exists
-if GENAI_API_KEY:
-    genai.configure(api_key=GENAI_API_KEY)
+from services.domain_cache import domain_cache, TTLCache
+from services.search_client import search_client
+from services.http_client import http_client
+from services.job_runner import background_job, report_progress
+from services.pattern_store import (
+    pattern_store,
+    classify_email_pattern,
+    EMAIL_PATTERN_FORMATS,
+    DEFAULT_PATTERN_ORDER
+)
+from services.llm_gateway import llm_gateway
 
 # Configure DNS resolver with public DNS servers and increased timeout
 dns_resolver = dns.resolver.Resolver()
@@ -24,10 +31,79 @@ dns_resolver.nameservers = ['8.8.8.8', '8.8.4.4', '1.1.1.1', '1.0.0.1']  # Googl
 dns_resolver.timeout = 3
 dns_resolver.lifetime = 6
 
+# Concurrent domain-pattern probing (DNS first, then TCP :80 for names that resolve)
+DOMAIN_PROBE_WORKERS = 12
+DOMAIN_PROBE_DNS_TIMEOUT = 2
+DOMAIN_PROBE_CONNECT_TIMEOUT = 2
+DOMAIN_PROBE_DEADLINE = 8
+
+# One probe pool shared by every company lookup, so parallel pipeline workers
+# queue behind DOMAIN_PROBE_WORKERS probes instead of each opening their own
+domain_probe_executor = ThreadPoolExecutor(max_workers=DOMAIN_PROBE_WORKERS, thread_name_prefix='domain-probe')
+
+# Upper bound on concurrent DNS-fact and SMTP RCPT probes during verification
+VERIFY_PROBE_CONCURRENCY = 8
+verify_probe_slots = threading.BoundedSemaphore(VERIFY_PROBE_CONCURRENCY)
+
+# Worker pools for the staged /upload-file pipeline
+PIPELINE_DOMAIN_WORKERS = 8
+PIPELINE_PATTERN_WORKERS = 4
+PIPELINE_VERIFY_WORKERS = 8
+
 # Create blueprint
 file_processor_bp = Blueprint('file_processor', __name__)
 
 
+# Cost-ordered verification cascade: per-domain DNS/MX/catch-all facts and stage counters
+VERIFICATION_STAGES = ['syntax', 'domain_facts', 'mx', 'catch_all', 'rcpt']
+domain_facts_cache = TTLCache(max_entries=5000, ttl_seconds=6 * 3600)
+# "No SMTP server reachable" is often transient, so it is remembered for minutes, not hours
+SMTP_UNREACHABLE_TTL_SECONDS = 10 * 60
+smtp_unreachable_cache = TTLCache(max_entries=5000, ttl_seconds=SMTP_UNREACHABLE_TTL_SECONDS)
+# Facts from a lookup that hit a DNS timeout/SERVFAIL are kept only long enough to spare one batch
+TRANSIENT_FACTS_TTL_SECONDS = 60
+transient_facts_cache = TTLCache(max_entries=5000, ttl_seconds=TRANSIENT_FACTS_TTL_SECONDS)
+_verification_stats_lock = threading.Lock()
+verification_stage_stats = {
+    stage: {'runs': 0, 'short_circuits': 0, 'total_ms': 0.0} for stage in VERIFICATION_STAGES
+}
+
+
+def _elapsed_ms(stage_start: float) -> float:
+    return round((time.perf_counter() - stage_start) * 1000, 2)
+
+
+def _finish_verification(result: Dict, decided_at: str) -> Dict:
+    """Apply the final score rule and record which stage decided the address"""
+    # Final validity: score >= 75 (at least 3 methods passed)
+    if result['score'] >= 75:
+        result['is_valid'] = True
+    result['dns_valid'] = (result['validation_methods']['dns'] == 'Success'
+                           and result['validation_methods']['mx_records'] == 'Success')
+    result['details']['decided_at'] = decided_at
+    
+    with _verification_stats_lock:
+        for stage, elapsed in result['details']['stage_timings_ms'].items():
+            verification_stage_stats[stage]['runs'] += 1
+            verification_stage_stats[stage]['total_ms'] += elapsed
+        if decided_at != 'rcpt':
+            verification_stage_stats[decided_at]['short_circuits'] += 1
+    return result
+
+
+def summarize_verification(validations: List[Dict]) -> Dict:
+    """Per-stage timing and short-circuit counts for one batch of validation results"""
+    summary = {stage: {'decided': 0, 'total_ms': 0.0} for stage in VERIFICATION_STAGES}
+    for validation in validations:
+        details = validation.get('details', {})
+        decided_at = details.get('decided_at')
+        if decided_at in summary:
+            summary[decided_at]['decided'] += 1
+        for stage, elapsed in details.get('stage_timings_ms', {}).items():
+            summary[stage]['total_ms'] = round(summary[stage]['total_ms'] + elapsed, 2)
+    return summary
+
+
 def _detect_encoding_and_decode(file_content: bytes) -> str:
     """Detect file encoding and decode. Handles UTF-8, UTF-16, UTF-8-sig, cp1252, etc."""
     # Try common encodings in order
@@ -154,8 +230,8 @@ class CompanyEmailProcessor:
             'ministry': 'gov.au',
             'republic': 'gov.au',
         }
-        self.domain_cache = {}
-        self.failed_lookups = set()
+        # Shared with LinkedInLeadGenerator and backed by cache/domain_*.json
+        self.domain_cache = domain_cache
         self.verifier_api_url = "https://rapid-email-verifier.fly.dev/api/validate/batch"
 
     def extract_company_name(self, text: str) -> Optional[str]:
@@ -201,10 +277,10 @@ class CompanyEmailProcessor:
         if not company_name:
             return None
         
-        cache_key = company_name.lower().strip()
-        if cache_key in self.domain_cache:
-            return self.domain_cache[cache_key]
-        if cache_key in self.failed_lookups:
+        cached_domain = self.domain_cache.get(company_name)
+        if cached_domain:
+            return cached_domain
+        if self.domain_cache.is_known_failure(company_name):
             return None
         
         start_time = time.time()
@@ -212,26 +288,26 @@ class CompanyEmailProcessor:
         
         known_domain = self._check_known_companies(clean_name)
         if known_domain:
-            self.domain_cache[cache_key] = known_domain
+            self.domain_cache.set(company_name, known_domain, persist=False)
             elapsed = time.time() - start_time
             print(f"✅ Domain found via database: {known_domain} ({company_name}) - {elapsed:.3f}s")
             return known_domain
         
         guessed_domain = self._guess_domain_patterns(clean_name)
         if guessed_domain and not self._is_generic_domain(guessed_domain):
-            self.domain_cache[cache_key] = guessed_domain
+            self.domain_cache.set(company_name, guessed_domain)
             elapsed = time.time() - start_time
             print(f"✅ Domain found via pattern: {guessed_domain} ({company_name}) - {elapsed:.3f}s")
             return guessed_domain
         
         searched_domain = self._search_domain_fallback(clean_name)
         if searched_domain and not self._is_generic_domain(searched_domain):
-            self.domain_cache[cache_key] = searched_domain
+            self.domain_cache.set(company_name, searched_domain)
             elapsed = time.time() - start_time
             print(f"✅ Domain found via search: {searched_domain} ({company_name}) - {elapsed:.3f}s")
             return searched_domain
         
-        self.failed_lookups.add(cache_key)
+        self.domain_cache.set_failed(company_name)
         elapsed = time.time() - start_time
         print(f"❌ Domain not found: {company_name} - {elapsed:.3f}s")
         return None
@@ -278,19 +354,42 @@ class CompanyEmailProcessor:
         return domain_name in generic_names
 
     def _guess_domain_patterns(self, company_name: str) -> Optional[str]:
-        """Try patterns with HTTP verification"""
+        """Probe pattern x TLD candidates concurrently; highest-priority live domain wins"""
         words = company_name.split()
         if not words:
             return None
         
         patterns = self._generate_domain_patterns(words)
         tld_priority = self._get_tld_priority(company_name)
+        candidates = [pattern + tld for pattern in patterns for tld in tld_priority]
+        if not candidates:
+            return None
         
-        for pattern in patterns:
-            for tld in tld_priority:
-                domain = pattern + tld
-                if self._test_domain_quick_http(domain):
-                    return domain
+        outcomes = [None] * len(candidates)  # None = pending, True/False = probed
+        next_index = 0
+        futures = {}
+        try:
+            futures = {domain_probe_executor.submit(self._test_domain_quick_http, domain): i for i, domain in enumerate(candidates)}
+            for future in as_completed(futures, timeout=DOMAIN_PROBE_DEADLINE):
+                try:
+                    outcomes[futures[future]] = bool(future.result())
+                except Exception:
+                    outcomes[futures[future]] = False
+                
+                # A live domain only wins once every higher-priority candidate has failed
+                while next_index < len(candidates) and outcomes[next_index] is not None:
+                    if outcomes[next_index]:
+                        return candidates[next_index]
+                    next_index += 1
+        except Exception:
+            # Overall deadline hit: fall back to the best candidate that did answer
+            for i, outcome in enumerate(outcomes):
+                if outcome:
+                    return candidates[i]
+        finally:
+            # Drop this lookup's queued probes; the shared pool stays up
+            for future in futures:
+                future.cancel()
         
         return None
 
@@ -353,16 +452,17 @@ class CompanyEmailProcessor:
         return patterns[:8]
 
     def _test_domain_quick_http(self, domain: str) -> bool:
-        """Quick HTTP check - like browser testing if domain works"""
-        import socket
+        """Quick HTTP check - resolve first, then TCP connect to :80 with a per-socket timeout"""
+        try:
+            answers = dns_resolver.resolve(domain, 'A', lifetime=DOMAIN_PROBE_DNS_TIMEOUT)
+            address = str(answers[0])
+        except Exception:
+            return False
         
         try:
-            socket.setdefaulttimeout(2)
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            result = sock.connect_ex((domain, 80))
-            sock.close()
-            return result == 0
-        except:
+            with socket.create_connection((address, 80), timeout=DOMAIN_PROBE_CONNECT_TIMEOUT):
+                return True
+        except OSError:
             return False
 
     def _search_domain_fallback(self, company_name: str, timeout_seconds: int = 5) -> Optional[str]:
@@ -370,21 +470,20 @@ class CompanyEmailProcessor:
         start_time = time.time()
         
         try:
-            with DDGS() as ddgs:
-                query = f'"{company_name}" website'
-                results = list(ddgs.text(query, max_results=2))
+            query = f'"{company_name}" website'
+            results = search_client.text(query, max_results=2)
+            
+            for result in results:
+                if time.time() - start_time > timeout_seconds:
+                    break
                 
-                for result in results:
-                    if time.time() - start_time > timeout_seconds:
-                        break
-                    
-                    url = result.get("href", "")
-                    if url:
-                        ext = tldextract.extract(url)
-                        if ext.domain and ext.suffix:
-                            domain = f"{ext.domain}.{ext.suffix}".lower()
-                            if self._is_likely_company_domain(company_name, domain):
-                                return domain
+                url = result.get("href", "")
+                if url:
+                    ext = tldextract.extract(url)
+                    if ext.domain and ext.suffix:
+                        domain = f"{ext.domain}.{ext.suffix}".lower()
+                        if self._is_likely_company_domain(company_name, domain):
+                            return domain
         except Exception as e:
             print(f"⚠️ Search fallback error for {company_name}: {e}")
         
@@ -444,12 +543,18 @@ class CompanyEmailProcessor:
         return {'first_name': '', 'last_name': ''}
     
     def predict_best_email_pattern(self, company_name: str, domain: str) -> Optional[str]:
-        """Use Gemini to predict the most likely professional email format"""
-        if not GENAI_API_KEY or not company_name:
+        """Most likely email format for a domain: learned from SMTP results, else one Gemini call per domain"""
+        if domain:
+            learned_pattern = pattern_store.best_pattern(domain)
+            if learned_pattern:
+                return learned_pattern
+            if pattern_store.has_prediction(domain):
+                return pattern_store.get_prediction(domain)
+        
+        if not llm_gateway.available or not company_name:
             return None
             
         try:
-            model = genai.GenerativeModel('gemini-1.5-flash')
             prompt = f"""
             Analyze the company '{company_name}' (domain: {domain}).
             Predict their professional email format.
@@ -464,15 +569,19 @@ class CompanyEmailProcessor:
             
             Return ONLY the pattern name from the list above. No other text.
             """
-            response = model.generate_content(prompt)
+            response = llm_gateway.generate(prompt, models=['gemini-1.5-flash'])
             pattern = response.text.strip().lower()
-            return pattern if pattern in ['first.last', 'f.last', 'first', 'last', 'firstlast', 'first_last', 'first.l'] else None
+            pattern = pattern if pattern in ['first.last', 'f.last', 'first', 'last', 'firstlast', 'first_last', 'first.l'] else None
+            if domain:
+                pattern_store.set_prediction(domain, pattern)
+            return pattern
         except Exception as e:
             print(f"Gemini pattern prediction error: {e}")
             return None
 
-    def generate_email_patterns(self, first_name: str, last_name: str, domain: str, company_name: str = None) -> List[str]:
-        """Generate common email patterns with AI prediction priority"""
+    def generate_email_patterns(self, first_name: str, last_name: str, domain: str, company_name: str = None,
+                                predicted_pattern: Optional[str] = None) -> List[str]:
+        """Generate common email patterns, most likely format for the domain first"""
         if not domain:
             return []
         
@@ -484,49 +593,49 @@ class CompanyEmailProcessor:
         if not first_name_clean and not last_name_clean:
             return []
 
-        # AI Prediction
-        predicted_pattern = self.predict_best_email_pattern(company_name, domain) if company_name else None
+        # AI Prediction (callers that already predicted for this domain pass it in)
+        if predicted_pattern is None and company_name:
+            predicted_pattern = self.predict_best_email_pattern(company_name, domain)
         
-        patterns = []
-        first_initial = first_name_clean[0] if first_name_clean else ''
-        last_initial = last_name_clean[0] if last_name_clean else ''
-
-        # Map patterns to generators
-        format_map = {
-            'first.last': f"{first_name_clean}.{last_name_clean}@{domain}",
-            'f.last': f"{first_initial}{last_name_clean}@{domain}",
-            'first': f"{first_name_clean}@{domain}",
-            'last': f"{last_name_clean}@{domain}",
-            'firstlast': f"{first_name_clean}{last_name_clean}@{domain}",
-            'first_last': f"{first_name_clean}_{last_name_clean}@{domain}",
-            'first.l': f"{first_name_clean}.{last_initial}@{domain}"
-        }
-
-        if predicted_pattern and predicted_pattern in format_map:
-            patterns.append(format_map[predicted_pattern])
-
-        # Add all other common ones as fallback
-        base_patterns = [
-            f"{first_name_clean}.{last_name_clean}@{domain}",
-            f"{first_initial}{last_name_clean}@{domain}",
-            f"{first_name_clean}@{domain}",
-            f"{first_name_clean}{last_name_clean}@{domain}",
-            f"{first_initial}.{last_name_clean}@{domain}"
-        ]
+        # Predicted first, then patterns verified for this domain, then the common defaults
+        pattern_order = ([predicted_pattern] if predicted_pattern else []) + pattern_store.ranked_patterns(domain) + DEFAULT_PATTERN_ORDER
         
-        for p in base_patterns:
-            if p not in patterns:
-                patterns.append(p)
+        patterns = []
+        for name in pattern_order:
+            build = EMAIL_PATTERN_FORMATS.get(name)
+            if not build:
+                continue
+            email = f"{build(first_name_clean, last_name_clean)}@{domain}"
+            if email not in patterns:
+                patterns.append(email)
 
         return [p for p in patterns if '@' in p and len(p.split('@')[0]) > 0]
     
+    def learn_from_validations(self, first_name: str, last_name: str, validations: List[Dict]):
+        """Feed SMTP outcomes for one person's candidate emails back into the pattern store"""
+        accepted = []
+        for validation in validations:
+            smtp_code = validation.get('details', {}).get('smtp_code')
+            pattern = classify_email_pattern(validation.get('email', ''), first_name, last_name)
+            if not pattern:
+                continue
+            domain = validation['email'].split('@')[1]
+            if smtp_code in (250, 251):
+                accepted.append((domain, pattern))
+            elif smtp_code in (550, 551):
+                pattern_store.record_outcome(domain, pattern, verified=False)
+        
+        # Several accepted candidates for one person means a catch-all server; nothing to learn
+        if len(accepted) == 1:
+            pattern_store.record_outcome(accepted[0][0], accepted[0][1], verified=True)
+    
     def _verify_emails_batch(self, emails: List[str]) -> Dict[str, Dict]:
         """Verify multiple emails using Rapid Email Verifier batch API - FIXED VERSION"""
         if not emails:
             return {}
             
         try:
-            response = requests.post(
+            response = http_client.post(
                 self.verifier_api_url,
                 json={"emails": emails},
                 timeout=30,
@@ -627,15 +736,58 @@ class CompanyEmailProcessor:
         
         return True
 
+    def _lookup_domain_facts(self, domain: str) -> Dict:
+        """DNS (A, then NS) and MX facts for a domain - looked up once and cached"""
+        facts = {
+            'dns_valid': False,
+            'mx_valid': False,
+            'mx_definitive': False,  # True when the domain definitely has no MX
+            'mx_error': None,
+            'catch_all': False,
+            'transient': False,  # True when a lookup failed without a definitive answer
+        }
+        
+        try:
+            # Try A record first using custom resolver with public DNS
+            dns_resolver.resolve(domain, 'A')
+            facts['dns_valid'] = True
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            # Domain doesn't exist or no A record, try NS record
+            try:
+                dns_resolver.resolve(domain, 'NS')
+                facts['dns_valid'] = True
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                pass
+            except Exception:
+                facts['transient'] = True
+        except Exception:
+            # Other DNS errors (timeout, etc.) - don't fail completely
+            facts['transient'] = True
+        
+        try:
+            mx_records = dns_resolver.resolve(domain, 'MX')
+            facts['mx_valid'] = bool(mx_records)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            facts['mx_definitive'] = True
+            facts['mx_error'] = 'No MX records found'
+        except Exception as e:
+            facts['mx_error'] = type(e).__name__
+            facts['transient'] = True
+        
+        return facts
+
     def validate_emails_with_scores(self, emails: List[str]) -> List[Dict]:
-        """Validate multiple emails with 4-method scoring (Regex, DNS, MX, SMTP)"""
+        """Validate multiple emails with 4-method scoring (Regex, DNS, MX, SMTP)
+        
+        Stages run cheapest first and stop once an address is decided:
+        syntax -> cached domain facts -> MX -> catch-all -> RCPT.
+        """
         if not emails:
             return []
         
         print(f"🔍 Starting 4-method validation for {len(emails)} emails...")
         
         # Initialize SMTP verifier with balanced settings for accuracy
-        from services.smtp_verifier import HighAccuracySMTPVerifier
         smtp_verifier = HighAccuracySMTPVerifier(timeout=8, debug=False, max_retries=1)
         
         validation_results = []
@@ -646,8 +798,8 @@ class CompanyEmailProcessor:
                 'is_valid': False,
                 'score': 0,
                 'dns_valid': False,
-                'score_breakdown': {},
-                'details': {},
+                'score_breakdown': {'regex': 0, 'dns': 0, 'mx_records': 0, 'smtp': 0},
+                'details': {'stage_timings_ms': {}, 'decided_at': None},
                 'validation_methods': {
                     'regex': 'Failed',
                     'dns': 'Failed',
@@ -655,72 +807,85 @@ class CompanyEmailProcessor:
                     'smtp': 'Failed'
                 }
             }
+            timings = result['details']['stage_timings_ms']
             
-            # Method 1: REGEX validation (25 points)
+            # Stage 1: syntax (25 points)
+            stage_start = time.perf_counter()
             regex_valid = self._is_valid_email_format(email)
-            if regex_valid:
-                result['validation_methods']['regex'] = 'Success'
-                result['score'] += 25
-                result['score_breakdown']['regex'] = 25
-            else:
+            timings['syntax'] = _elapsed_ms(stage_start)
+            if not regex_valid:
                 print(f"   ❌ Invalid format: {email}")
                 result['details']['note'] = 'Invalid email format'
-                result['score_breakdown']['regex'] = 0
-                validation_results.append(result)
+                validation_results.append(_finish_verification(result, 'syntax'))
                 continue
             
-            # Extract domain
-            try:
-                domain = email.split('@')[1]
-            except:
-                result['details']['note'] = 'Invalid email structure'
-                validation_results.append(result)
-                continue
+            result['validation_methods']['regex'] = 'Success'
+            result['score'] += 25
+            result['score_breakdown']['regex'] = 25
+            domain = email.split('@')[1].lower()
             
-            # Method 2: DNS validation (25 points)
-            dns_valid = False
-            try:
-                # Try A record first using custom resolver with public DNS
-                dns_resolver.resolve(domain, 'A')
-                dns_valid = True
+            # Stage 2: cached domain facts
+            stage_start = time.perf_counter()
+            facts = domain_facts_cache.get(domain) or transient_facts_cache.get(domain)
+            timings['domain_facts'] = _elapsed_ms(stage_start)
+            facts_cached = facts is not None
+            
+            # Stage 3: DNS + MX, once per domain (25 + 25 points)
+            if not facts_cached:
+                stage_start = time.perf_counter()
+                with verify_probe_slots:
+                    facts = self._lookup_domain_facts(domain)
+                # Only definitive answers (records, NXDOMAIN, NoAnswer) are kept for hours
+                (transient_facts_cache if facts['transient'] else domain_facts_cache).set(domain, facts)
+                timings['mx'] = _elapsed_ms(stage_start)
+            
+            if facts['dns_valid']:
                 result['validation_methods']['dns'] = 'Success'
                 result['score'] += 25
                 result['score_breakdown']['dns'] = 25
-            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-                # Domain doesn't exist or no A record, try NS record
-                try:
-                    dns_resolver.resolve(domain, 'NS')
-                    dns_valid = True
-                    result['validation_methods']['dns'] = 'Success'
-                    result['score'] += 25
-                    result['score_breakdown']['dns'] = 25
-                except Exception as e:
-                    result['score_breakdown']['dns'] = 0
-                    # Don't print DNS fail for now, MX is more important for email
-            except Exception as e:
-                # Other DNS errors (timeout, etc.) - don't fail completely
-                result['score_breakdown']['dns'] = 0
             
-            # Method 3: MX Records validation (25 points)
-            mx_valid = False
-            try:
-                mx_records = dns_resolver.resolve(domain, 'MX')
-                if mx_records:
-                    mx_valid = True
-                    result['validation_methods']['mx_records'] = 'Success'
-                    result['score'] += 25
-                    result['score_breakdown']['mx_records'] = 25
-            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
-                result['score_breakdown']['mx_records'] = 0
+            if facts['mx_valid']:
+                result['validation_methods']['mx_records'] = 'Success'
+                result['score'] += 25
+                result['score_breakdown']['mx_records'] = 25
+            elif facts['mx_definitive']:
+                # No mail server at all - RCPT can only fail, so skip SMTP
                 print(f"   ❌ MX fail: {email} (No MX records found)")
-            except Exception as e:
-                result['score_breakdown']['mx_records'] = 0
-                print(f"   ⚠️ MX error: {email} ({type(e).__name__})")
+                result['details']['note'] = 'No MX records - SMTP skipped'
+                validation_results.append(_finish_verification(result, 'domain_facts' if facts_cached else 'mx'))
+                continue
+            else:
+                print(f"   ⚠️ MX error: {email} ({facts['mx_error']})")
+            
+            if smtp_unreachable_cache.get(domain):
+                result['details']['note'] = 'SMTP verification unavailable (no server reachable for domain)'
+                validation_results.append(_finish_verification(result, 'domain_facts'))
+                continue
+            
+            # Stage 4: catch-all - every address is accepted, so RCPT cannot tell them apart
+            if facts['catch_all']:
+                result['validation_methods']['smtp'] = 'Success'
+                result['score'] += 25
+                result['score_breakdown']['smtp'] = 25
+                result['details']['note'] = '✅ Valid - SMTP Code 250 (catch-all domain accepts all addresses)'
+                result['details']['smtp_code'] = 250
+                result['details']['catch_all'] = True
+                validation_results.append(_finish_verification(result, 'catch_all'))
+                continue
             
-            # Method 4: SMTP validation (25 points)
-            smtp_result = smtp_verifier.verify_email(email)
+            # Stage 5: RCPT via the SMTP verifier (25 points)
+            stage_start = time.perf_counter()
+            with verify_probe_slots:
+                smtp_result = smtp_verifier.verify_email(email)
+            timings['rcpt'] = _elapsed_ms(stage_start)
             smtp_code = smtp_result.get('smtp_code')
             
+            if smtp_result.get('catch_all_detected'):
+                # Cached facts are shared across threads; store a new dict instead of mutating
+                (transient_facts_cache if facts['transient'] else domain_facts_cache).set(domain, {**facts, 'catch_all': True})
+            elif smtp_code is None and smtp_result.get('checks_performed', 0) > 0 and 'reached' in (smtp_result.get('error') or ''):
+                smtp_unreachable_cache.set(domain, True)
+            
             if smtp_code == 250 or smtp_code == 251:
                 # 250 = Definitely exists, 251 = Forwarded but exists
                 result['validation_methods']['smtp'] = 'Success'
@@ -732,36 +897,24 @@ class CompanyEmailProcessor:
                 print(f"   ✅ Valid: {email} (SMTP {smtp_code}, total score: {result['score']})")
             elif smtp_code == 550 or smtp_code == 551:
                 # 550 = Doesn't exist, 551 = User not local
-                result['validation_methods']['smtp'] = 'Failed'
-                result['score_breakdown']['smtp'] = 0
                 result['is_valid'] = False
                 result['details']['note'] = f'❌ SMTP Code {smtp_code} - Mailbox does not exist'
                 result['details']['smtp_response'] = smtp_result.get('smtp_response', '')
                 print(f"   ❌ SMTP fail: {email} (code {smtp_code}, total score: {result['score']})")
             elif smtp_code == 252:
                 # 252 = Cannot verify (Gmail anti-enumeration)
-                result['validation_methods']['smtp'] = 'Failed'
-                result['score_breakdown']['smtp'] = 0
                 result['is_valid'] = False
                 result['details']['note'] = f'❌ SMTP Code 252 - Cannot verify (anti-spam protection)'
                 result['details']['smtp_response'] = smtp_result.get('smtp_response', '')
                 print(f"   ❌ Cannot verify: {email} (code 252, total score: {result['score']})")
             else:
                 # No SMTP code or other error
-                result['validation_methods']['smtp'] = 'Failed'
-                result['score_breakdown']['smtp'] = 0
                 result['details']['note'] = smtp_result.get('error', 'SMTP verification unavailable')
                 print(f"   ⚠️ SMTP unavailable: {email} (total score: {result['score']})")
             
-            result['dns_valid'] = dns_valid and mx_valid
             result['details']['smtp_code'] = smtp_code
             result['details']['smtp_verification_time'] = smtp_result.get('verification_time', 0)
-            
-            # Final validity: score >= 75 (at least 3 methods passed)
-            if result['score'] >= 75:
-                result['is_valid'] = True
-            
-            validation_results.append(result)
+            validation_results.append(_finish_verification(result, 'rcpt'))
         
         valid_count = sum(1 for r in validation_results if r['is_valid'])
         print(f"📊 Validation Summary: {valid_count}/{len(validation_results)} valid")
@@ -864,6 +1017,7 @@ class FileProcessor:
             if generated_emails:
                 # Validate emails
                 batch_validations = self.email_processor.validate_emails_with_scores(generated_emails)
+                self.email_processor.learn_from_validations(first_name, last_name, batch_validations)
                 validation_results = batch_validations
                 
                 for validation in batch_validations:
@@ -899,83 +1053,126 @@ class FileProcessor:
         print(f"   Result: {len(valid_emails_with_scores)} valid emails")
         return result
     
+    def _run_stage(self, stage_name: str, func, items: List, max_workers: int) -> Dict:
+        """Run func over unique items on a bounded thread pool; returns {item: result}"""
+        stage_results = {}
+        if not items:
+            return stage_results
+        
+        stage_start = time.time()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            futures = {executor.submit(func, item): item for item in items}
+            for done, future in enumerate(as_completed(futures), 1):
+                item = futures[future]
+                report_progress(stage=stage_name, done=done, total=len(items))
+                try:
+                    stage_results[item] = future.result()
+                except Exception as e:
+                    print(f"⚠️ {stage_name} failed for {item}: {e}")
+                    stage_results[item] = None
+        
+        print(f"⏱️ Stage {stage_name}: {len(items)} unique items in {time.time() - stage_start:.2f}s")
+        return stage_results
+    
     def _process_dataframe(self, df: pd.DataFrame) -> List[Dict]:
-        """Process pandas DataFrame and add email IDs with scores"""
-        results = []
+        """Process pandas DataFrame and add email IDs with scores
+        
+        Staged pipeline: parse rows -> dedupe companies -> resolve domains ->
+        predict patterns -> verify. Each network stage works on unique
+        companies/domains/emails on its own bounded worker pool.
+        """
+        processor = self.email_processor
+        
+        # Stage 1: parse every row without touching the network
+        results = [self._create_initial_result(row, index, resolve_domain=False) for index, row in df.iterrows()]
+        
+        # Stage 2 + 3: resolve each unique company once
+        companies = sorted({r['company_name'] for r in results if r['company_name'] and not r['domain']})
+        company_domains = self._run_stage('resolve domains', processor.find_company_domain, companies, PIPELINE_DOMAIN_WORKERS)
+        for result in results:
+            if not result['domain'] and result['company_name']:
+                result['domain'] = company_domains.get(result['company_name'])
+        
+        # Stage 4: one pattern prediction per unique (company, domain)
+        needs_patterns = [r for r in results if not r['existing_email'] and (r['first_name'] or r['last_name']) and r['domain']]
+        company_keys = sorted({(r['company_name'], r['domain']) for r in needs_patterns if r['company_name']})
+        predictions = self._run_stage(
+            'predict patterns',
+            lambda key: processor.predict_best_email_pattern(key[0], key[1]),
+            company_keys,
+            PIPELINE_PATTERN_WORKERS
+        )
         
-        # Collect all emails for batch processing
-        all_emails_to_validate = []
         record_emails_map = {}  # Map record index to its emails
-        
-        # First pass: collect all data and generate/extract emails
-        for index, row in df.iterrows():
-            result = self._create_initial_result(row, index)
-            
-            # Collect emails to validate (either existing or generated)
-            emails_to_validate = []
-            
-            # NEW: If file has existing email, use that
+        for index, result in enumerate(results):
             if result['existing_email']:
-                emails_to_validate.append(result['existing_email'])
                 result['generated_emails'] = [result['existing_email']]
+                record_emails_map[index] = [result['existing_email']]
                 print(f"   Using existing email from file: {result['existing_email']}")
-            
-            # Otherwise, generate emails from names and domain
             elif (result['first_name'] or result['last_name']) and result['domain']:
-                emails = self.email_processor.generate_email_patterns(
-                    result['first_name'], 
-                    result['last_name'], 
+                emails = processor.generate_email_patterns(
+                    result['first_name'],
+                    result['last_name'],
                     result['domain'],
-                    result['company_name']
+                    predicted_pattern=predictions.get((result['company_name'], result['domain']))
                 )
                 result['generated_emails'] = emails
-                emails_to_validate.extend(emails)
-                print(f"   Generated {len(emails)} email patterns")
-            
-            # Store for batch validation
-            if emails_to_validate:
-                record_emails_map[index] = emails_to_validate
-                all_emails_to_validate.extend(emails_to_validate)
+                if emails:
+                    record_emails_map[index] = emails
+        
+        # Stage 5: verify each unique email once, grouped by domain
+        emails_by_domain = {}
+        for emails in record_emails_map.values():
+            for email in emails:
+                domain_part = email.split('@')[-1].lower()
+                emails_by_domain.setdefault(domain_part, [])
+                if email not in emails_by_domain[domain_part]:
+                    emails_by_domain[domain_part].append(email)
+        
+        print(f"🔄 Validating {sum(len(v) for v in emails_by_domain.values())} unique emails across {len(emails_by_domain)} domains...")
+        domain_validations = self._run_stage(
+            'verify emails',
+            lambda domain_part: processor.validate_emails_with_scores(emails_by_domain[domain_part]),
+            sorted(emails_by_domain),
+            PIPELINE_VERIFY_WORKERS
+        )
+        email_validation_map = {}
+        for validations in domain_validations.values():
+            for validation in validations or []:
+                email_validation_map[validation['email']] = validation
+        
+        # Assign validation results to respective records
+        for index, result in enumerate(results):
+            valid_emails_with_scores = []
+            validation_results = []
             
-            results.append(result)
-        
-        # Batch validate all emails
-        if all_emails_to_validate:
-            print(f"🔄 Batch validating {len(all_emails_to_validate)} emails...")
-            batch_validations = self.email_processor.validate_emails_with_scores(all_emails_to_validate)
+            emails = record_emails_map.get(index, [])
+            for email in emails:
+                validation = email_validation_map.get(email, {})
+                if validation:
+                    validation_results.append(validation)
+                    if validation.get('is_valid', False):
+                        valid_emails_with_scores.append({
+                            'email': email,
+                            'score': validation['score'],
+                            'score_breakdown': validation['score_breakdown'],
+                            'dns_valid': validation['dns_valid'],
+                            'validation_methods': validation.get('validation_methods', {}),
+                            'api_details': validation.get('details', {}).get('api_result', {})
+                        })
             
-            # Create email to validation map
-            email_validation_map = {v['email']: v for v in batch_validations}
+            if validation_results and (result['first_name'] or result['last_name']):
+                processor.learn_from_validations(result['first_name'], result['last_name'], validation_results)
             
-            # Second pass: assign validation results to respective records
-            for index, result in enumerate(results):
-                valid_emails_with_scores = []
-                validation_results = []
-                
-                emails = record_emails_map.get(index, [])
-                for email in emails:
-                    validation = email_validation_map.get(email, {})
-                    if validation:
-                        validation_results.append(validation)
-                        if validation.get('is_valid', False):
-                            valid_emails_with_scores.append({
-                                'email': email,
-                                'score': validation['score'],
-                                'score_breakdown': validation['score_breakdown'],
-                                'dns_valid': validation['dns_valid'],
-                                'validation_methods': validation.get('validation_methods', {}),
-                                'api_details': validation.get('details', {}).get('api_result', {})
-                            })
-                
-                # Sort by score and update result
-                valid_emails_with_scores.sort(key=lambda x: x['score'], reverse=True)
-                result['valid_emails_with_scores'] = valid_emails_with_scores
-                result['validation_results'] = validation_results
-                result['best_email'] = valid_emails_with_scores[0] if valid_emails_with_scores else None
+            # Sort by score and update result
+            valid_emails_with_scores.sort(key=lambda x: x['score'], reverse=True)
+            result['valid_emails_with_scores'] = valid_emails_with_scores
+            result['validation_results'] = validation_results
+            result['best_email'] = valid_emails_with_scores[0] if valid_emails_with_scores else None
         
         return results
     
-    def _create_initial_result(self, row, index: int) -> Dict:
+    def _create_initial_result(self, row, index: int, resolve_domain: bool = True) -> Dict:
         """Create initial result structure from dataframe row"""
         # Ensure index is an integer
         if isinstance(index, str):
@@ -1057,7 +1254,7 @@ class FileProcessor:
             # Extract domain from existing email (PRIORITY)
             result['domain'] = existing_email.split('@')[1]
             print(f"   🌐 Extracted domain from email: {result['domain']}")
-        elif result['company_name']:
+        elif result['company_name'] and resolve_domain:
             # Only search for domain if no existing email
             result['domain'] = self.email_processor.find_company_domain(result['company_name'])
         
@@ -1083,6 +1280,7 @@ def test_connection():
     return jsonify({'status': 'success', 'message': 'Backend is working!'})
 
 @file_processor_bp.route('/upload-file', methods=['POST'])
+@background_job('upload_file')
 def upload_file():
     """Handle file upload and return data with generated email IDs and scores"""
     start_time = time.time()
@@ -1149,6 +1347,10 @@ def upload_file():
                     pass
 
         domains_found = len(unique_domains)
+        
+        # Each unique address is verified once even if several rows share it
+        unique_validations = {v['email']: v for r in results for v in r.get('validation_results', []) if v.get('email')}
+        verification_stages = summarize_verification(list(unique_validations.values()))
 
         print(f"📊 Summary strict: total_records={total_records}, strict_valid={strict_valid_count}, domains={domains_found}, generated={emails_generated}")
         
@@ -1164,6 +1366,7 @@ def upload_file():
                 'success_rate': f"{(strict_valid_count/total_records)*100:.1f}%" if total_records > 0 else "0%",
                 'email_success_rate': f"{(strict_valid_count/emails_generated)*100:.1f}%" if emails_generated > 0 else "0%"
             },
+            'verification_stages': verification_stages,
             'results': results
         }
         
@@ -1177,6 +1380,17 @@ def upload_file():
         print(f"❌ ERROR: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def verification_stats():
+    """Process-wide per-stage timing and short-circuit counts for email verification"""
+    with _verification_stats_lock:
+        stages = {stage: dict(stats) for stage, stats in verification_stage_stats.items()}
+    return {
+        'stages': stages,
+        'domain_facts_cache': domain_facts_cache.stats(),
+        'transient_facts_cache': transient_facts_cache.stats(),
+        'smtp_unreachable_cache': smtp_unreachable_cache.stats()
+    }
+
 @file_processor_bp.route('/check-emails', methods=['POST'])
 def check_emails():
     """Check emails and calculate bounce count, replied count, and sent status."""
@@ -1,6 +1,5 @@
 # routes/salesforce_routes.py
 from flask import Blueprint, request, jsonify, session, redirect, url_for
-import requests
 import json
 from datetime import datetime
 import secrets
@@ -8,6 +7,7 @@ import base64
 import hashlib
 import urllib.parse
 import os
+from services.http_client import http_client
 
 salesforce_bp = Blueprint('salesforce', __name__)
 
@@ -53,7 +53,7 @@ class SalesforceCRMHandler:
             }
             
             print(f"DEBUG: Creating Lead in Salesforce with data: {sf_lead_data}")
-            response = requests.post(url, headers=headers, json=sf_lead_data)
+            response = http_client.post(url, headers=headers, json=sf_lead_data)
             
             if response.status_code in [200, 201]:
                 result = response.json()
@@ -82,7 +82,7 @@ class SalesforceCRMHandler:
                     'Content-Type': 'application/json'
                 }
                 
-                response = requests.get(url, headers=headers)
+                response = http_client.get(url, headers=headers)
                 if response.status_code == 200:
                     data = response.json()
                     if data.get('records'):
@@ -156,7 +156,7 @@ def salesforce_callback():
     }
     
     try:
-        response = requests.post(token_url, data=token_data)
+        response = http_client.post(token_url, data=token_data)
         
         if response.status_code != 200:
             return redirect(f"https://emailagent.cubegtp.com/salesforce?error={urllib.parse.quote('Token exchange failed')}")
@@ -196,7 +196,7 @@ def salesforce_status():
             sf_handler.set_tokens(access_token, instance_url)
             test_url = f"{instance_url}/services/oauth2/userinfo"
             headers = {'Authorization': f'Bearer {access_token}'}
-            response = requests.get(test_url, headers=headers)
+            response = http_client.get(test_url, headers=headers)
             status['token_valid'] = response.status_code == 200
         except:
             status['token_valid'] = False
@@ -213,7 +213,7 @@ def salesforce_revoke():
         try:
             revoke_url = f"{SALESFORCE_LOGIN_URL}/services/oauth2/revoke"
             revoke_data = {'token': access_token}
-            response = requests.post(revoke_url, data=revoke_data)
+            response = http_client.post(revoke_url, data=revoke_data)
             
             if response.status_code == 200:
                 message += "✅ Salesforce access revoked. "
@@ -408,7 +408,7 @@ def test_connection():
         # Test connection by getting user info
         test_url = f"{instance_url}/services/oauth2/userinfo"
         headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get(test_url, headers=headers)
+        response = http_client.get(test_url, headers=headers)
         
         if response.status_code == 200:
             user_info = response.json()
@@ -1,11 +1,11 @@
 """
 Content Creation Routes
-Handles AI-powered email content generation with Gemini Multi-Key Rotation
+Handles AI-powered email content generation with Gemini (keys pooled in services/llm_gateway)
 """
 
 from flask import Blueprint, request, jsonify
-import google.generativeai as genai
-import os
+from services.llm_gateway import llm_gateway
+from utils.llm_streaming import event_stream_response, stream_generation
 import json
 import re
 import time
@@ -19,89 +19,38 @@ from dotenv import load_dotenv
 
 load_dotenv() # Ensure env vars are loaded
 
-# Helper to get all available Gemini keys for rotation
-def get_gemini_keys():
-    keys = []
-    # Check primary key
-    primary = os.getenv("GEMINI_API_KEY")
-    if primary: keys.append(primary)
-    
-    # Check for rotated keys (GEMINI_API_KEY_1 to GEMINI_API_KEY_10)
-    for i in range(1, 11):
-        k = os.getenv(f"GEMINI_API_KEY_{i}")
-        if k: keys.append(k)
-        
-    return list(dict.fromkeys(keys)) # Remove duplicates while preserving order
-
-# Initialize check
-valid_keys = get_gemini_keys()
-if valid_keys:
-    print(f"✅ Loaded {len(valid_keys)} Gemini API Keys for rotation.")
-else:
-    print("⚠️ No Gemini API Keys found in .env")
-
-
-def generate_with_gemini(instruction, tone, length, sender_name):
-    """Generate professional content using Gemini AI with Key Rotation"""
-    try:
-        # Length mapping
-        length_guide = {
-            'Short': '2-3 sentences, high-impact',
-            'Medium': '5-7 sentences, comprehensive',
-            'Long': '12+ sentences, detailed enterprise proposal'
-        }
-
-        # Tone mapping
-        tone_guide = {
-            'Professional': 'formal, industry-standard, respectful',
-            'Friendly': 'warm, conversational, accessible',
-            'Sales Oriented': 'persuasive, KPI-driven, results-focused',
-            'Thought-Leader': 'authoritative, visionary, insightful',
-            'Urgent / FOMO': 'time-critical, high-priority, exclusive',
-            'Cold Outreach': 'curiosity-driven, value-first, non-invasive'
-        }
+# Tone mapping
+CONTENT_TONES = {
+    'Professional': 'formal, industry-standard, respectful',
+    'Friendly': 'warm, conversational, accessible',
+    'Sales Oriented': 'persuasive, KPI-driven, results-focused',
+    'Thought-Leader': 'authoritative, visionary, insightful',
+    'Urgent / FOMO': 'time-critical, high-priority, exclusive',
+    'Cold Outreach': 'curiosity-driven, value-first, non-invasive'
+}
 
-        # Priority: Flash models are faster and often have separate quotas
-        models_to_try = [
-            'gemini-1.5-flash',
-            'gemini-2.0-flash',
-            'gemini-1.5-pro',
-            'gemini-pro',
-            'gemini-2.0-flash-lite'
-        ]
+# Priority: Flash models are faster and often have separate quotas
+CONTENT_MODELS = [
+    'gemini-1.5-flash',
+    'gemini-2.0-flash',
+    'gemini-1.5-pro',
+    'gemini-pro',
+    'gemini-2.0-flash-lite'
+]
+
+CONTENT_GENERATION_CONFIG = {
+    'temperature': 0.88,
+    'top_p': 0.9,
+    'top_k': 32,
+}
 
-        # Get fresh list of keys
-        api_keys = get_gemini_keys()
-        if not api_keys:
-            return { 'success': False, 'error': "No GEMINI_API_KEY found. Please add to .env" }
-
-        last_error = None
-        
-        # KEY ROTATION LOOP
-        for key_index, api_key in enumerate(api_keys):
-            try:
-                # Configure with current key
-                genai.configure(api_key=api_key)
-                masked_key = f"{api_key[:4]}...{api_key[-4:]}"
-                
-                # MODEL FALLBACK LOOP (per key)
-                for model_name in models_to_try:
-                    try:
-                        print(f"🔄 Forging with Key {key_index+1} ({masked_key}) | Model: {model_name}...")
-                        model = genai.GenerativeModel(
-                            model_name,
-                            generation_config={
-                                'temperature': 0.88,
-                                'top_p': 0.9,
-                                'top_k': 32,
-                            }
-                        )
-
-                        prompt = f"""Task: Write a high-quality email OR document based STRICTLY on the user's request.
+def build_content_prompt(instruction, tone):
+    """Prompt shared by /generate and /generate/stream"""
+    return f"""Task: Write a high-quality email OR document based STRICTLY on the user's request.
 
 CONTEXT:
 Instruction: {instruction}
-Tone: {tone_guide.get(tone, 'Professional')}
+Tone: {CONTENT_TONES.get(tone, 'Professional')}
 
 ADAPTIVE LOGIC:
 1. DETECT INTENT:
@@ -128,44 +77,49 @@ OUTPUT JSON:
     "body": "The email/document content"
 }}"""
 
-                        response = model.generate_content(prompt)
-                        text = response.text.strip()
-
-                        # Robust JSON extraction
-                        if '```json' in text:
-                            text = text.split('```json')[1].split('```')[0].strip()
-                        elif '{' in text:
-                            text = text[text.find('{'):text.rfind('}')+1]
-
-                        result = json.loads(text)
-                        
-                        return {
-                            'success': True,
-                            'subject': result.get('subject', f"Regarding {instruction[:20]}"),
-                            'body': result.get('body', "Content error"),
-                            'provider': f'Gemini ({model_name})'
-                        }
-
-                    except Exception as e:
-                        err_msg = str(e)
-                        is_quota = "429" in err_msg or "quota" in err_msg.lower() or "exhausted" in err_msg.lower()
-                        
-                        if is_quota:
-                            print(f"⚠️ Quota exceeded on Key {key_index+1} with {model_name}. Trying next model/key...")
-                            last_error = f"Quota Exceeded ({model_name})"
-                            continue # Try next model with same key first
-                        else:
-                            print(f"⚠️ Failed with {model_name}: {err_msg}")
-                            last_error = err_msg
-                            continue # Try next model
-                
-                # If we exhausted models for this key, try next key (outer loop)
-                print(f"⚠️ All models exhausted for Key {key_index+1}. Switching keys...")
-                
-            except Exception as e:
-                # Configuration error or other key request failed
-                print(f"❌ Key {key_index+1} failed completely: {e}")
-                continue
+def extract_json_text(text):
+    """Strip code fences / chatter around the JSON object in a Gemini reply"""
+    text = text.strip()
+    if '```json' in text:
+        text = text.split('```json')[1].split('```')[0].strip()
+    elif '{' in text:
+        text = text[text.find('{'):text.rfind('}')+1]
+    return text
+
+def content_result(text, instruction, model):
+    """Parse a generation reply into the generate_with_gemini result shape"""
+    result = json.loads(extract_json_text(text))
+    return {
+        'success': True,
+        'subject': result.get('subject', f"Regarding {instruction[:20]}"),
+        'body': result.get('body', "Content error"),
+        'provider': f'Gemini ({model})'
+    }
+
+def generate_with_gemini(instruction, tone, length, sender_name):
+    """Generate professional content using Gemini AI via the LLM gateway"""
+    try:
+        # Length mapping
+        length_guide = {
+            'Short': '2-3 sentences, high-impact',
+            'Medium': '5-7 sentences, comprehensive',
+            'Long': '12+ sentences, detailed enterprise proposal'
+        }
+
+        if not llm_gateway.available:
+            return { 'success': False, 'error': "No GEMINI_API_KEY found. Please add to .env" }
+
+        try:
+            # The gateway picks the first healthy key/model pair and skips rate-limited ones
+            response = llm_gateway.generate(
+                build_content_prompt(instruction, tone),
+                models=CONTENT_MODELS,
+                cache=False,
+                generation_config=CONTENT_GENERATION_CONFIG
+            )
+            return content_result(response.text, instruction, response.model)
+        except Exception as e:
+            print(f"⚠️ Gemini generation failed: {e}")
 
         # OFFLINE FALLBACK MODE
         return generate_offline_content(instruction, sender_name)
@@ -482,7 +436,7 @@ def analyze_spam_offline(subject, body):
     }
 
 def analyze_spam_with_gemini(subject, body):
-    """Deep Spam Analysis using Gemini AI (with Key Rotation)"""
+    """Deep Spam Analysis using Gemini AI (via the LLM gateway)"""
     
     models_to_try = [
         'gemini-1.5-flash',
@@ -491,22 +445,10 @@ def analyze_spam_with_gemini(subject, body):
         'gemini-pro'
     ]
 
-    api_keys = get_gemini_keys()
-    if not api_keys:
+    if not llm_gateway.available:
         return analyze_spam_offline(subject, body)
 
-    last_error = None
-
-    for key_index, api_key in enumerate(api_keys):
-        try:
-            genai.configure(api_key=api_key)
-            
-            for model_name in models_to_try:
-                try:
-                    print(f"🔄 Analysis Neural Bridge (Key {key_index+1}): Attempting {model_name}...")
-                    model = genai.GenerativeModel(model_name)
-                    
-                    prompt = f"""As an AI Deliverability Expert, perform a RIGOROUS, EXACT parsing of this email for spam triggers:
+    prompt = f"""As an AI Deliverability Expert, perform a RIGOROUS, EXACT parsing of this email for spam triggers:
 Subject: {subject}
 Body: {body}
 
@@ -544,29 +486,22 @@ If Delivery Chance < 95%, you MUST include at least 2 specific "suggestions" to
 If Delivery Chance is 100%, suggest "A/B test the Subject Line" or "Perfectly optimized content".
 ONLY return valid JSON."""
 
-                    response = model.generate_content(prompt)
-                    text = response.text.strip()
-                    
-                    if '```json' in text:
-                        text = text.split('```json')[1].split('```')[0].strip()
-                    elif '{' in text:
-                        text = text[text.find('{'):text.rfind('}')+1]
-                    
-                    print(f"✅ Analysis Successful via {model_name}")
-                    return json.loads(text)
-
-                except Exception as e:
-                    err_msg = str(e)
-                    print(f"⚠️ Analysis failed with {model_name}: {err_msg}")
-                    last_error = err_msg
-                    continue
+    try:
+        response = llm_gateway.generate(prompt, models=models_to_try)
+        text = response.text.strip()
         
-        except Exception as e:
-            continue
+        if '```json' in text:
+            text = text.split('```json')[1].split('```')[0].strip()
+        elif '{' in text:
+            text = text[text.find('{'):text.rfind('}')+1]
+        
+        print(f"✅ Analysis Successful via {response.model}")
+        return json.loads(text)
 
-    # If all models fail
-    print(f"❌ All Gemini Analysis models exhausted. Error: {last_error}")
-    return analyze_spam_offline(subject, body)
+    except Exception as e:
+        # If all models fail
+        print(f"❌ Gemini Analysis failed: {e}")
+        return analyze_spam_offline(subject, body)
 
 @content_creation_bp.route("/generate", methods=["POST"])
 @login_required
@@ -601,6 +536,38 @@ def generate_content():
         return jsonify({"error": str(e)}), 500
 
 
+@content_creation_bp.route("/generate/stream", methods=["POST"])
+@login_required
+def generate_content_stream():
+    """/generate as Server-Sent Events: subject/body deltas, then the /generate body in `done`"""
+    data = request.json or {}
+    instruction = data.get("instruction", "")
+    sender_name = data.get("sender_name", "The Team")
+
+    if not instruction: return jsonify({"error": "Instruction required"}), 400
+
+    def with_analysis(gen_result):
+        return {
+            "subject": gen_result['subject'],
+            "body": gen_result['body'],
+            "provider": gen_result['provider'],
+            "analysis": analyze_spam_with_gemini(gen_result['subject'], gen_result['body'])
+        }
+
+    return event_stream_response(stream_generation(
+        lambda: llm_gateway.generate(
+            build_content_prompt(instruction, "Professional"),
+            models=CONTENT_MODELS,
+            stream=True,
+            generation_config=CONTENT_GENERATION_CONFIG
+        ),
+        lambda text, response: with_analysis(content_result(text, instruction, response.model)),
+        fields=("subject", "body"),
+        # Same offline fallback as /generate when no key/model can take the call
+        fallback=lambda e: with_analysis(generate_offline_content(instruction, sender_name))
+    ))
+
+
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -711,6 +678,64 @@ def analyze_content():
         print(f"❌ Analysis Route Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+REFINE_MODELS = ['gemini-1.5-flash']
+
+def build_refine_prompt(current_subject, current_body, refinement_instruction):
+    return f"""Task: Refine the following email content based SPECIFICALLY on this instruction: "{refinement_instruction}".
+                
+                CURRENT CONTENT:
+                Subject: {current_subject}
+                Body: {current_body}
+                
+                RULES:
+                1. ONLY apply the requested change. Do not rewrite the entire email style unless asked.
+                2. Keep the same placeholders ({{{{name}}}}, {{{{sender_name}}}}, etc).
+                3. Return the result in JSON: {{"subject": "...", "body": "..."}}
+                4. If the instruction is "Convert uppercase text to sentence case", fix capitalization throughout.
+                5. If the instruction is replacing a specific word, only replace that word contextually.
+                """
+
+def refine_result(text, current_subject, current_body):
+    """/refine response body from a Gemini reply"""
+    result = json.loads(extract_json_text(text))
+    return {
+        "success": True,
+        "subject": result.get('subject', current_subject),
+        "body": result.get('body', current_body),
+        "analysis": analyze_spam_with_gemini(result.get('subject'), result.get('body')) # Auto-reanalyze
+    }
+
+def refine_offline(current_subject, current_body, refinement_instruction):
+    """BASIC OFFLINE REFINEMENT LOGIC (Regex/String ops)"""
+    new_subject = current_subject
+    new_body = current_body
+    
+    if "uppercase" in refinement_instruction.lower():
+        new_subject = new_subject.title()
+        # Restore placeholders which might get messed up by title() if not careful, 
+        # but simple sentence case for body is better:
+        sentences = new_body.split('. ')
+        new_body = ". ".join([s.capitalize() for s in sentences])
+        
+    if "replace" in refinement_instruction.lower():
+        # Extract basic "Replace X with Y" pattern if possible, or just look up known maps
+        for spam, safe in SPAM_MAP.items():
+            if f"'{spam}'" in refinement_instruction or f" {spam} " in refinement_instruction:
+                # Case insensitive replace
+                pattern = re.compile(re.escape(spam), re.IGNORECASE)
+                new_body = pattern.sub(safe, new_body)
+                new_subject = pattern.sub(safe, new_subject)
+
+    if "punctuation" in refinement_instruction.lower():
+        new_body = new_body.replace("!!!", ".").replace("???", "?").replace("!!", ".").replace("??", "?")
+
+    return {
+        "success": True,
+        "subject": new_subject,
+        "body": new_body,
+        "analysis": analyze_spam_offline(new_subject, new_body) # Auto-reanalyze offline
+    }
+
 @content_creation_bp.route("/refine", methods=["POST"])
 @login_required
 def refine_content():
@@ -724,86 +749,52 @@ def refine_content():
              return jsonify({"error": "Refinement instruction required"}), 400
 
         # Attempt to use Gemini for intelligent refinement
-        api_keys = get_gemini_keys()
-        if api_keys:
+        if llm_gateway.available:
             try:
-                # Key rotation for refinement too
-                selected_key = random.choice(api_keys)
-                genai.configure(api_key=selected_key)
-                model = genai.GenerativeModel('gemini-1.5-flash')
-                
-                prompt = f"""Task: Refine the following email content based SPECIFICALLY on this instruction: "{refinement_instruction}".
-                
-                CURRENT CONTENT:
-                Subject: {current_subject}
-                Body: {current_body}
-                
-                RULES:
-                1. ONLY apply the requested change. Do not rewrite the entire email style unless asked.
-                2. Keep the same placeholders ({{{{name}}}}, {{{{sender_name}}}}, etc).
-                3. Return the result in JSON: {{"subject": "...", "body": "..."}}
-                4. If the instruction is "Convert uppercase text to sentence case", fix capitalization throughout.
-                5. If the instruction is replacing a specific word, only replace that word contextually.
-                """
-                
-                response = model.generate_content(prompt)
-                text = response.text.strip()
-                if '```json' in text:
-                    text = text.split('```json')[1].split('```')[0].strip()
-                elif '{' in text:
-                    text = text[text.find('{'):text.rfind('}')+1]
-                
-                result = json.loads(text)
-                return jsonify({
-                    "success": True,
-                    "subject": result.get('subject', current_subject),
-                    "body": result.get('body', current_body),
-                    "analysis": analyze_spam_with_gemini(result.get('subject'), result.get('body')) # Auto-reanalyze
-                })
+                response = llm_gateway.generate(
+                    build_refine_prompt(current_subject, current_body, refinement_instruction),
+                    models=REFINE_MODELS
+                )
+                return jsonify(refine_result(response.text, current_subject, current_body))
                 
             except Exception as ai_e:
                 print(f"⚠️ AI Refinement failed: {ai_e}. Falling back to basic logic.")
                 # Fallthrough to basic logic
         
-        # BASIC OFFLINE REFINEMENT LOGIC (Regex/String ops)
-        new_subject = current_subject
-        new_body = current_body
-        
-        if "uppercase" in refinement_instruction.lower():
-            new_subject = new_subject.title()
-            # Restore placeholders which might get messed up by title() if not careful, 
-            # but simple sentence case for body is better:
-            sentences = new_body.split('. ')
-            new_body = ". ".join([s.capitalize() for s in sentences])
-            
-        if "replace" in refinement_instruction.lower():
-            # Extract basic "Replace X with Y" pattern if possible, or just look up known maps
-            for spam, safe in SPAM_MAP.items():
-                if f"'{spam}'" in refinement_instruction or f" {spam} " in refinement_instruction:
-                    # Case insensitive replace
-                    pattern = re.compile(re.escape(spam), re.IGNORECASE)
-                    new_body = pattern.sub(safe, new_body)
-                    new_subject = pattern.sub(safe, new_subject)
-
-        if "punctuation" in refinement_instruction.lower():
-            new_body = new_body.replace("!!!", ".").replace("???", "?").replace("!!", ".").replace("??", "?")
-
-        return jsonify({
-            "success": True,
-            "subject": new_subject,
-            "body": new_body,
-            "analysis": analyze_spam_offline(new_subject, new_body) # Auto-reanalyze offline
-        })
+        return jsonify(refine_offline(current_subject, current_body, refinement_instruction))
 
     except Exception as e:
         print(f"❌ Refine Route Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@content_creation_bp.route("/refine/stream", methods=["POST"])
+@login_required
+def refine_content_stream():
+    """/refine as Server-Sent Events: subject/body deltas, then the /refine body in `done`"""
+    data = request.json or {}
+    current_subject = data.get("subject", "")
+    current_body = data.get("body", "")
+    refinement_instruction = data.get("refinement", "")
+
+    if not refinement_instruction:
+        return jsonify({"error": "Refinement instruction required"}), 400
+
+    return event_stream_response(stream_generation(
+        lambda: llm_gateway.generate(
+            build_refine_prompt(current_subject, current_body, refinement_instruction),
+            models=REFINE_MODELS,
+            stream=True
+        ),
+        lambda text, response: refine_result(text, current_subject, current_body),
+        fields=("subject", "body"),
+        fallback=lambda e: refine_offline(current_subject, current_body, refinement_instruction)
+    ))
+
 @content_creation_bp.route("/test", methods=["GET"])
 def test_route():
     """Test route to verify blueprint is registered"""
     return jsonify({
         "status": "ok",
         "message": "Content Creation API is running",
-        "gemini_keys_available": len(get_gemini_keys())
+        "gemini_keys_available": len(llm_gateway.keys)
     })
@@ -3,10 +3,13 @@ import pandas as pd
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from itertools import cycle
+from itertools import chain, cycle
 import threading
 from flask_cors import CORS
-import google.generativeai as genai
+from services.llm_gateway import llm_gateway, LLMUnavailableError
+from utils.llm_streaming import event_stream_response, stream_generation
+from services.event_log import reply_log, sent_email_log
+from utils.exports import EXPORT_MIMETYPES, export_response
 import os
 import re
 import time
@@ -141,6 +144,38 @@ def _maybe_send_auto_reply(user_id, tracking_id, campaign_id, recipient_email, s
         print(f"_maybe_send_auto_reply error: {e}")
         return False
 
+PROFESSIONAL_REPLY_MODELS = ['gemini-2.5-pro']
+
+TEMPLATE_REPLY = """Thank you for your email. I appreciate you reaching out to me. I will review your message and get back to you as soon as possible. If you have any urgent matters, please feel free to follow up.
+
+Best regards"""
+
+
+def build_professional_reply_prompt(original_email):
+    return f"""
+        Write a professional email reply to this message. 
+        Make it concise, polite, and business-appropriate.
+        Write only one reply in plain text format.
+        
+        Email to reply to: {original_email}
+        
+        Professional reply:
+        """
+
+
+def clean_reply_text(reply_text):
+    # Simple cleaning - remove any markdown formatting
+    reply_text = reply_text.strip()
+    reply_text = re.sub(r'\*\*(.*?)\*\*', r'\1', reply_text)  # Remove bold
+    reply_text = re.sub(r'\*(.*?)\*', r'\1', reply_text)  # Remove italic
+    return reply_text
+
+
+def is_quota_error(e):
+    error_msg = str(e)
+    return isinstance(e, LLMUnavailableError) or "quota" in error_msg.lower() or "429" in error_msg or "503" in error_msg
+
+
 @content_bp.route("/generate-professional-reply", methods=["POST"])
 @login_required
 def generate_professional_reply():
@@ -154,41 +189,50 @@ def generate_professional_reply():
     
     try:
         # Use Gemini to generate a professional reply
-        model = genai.GenerativeModel('gemini-2.5-pro')
-        prompt = f"""
-        Write a professional email reply to this message. 
-        Make it concise, polite, and business-appropriate.
-        Write only one reply in plain text format.
-        
-        Email to reply to: {original_email}
-        
-        Professional reply:
-        """
-        
-        response = model.generate_content(prompt)
-        
-        # Get the response and clean it
-        reply_text = response.text.strip()
-        
-        # Simple cleaning - remove any markdown formatting
-        reply_text = re.sub(r'\*\*(.*?)\*\*', r'\1', reply_text)  # Remove bold
-        reply_text = re.sub(r'\*(.*?)\*', r'\1', reply_text)  # Remove italic
+        response = llm_gateway.generate(
+            build_professional_reply_prompt(original_email),
+            models=PROFESSIONAL_REPLY_MODELS,
+            cache=False
+        )
         
-        return jsonify({"reply": reply_text})
+        return jsonify({"reply": clean_reply_text(response.text)})
     except Exception as e:
         error_msg = str(e)
         print(f"❌ Error generating reply: {error_msg}")
         
         # Fallback: Generate a basic professional reply if API fails
-        if "quota" in error_msg.lower() or "429" in error_msg or "503" in error_msg:
+        if is_quota_error(e):
             print("⚠️ API quota exceeded or service unavailable. Using template reply.")
-            fallback_reply = """Thank you for your email. I appreciate you reaching out to me. I will review your message and get back to you as soon as possible. If you have any urgent matters, please feel free to follow up.
-
-Best regards"""
-            return jsonify({"reply": fallback_reply, "is_template": True})
+            return jsonify({"reply": TEMPLATE_REPLY, "is_template": True})
         
         return jsonify({"error": str(e), "is_template": True}), 500
 
+
+@content_bp.route("/generate-professional-reply/stream", methods=["POST"])
+@login_required
+def generate_professional_reply_stream():
+    """Stream the reply as Server-Sent Events with markdown stripped on the fly; `done` carries the cleaned reply"""
+    data = request.json or {}
+    original_email = data.get("original_email")
+
+    if not original_email:
+        return jsonify({"error": "Missing email content"}), 400
+
+    def fallback(e):
+        if is_quota_error(e):
+            return {"reply": TEMPLATE_REPLY, "is_template": True}
+        return {"error": str(e), "is_template": True}
+
+    return event_stream_response(stream_generation(
+        lambda: llm_gateway.generate(
+            build_professional_reply_prompt(original_email),
+            models=PROFESSIONAL_REPLY_MODELS,
+            stream=True
+        ),
+        lambda text, response: {"reply": clean_reply_text(text)},
+        fallback=fallback
+    ))
+
 @content_bp.route("/generate-content", methods=["POST"])
 @login_required
 def generate_content():
@@ -1031,7 +1075,6 @@ def generate_reply():
     
     try:
         # Use Gemini to generate a reply
-        model = genai.GenerativeModel('gemini-2.5-pro')
         prompt = f"""
         Generate a professional reply to this email:
         
@@ -1043,14 +1086,14 @@ def generate_reply():
         Keep it concise and appropriate for a business context.
         """
         
-        response = model.generate_content(prompt)
+        response = llm_gateway.generate(prompt, models=['gemini-2.5-pro'], cache=False)
         return jsonify({"reply": response.text})
     except Exception as e:
         error_msg = str(e)
         print(f"❌ Error generating reply: {error_msg}")
         
         # Fallback: Generate a basic professional reply if API fails
-        if "quota" in error_msg.lower() or "429" in error_msg or "503" in error_msg:
+        if isinstance(e, LLMUnavailableError) or "quota" in error_msg.lower() or "429" in error_msg or "503" in error_msg:
             print("⚠️ API quota exceeded or service unavailable. Using template reply.")
             fallback_reply = """Thank you for your email. I appreciate you reaching out to me. I will review your message and get back to you as soon as possible. If you have any urgent matters, please feel free to follow up.
 
@@ -1112,7 +1155,7 @@ def send_reply():
             "phone": phone,
             "converted_to_lead": False,
             "zoho_lead_id": "N/A"
-        })
+        }, user_id=user_id)
         
         return jsonify({
             "message": "Reply sent successfully",
@@ -1124,20 +1167,30 @@ def send_reply():
 @content_bp.route("/download-replies", methods=["GET"])
 @login_required
 def download_replies():
-    """Download the Excel file with all captured replies"""
-    user_id = request.user["id"]
-    filename = "email_replies.xlsx"
-    
-    if not os.path.exists(filename):
-        return jsonify({"error": "No replies data available"}), 404
-    
+    """Download captured replies as Excel (default) or CSV (?format=csv)"""
+    return _export_event_log(reply_log, "No replies data available")
+
+@content_bp.route("/download-sent-emails", methods=["GET"])
+@login_required
+def download_sent_emails():
+    """Download the sent-email log as Excel (default) or CSV (?format=csv)"""
+    return _export_event_log(sent_email_log, "No sent emails logged yet")
+
+def _export_event_log(event_log, empty_message):
+    """Users get their own events; admins get the whole log"""
+    fmt = request.args.get("format", "xlsx").lower()
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({"error": "format must be xlsx or csv"}), 400
+
+    is_admin = request.user.get("role") in ("admin", "super_admin")
+    rows = event_log.rows(None if is_admin else request.user["id"])
+    first = next(rows, None)
+    if first is None:
+        return jsonify({"error": empty_message}), 404
+
     try:
-        return send_file(
-            filename,
-            as_attachment=True,
-            download_name=f"email_replies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        filename = f"{event_log.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return export_response(event_log.columns, chain([first], rows), filename, fmt)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -2273,17 +2326,27 @@ def get_campaign_history():
 @content_bp.route("/tracking/campaign-recipients", methods=["GET"])
 @login_required
 def get_campaign_recipients():
-    """Get paginated recipients for a campaign or specific sender"""
+    """Get paginated recipients for a campaign or specific sender
+
+    Pass the previous response's nextCursor as ?after= to page forward
+    without OFFSET; ?page= still selects a page by number.
+    """
     campaign_id = request.args.get("campaignId", type=int)
     sender_email = request.args.get("senderEmail")
     page = request.args.get("page", default=1, type=int)
     page_size = request.args.get("pageSize", default=10, type=int)
+    after = request.args.get("after")
     
     if not campaign_id:
         return jsonify({"error": "campaignId is required"}), 400
         
     try:
-        data = db.get_paginated_recipients(campaign_id, sender_email, page, page_size)
+        after = db.decode_recipient_cursor(after) if after else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
+    try:
+        data = db.get_paginated_recipients(campaign_id, sender_email, max(page, 1), min(max(page_size, 1), 1000), after)
         return jsonify(data)
     except Exception as e:
         print(f"Error in get_campaign_recipients: {e}")
@@ -2324,58 +2387,43 @@ def get_recipient_replies():
         print(f"Error in get_recipient_replies: {e}")
         return jsonify({"error": str(e)}), 500
 
+RECIPIENT_EXPORT_COLUMNS = [
+    'sender_email',
+    'recipient_email',
+    'recipient_name',
+    'status',
+    'sent_time',
+    'reply_message',
+    'reply_time'
+]
+
 @content_bp.route("/tracking/download-recipients", methods=["GET"])
 @login_required
 def download_recipients_csv():
-    """Download recipients for a campaign or sender as CSV"""
+    """Download recipients for a campaign or sender as CSV (gzip if accepted) or ?format=xlsx"""
     campaign_id = request.args.get("campaignId", type=int)
     sender_email = request.args.get("senderEmail")
+    fmt = request.args.get("format", "csv").lower()
     
     if not campaign_id:
         return jsonify({"error": "campaignId is required"}), 400
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({"error": "format must be csv or xlsx"}), 400
         
     try:
-        # Fetch all recipients for this filter (no pagination)
-        data = db.get_paginated_recipients(campaign_id, sender_email, page=1, page_size=1000000)
-        recipients = data.get("recipients", [])
+        # Rows come straight off a database cursor; nothing is held beyond one batch
+        recipients = db.iter_recipients(campaign_id, sender_email)
+        first = next(recipients, None)
         
-        if not recipients:
+        if first is None:
             return jsonify({"error": "No recipients found"}), 404
-            
-        # Create CSV in memory and ensure sender_email column is present
-        df = pd.DataFrame(recipients)
-        # Ensure column exists even if data lacks it for some rows
-        if 'sender_email' not in df.columns:
-            df['sender_email'] = ''
-        
-        # Preferred column order with sender_email included
-        preferred_cols = [
-            'sender_email',
-            'recipient_email',
-            'recipient_name',
-            'status',
-            'sent_time',
-            'reply_message',
-            'reply_time'
-        ]
-        # Use intersection to avoid KeyErrors if some columns are missing
-        cols_in_df = [c for c in preferred_cols if c in df.columns]
-        # Place any extra columns at the end
-        extra_cols = [c for c in df.columns if c not in cols_in_df]
-        ordered_cols = cols_in_df + extra_cols
-        
-        writer = df[ordered_cols].to_csv(index=False)
-        
-        filename = f"campaign_{campaign_id}_recipients.csv"
+        
+        filename = f"campaign_{campaign_id}_recipients"
         if sender_email:
-            filename = f"campaign_{campaign_id}_{sender_email}_recipients.csv"
+            filename = f"campaign_{campaign_id}_{sender_email}_recipients"
             
-        return send_file(
-            io.BytesIO(writer.encode()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=filename
-        )
+        rows = ([recipient.get(c) for c in RECIPIENT_EXPORT_COLUMNS] for recipient in chain([first], recipients))
+        return export_response(RECIPIENT_EXPORT_COLUMNS, rows, filename, fmt)
     except Exception as e:
         print(f"Error in download_recipients_csv: {e}")
         return jsonify({"error": str(e)}), 500
@@ -3499,7 +3547,7 @@ def send_single_email():
                 "last_name": " ".join(name.split()[1:]) if name else "",
                 "company": "",
                 "phone": ""
-            })
+            }, user_id=request.user["id"])
             return jsonify({"message": f"Email sent successfully to {recipient_email}!"})
         else:
             return jsonify({"error": error}), 500
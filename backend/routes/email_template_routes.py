@@ -4,19 +4,19 @@ import io
 import threading
 import time
 import os
-import re
 import json
 from datetime import datetime
 from config import app_state
 from database import db
 from services.service import send_email_with_provider, detect_email_provider, get_provider_settings
 from utils.helpers import extract_name_from_email
+from utils.templating import compile_template
 from routes.auth_routes import login_required
-# Import zoho_handler for lead integration
+# Leads are queued and batched to Zoho CRM off the send path
 try:
-    from routes.zoho_routes import zoho_handler
+    from routes.zoho_routes import zoho_sync_queue
 except ImportError:
-    zoho_handler = None
+    zoho_sync_queue = None
 
 email_template_bp = Blueprint('email_template', __name__)
 
@@ -65,6 +65,11 @@ def run_template_campaign(user_id, subject_template, body_template, sender_data,
 
         # Delay between sends; min 0.4s to stay under common provider burst limits
         send_delay = max(60.0 / max(rate_pm, 1), 0.4)
+
+        # Parse the campaign templates once; each recipient is then a single join.
+        # Only {{key}} is substituted here, so bracketed text like [Event Title] stays as written
+        subject_compiled = compile_template(subject_template, aliases=False)
+        body_compiled = compile_template(body_template, aliases=False)
         
         for recipient in recipients:
             try:
@@ -107,22 +112,10 @@ def run_template_campaign(user_id, subject_template, body_template, sender_data,
                 })
                 
                 # Clean strings for replacement
-                def clean_val(v):
-                    return str(v) if not pd.isna(v) else ""
-
-                # Robust Placeholder Replacement
-                def smart_replace(text, ctx):
-                    if not text: return ""
-                    pattern = re.compile(r'\{\{\s*(.*?)\s*\}\}', re.IGNORECASE)
-                    
-                    def replace_match(match):
-                        key = match.group(1).lower().replace(' ', '_')
-                        return clean_val(ctx.get(key, match.group(0))) 
-                    
-                    return pattern.sub(replace_match, text)
+                values = {k: (str(v) if not pd.isna(v) else "") for k, v in context.items()}
 
-                p_subject = smart_replace(subject_template, context)
-                p_body = smart_replace(body_template, context)
+                p_subject = subject_compiled.render(values)
+                p_body = body_compiled.render(values)
                 
                 # Send email
                 success, error = send_email_with_provider(
@@ -164,7 +157,7 @@ def run_template_campaign(user_id, subject_template, body_template, sender_data,
                             print(f"Warning: tracking save skipped for {r_email}: {te}")
                         
                         # INTEGRATE WITH ZOHO CRM
-                        if zoho_handler:
+                        if zoho_sync_queue:
                             try:
                                 lead_data = {
                                     'first_name': r_name.split()[0] if r_name else 'Lead',
@@ -180,11 +173,7 @@ def run_template_campaign(user_id, subject_template, body_template, sender_data,
                                 except:
                                     z_user_id = 1
                                     
-                                z_success, z_msg = zoho_handler.create_lead_in_zoho(user_id=z_user_id, lead_data=lead_data)
-                                if z_success:
-                                    print(f"Lead added to Zoho for {r_email}")
-                                else:
-                                    print(f"Failed to add lead to Zoho for {r_email}: {z_msg}")
+                                zoho_sync_queue.enqueue(z_user_id, lead_data, campaign_id=campaign_id)
                             except Exception as ze:
                                 print(f"Zoho integration error for {r_email}: {ze}")
 
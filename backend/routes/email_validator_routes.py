@@ -16,12 +16,12 @@ Returns JSON summary and saves validated-emails.xlsx
 
 from flask import Blueprint, request, jsonify, send_file
 from werkzeug.utils import secure_filename
+from utils.exports import export_response
 import io
 import os
 import re
 import random
 import string
-import socket
 import smtplib
 from typing import Optional, Tuple
 
@@ -85,7 +85,6 @@ def check_mx(domain: str) -> Tuple[bool, Optional[str], str]:
 
 def _smtp_connect(mx_host: str, timeout: int = 10) -> Optional[smtplib.SMTP]:
     try:
-        socket.setdefaulttimeout(timeout)
         server = smtplib.SMTP(mx_host, 25, timeout=timeout)
         server.ehlo_or_helo_if_needed()
         # Some servers require TLS for any RCPT checks
@@ -304,10 +303,27 @@ def validate_emails_route():
         return jsonify({"error": f"Internal error: {e}"}), 500
 
 
+def _iter_xlsx_rows(path):
+    """Rows of the first sheet, read lazily (openpyxl read-only mode)"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
 @email_validator_bp.route("/download/validated-emails", methods=["GET"])
 def download_validated_emails():
+    """The last validation result as the saved workbook, or ?format=csv streamed (gzip if accepted)"""
     out_path = os.path.join(os.path.dirname(__file__), "..", "validated-emails.xlsx")
     out_path = os.path.abspath(out_path)
     if not os.path.exists(out_path):
         return jsonify({"error": "File not found. Run /validate-emails first."}), 404
-    return send_file(out_path, as_attachment=True)
+    if request.args.get("format", "xlsx").lower() != "csv":
+        return send_file(out_path, as_attachment=True)
+
+    rows = _iter_xlsx_rows(out_path)
+    header = list(next(rows, None) or ["Email", "Validation Status"])
+    return export_response(header, rows, "validated-emails", "csv")
@@ -4,19 +4,16 @@ from routes.auth_routes import login_required
 from datetime import datetime
 import json
 import threading
-import time
 import random
 import os
-from config import GENAI_API_KEY
-import google.generativeai as genai
-from ddgs import DDGS
+from services.llm_gateway import llm_gateway
+from services.search_client import search_client
 import requests
 import re
 from bs4 import BeautifulSoup
 from routes.webscraping_routes import scrape_company_for_contacts_enhanced, find_company_website_advanced
 from routes.EmailGenerateAndValidator_routes import CompanyEmailProcessor
 
-genai.configure(api_key=GENAI_API_KEY)
 email_processor = CompanyEmailProcessor()
 
 event_discovery_bp = Blueprint('event_discovery', __name__)
@@ -25,22 +22,21 @@ event_discovery_bp = Blueprint('event_discovery', __name__)
 def find_exact_profile_url(name, company, platform="LinkedIn"):
     """Search for the exact profile URL using DuckDuckGo."""
     try:
-        with DDGS() as ddgs:
-            # Targeted query for LinkedIn profiles
-            if platform == "LinkedIn":
-                query = f'site:linkedin.com/in/ "{name}" "{company}"'
-            else:
-                query = f'site:{platform.lower()}.com "{name}" "{company}"'
-            
-            results = list(ddgs.text(query, max_results=2))
-            for res in results:
-                url = res.get('href', '')
-                if platform == "LinkedIn" and "/in/" in url:
-                    return url
-                if platform == "Twitter" and "twitter.com/" in url and "/status/" not in url:
-                    return url
-                if platform == "Facebook" and "facebook.com/" in url:
-                    return url
+        # Targeted query for LinkedIn profiles
+        if platform == "LinkedIn":
+            query = f'site:linkedin.com/in/ "{name}" "{company}"'
+        else:
+            query = f'site:{platform.lower()}.com "{name}" "{company}"'
+        
+        results = search_client.text(query, max_results=2)
+        for res in results:
+            url = res.get('href', '')
+            if platform == "LinkedIn" and "/in/" in url:
+                return url
+            if platform == "Twitter" and "twitter.com/" in url and "/status/" not in url:
+                return url
+            if platform == "Facebook" and "facebook.com/" in url:
+                return url
     except Exception as e:
         print(f"Agentic search error: {e}")
     
@@ -80,27 +76,25 @@ def discover_leads_task(event_id, event_name, location, platforms, keywords, is_
         official_site = None
         
         try:
-            with DDGS() as ddgs:
-                # Determine search queries based on worldwide flag
-                queries_to_run = []
-                if is_worldwide:
-                    major_cities = ['New York', 'London', 'Dubai', 'Singapore', 'Berlin']
-                    for city in major_cities:
-                        queries_to_run.append(f"{event_name} {city} speakers exhibitors list sponsors official site")
-                else:
-                    loc_str = location if location else ""
-                    queries_to_run.append(f"{event_name} {loc_str} speakers exhibitors list sponsors official site")
+            # Determine search queries based on worldwide flag
+            queries_to_run = []
+            if is_worldwide:
+                major_cities = ['New York', 'London', 'Dubai', 'Singapore', 'Berlin']
+                for city in major_cities:
+                    queries_to_run.append(f"{event_name} {city} speakers exhibitors list sponsors official site")
+            else:
+                loc_str = location if location else ""
+                queries_to_run.append(f"{event_name} {loc_str} speakers exhibitors list sponsors official site")
 
-                for query in queries_to_run:
-                    print(f"   🔍 Global Search: {query}")
-                    results = list(ddgs.text(query, max_results=3)) # Reduced per-query for speed
-                    for res in results:
-                        search_results_text += f"\n{res['title']}: {res['body']} ({res['href']})"
-                        if not official_site and any(k in res['href'].lower() for k in [event_name.lower().split()[0], 'event', 'conf']):
-                            official_site = res['href']
-                    
-                    if official_site: break # Found site, stop looking
-                    time.sleep(1)
+            for query in queries_to_run:
+                print(f"   🔍 Global Search: {query}")
+                results = search_client.text(query, max_results=3) # Reduced per-query for speed
+                for res in results:
+                    search_results_text += f"\n{res['title']}: {res['body']} ({res['href']})"
+                    if not official_site and any(k in res['href'].lower() for k in [event_name.lower().split()[0], 'event', 'conf']):
+                        official_site = res['href']
+                
+                if official_site: break # Found site, stop looking
 
         except Exception as e:
             print(f"⚠️ Search Stage Note: {e}")
@@ -128,84 +122,81 @@ def discover_leads_task(event_id, event_name, location, platforms, keywords, is_
         if len(leads_extracted) < 10:
             print(f"🕵️ REAL DISCOVERY: Searching for leads related to {event_name}")
             try:
-                with DDGS() as ddgs:
-                    # Construct queries to find people
-                    queries = [
-                        f'site:linkedin.com/in/ "{event_name}"',
-                        f'site:linkedin.com/in/ ("{event_name}" AND "{keywords}")', 
-                        f'site:linkedin.com/in/ {keywords} {location}' 
-                    ]
+                # Construct queries to find people
+                queries = [
+                    f'site:linkedin.com/in/ "{event_name}"',
+                    f'site:linkedin.com/in/ ("{event_name}" AND "{keywords}")', 
+                    f'site:linkedin.com/in/ {keywords} {location}' 
+                ]
+                
+                seen_urls = set(l['url'] for l in leads_extracted)
+                
+                for query in queries:
+                    if len(leads_extracted) >= 15: break
                     
-                    seen_urls = set(l['url'] for l in leads_extracted)
+                    print(f"   🔍 Querying: {query}")
+                    # Fetch more results to filter down
+                    results = search_client.text(query, max_results=6)
                     
-                    for query in queries:
+                    for res in results:
                         if len(leads_extracted) >= 15: break
                         
-                        print(f"   🔍 Querying: {query}")
-                        # Fetch more results to filter down
-                        results = list(ddgs.text(query, max_results=6))
+                        url = res['href']
+                        if url in seen_urls: continue
                         
-                        for res in results:
-                            if len(leads_extracted) >= 15: break
-                            
-                            url = res['href']
-                            if url in seen_urls: continue
-                            
-                            # STRICT FILTER: Only accept actual Profile URLs
-                            if "linkedin.com/in/" not in url and "linkedin.com/pub/" not in url:
-                                continue
-                            
-                            title = res['title']
-                            
-                            # Parse Name and Role from Title
-                            # Format often: "Name - Title - Company | LinkedIn" or "Name - Job | LinkedIn"
-                            clean_title = title.replace(" | LinkedIn", "").replace(" - LinkedIn", "").replace(" | LinkedIn", "")
+                        # STRICT FILTER: Only accept actual Profile URLs
+                        if "linkedin.com/in/" not in url and "linkedin.com/pub/" not in url:
+                            continue
+                        
+                        title = res['title']
+                        
+                        # Parse Name and Role from Title
+                        # Format often: "Name - Title - Company | LinkedIn" or "Name - Job | LinkedIn"
+                        clean_title = title.replace(" | LinkedIn", "").replace(" - LinkedIn", "").replace(" | LinkedIn", "")
+                        
+                        # Use regex to split by common separators: - , |
+                        parts = [p.strip() for p in re.split(r'[-–|]', clean_title)]
+                        
+                        if len(parts) >= 3:
+                            name = parts[0]
+                            job_title = parts[1]
+                            company = parts[2]
+                        elif len(parts) == 2:
+                            name = parts[0]
+                            job_title = parts[1]
+                            company = event_name
+                        else:
+                            name = clean_title
+                            job_title = "Professional"
+                            company = event_name
                             
-                            # Use regex to split by common separators: - , |
-                            parts = [p.strip() for p in re.split(r'[-–|]', clean_title)]
+                        # Skip if name looks like a generic page title
+                        if any(x in name.lower() for x in ['profiles', 'jobs', 'hiring', 'linkedin', 'login', 'signup', 'posts', 'people']):
+                            continue
                             
-                            if len(parts) >= 3:
-                                name = parts[0]
-                                job_title = parts[1]
-                                company = parts[2]
-                            elif len(parts) == 2:
-                                name = parts[0]
-                                job_title = parts[1]
-                                company = event_name
-                            else:
-                                name = clean_title
-                                job_title = "Professional"
-                                company = event_name
-                                
-                            # Skip if name looks like a generic page title
-                            if any(x in name.lower() for x in ['profiles', 'jobs', 'hiring', 'linkedin', 'login', 'signup', 'posts', 'people']):
-                                continue
-                                
-                            # Clean up name (getting rid of degrees or extra garbage)
-                            name = name.split(',')[0].strip()
+                        # Clean up name (getting rid of degrees or extra garbage)
+                        name = name.split(',')[0].strip()
 
-                            # Try to find real company website using advanced search if company is real
-                            website = None
-                            if company and company != event_name:
-                                try:
-                                    # Use a lightweight heuristic first to avoid slow scraping during loop
-                                    company_clean = re.sub(r'[^a-zA-Z0-9]', '', company).lower()
-                                    website = f"https://{company_clean}.com"
-                                except: pass
-                            else:
-                                website = official_site
+                        # Try to find real company website using advanced search if company is real
+                        website = None
+                        if company and company != event_name:
+                            try:
+                                # Use a lightweight heuristic first to avoid slow scraping during loop
+                                company_clean = re.sub(r'[^a-zA-Z0-9]', '', company).lower()
+                                website = f"https://{company_clean}.com"
+                            except: pass
+                        else:
+                            website = official_site
 
-                            leads_extracted.append({
-                                "name": name,
-                                "job_title": job_title,
-                                "company": company,
-                                "source": "LinkedIn",
-                                "url": url,
-                                "website": website
-                            })
-                            seen_urls.add(url)
-                        
-                        time.sleep(0.2) # Rate limit protection
+                        leads_extracted.append({
+                            "name": name,
+                            "job_title": job_title,
+                            "company": company,
+                            "source": "LinkedIn",
+                            "url": url,
+                            "website": website
+                        })
+                        seen_urls.add(url)
             except Exception as e:
                 print(f"Real discovery error: {e}")
         
@@ -223,7 +214,6 @@ def discover_leads_task(event_id, event_name, location, platforms, keywords, is_
 
         # --- STAGE 3: AI Verification & Scoring ---
         print(f"🧠 ANALYZING: Scoring {len(leads_extracted)} leads against ICP criteria")
-        model = genai.GenerativeModel('gemini-1.5-flash')
         
         verified_count = 0
         for lead in leads_extracted:
@@ -373,7 +363,6 @@ def get_lead_insights(lead_id):
         lead = dict(lead)
         if lead.get('ai_insights'): return jsonify({"insights": json.loads(lead['ai_insights'])})
 
-        model = genai.GenerativeModel('gemini-1.5-flash')
         prompt = f"""
         Analyze {lead['name']} ({lead['job_title']} at {lead['company_name']}).
         Return a JSON object with:
@@ -382,7 +371,7 @@ def get_lead_insights(lead_id):
         - hooks: [3 unique opening lines]
         - score_rationale: brief explaination of potential value
         """
-        response = model.generate_content(prompt)
+        response = llm_gateway.generate(prompt, models=['gemini-1.5-flash'])
         text = response.text
         
         import re
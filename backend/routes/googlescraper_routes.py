@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify, send_file
 from flask_cors import cross_origin
+from services.job_runner import background_job, carry_job, report_progress
+from services.browser_pool import BrowserPool
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 import time
 import pandas as pd
 import os
@@ -7,6 +11,9 @@ import sys
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.firefox.service import Service as FirefoxService
@@ -18,14 +25,32 @@ from webdriver_manager.chrome import ChromeDriverManager
 from webdriver_manager.firefox import GeckoDriverManager
 from webdriver_manager.microsoft import EdgeChromiumDriverManager
 import traceback
-import random
 import platform
 import subprocess
 import struct
+import threading
 
 # Create blueprint with proper name
 googlescraper_bp = Blueprint('googlescraper', __name__)
 
+# Explicit waits replace fixed sleeps; implicit waits stay off so a missing
+# optional element fails immediately instead of stalling every lookup
+WAIT_TIMEOUT = int(os.getenv("SCRAPER_WAIT_TIMEOUT", 15))
+OPTIONAL_WAIT_TIMEOUT = 3
+IMPLICIT_WAIT_SECONDS = 0
+
+# Deep scrape: place pages extracted in parallel, and a budget for the whole request
+SCRAPE_MAX_PLACES = 3
+SCRAPE_FANOUT = int(os.getenv("SCRAPE_FANOUT", 3))
+SCRAPE_DEADLINE_SECONDS = int(os.getenv("SCRAPE_DEADLINE_SECONDS", 90))
+
+# Requests the scrapers never read; blocked in Chromium tabs via CDP
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm", "*.mp3", "*.m4a", "*.ogg",
+]
+
 # -------------------- SYSTEM DETECTION --------------------
 def get_system_architecture():
     """Get system architecture"""
@@ -192,6 +217,32 @@ def detect_available_browsers():
     print(f"✅ Available browsers: {available}")
     return available
 
+_auto_browser = None
+_auto_browser_lock = threading.Lock()
+
+def resolve_browser(browser="auto"):
+    """Map "auto" to a concrete browser; detection runs once per process"""
+    global _auto_browser
+    browser = (browser or "auto").lower()
+    if browser != "auto":
+        return browser
+
+    with _auto_browser_lock:
+        if _auto_browser is None:
+            available_browsers = detect_available_browsers()
+            # Remove 'auto' from the list for selection
+            available_browsers = [b for b in available_browsers if b != "auto"]
+            
+            if not available_browsers:
+                raise Exception("No supported browser found. Please install Chrome, Firefox, or Edge.")
+            # Prefer Chrome, then Firefox, then Edge, then Safari
+            for preferred in ["chrome", "firefox", "edge", "safari"]:
+                if preferred in available_browsers:
+                    _auto_browser = preferred
+                    print(f"🤖 Auto-selected: {_auto_browser}")
+                    break
+        return _auto_browser
+
 def start_driver(browser="auto", headless=True):
     """
     Start a WebDriver for the specified browser.
@@ -202,23 +253,7 @@ def start_driver(browser="auto", headless=True):
     """
     print(f"🚀 Starting driver: browser={browser}, headless={headless}")
     
-    # Auto-detect browser if not specified
-    if browser == "auto":
-        available_browsers = detect_available_browsers()
-        # Remove 'auto' from the list for selection
-        available_browsers = [b for b in available_browsers if b != "auto"]
-        
-        if available_browsers:
-            # Prefer Chrome, then Firefox, then Edge, then Safari
-            for preferred in ["chrome", "firefox", "edge", "safari"]:
-                if preferred in available_browsers:
-                    browser = preferred
-                    print(f"🤖 Auto-selected: {browser}")
-                    break
-        else:
-            raise Exception("No supported browser found. Please install Chrome, Firefox, or Edge.")
-    
-    browser = browser.lower()
+    browser = resolve_browser(browser)
     
     if browser == "chrome":
         return start_chrome_driver(headless)
@@ -258,6 +293,12 @@ def start_chrome_driver(headless=True):
         # Additional arguments to prevent detection
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.media_stream": 2,
+        })
+        # Return once the DOM is ready; explicit waits cover the rest
+        options.page_load_strategy = "eager"
         options.add_argument('--disable-blink-features=AutomationControlled')
 
         if headless:
@@ -298,7 +339,7 @@ def start_chrome_driver(headless=True):
             service = Service()
             driver = webdriver.Chrome(service=service, options=options)
         
-        driver.implicitly_wait(10)
+        driver.implicitly_wait(IMPLICIT_WAIT_SECONDS)
         print("✅ Chrome driver started successfully")
         return driver
         
@@ -318,6 +359,11 @@ def start_firefox_driver(headless=True):
         # Set user agent
         options.set_preference("general.useragent.override", 
                               "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0")
+        # Skip images, web fonts and autoplaying media
+        options.set_preference("permissions.default.image", 2)
+        options.set_preference("browser.display.use_document_fonts", 0)
+        options.set_preference("media.autoplay.default", 5)
+        options.page_load_strategy = "eager"
         
         if headless:
             options.add_argument("--headless")
@@ -333,7 +379,7 @@ def start_firefox_driver(headless=True):
             service = FirefoxService()
         
         driver = webdriver.Firefox(service=service, options=options)
-        driver.implicitly_wait(10)
+        driver.implicitly_wait(IMPLICIT_WAIT_SECONDS)
         print("✅ Firefox driver started successfully")
         return driver
         
@@ -354,6 +400,10 @@ def start_edge_driver(headless=True):
             "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
             "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edge/120.0.0.0"
         )
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+        })
+        options.page_load_strategy = "eager"
         
         if headless:
             options.add_argument("--headless=new")
@@ -370,7 +420,7 @@ def start_edge_driver(headless=True):
             service = EdgeService()
         
         driver = webdriver.Edge(service=service, options=options)
-        driver.implicitly_wait(10)
+        driver.implicitly_wait(IMPLICIT_WAIT_SECONDS)
         print("✅ Edge driver started successfully")
         return driver
         
@@ -388,13 +438,126 @@ def start_safari_driver(headless=False):
         options = SafariOptions()
         # Safari options are limited compared to other browsers
         driver = webdriver.Safari(options=options)
-        driver.implicitly_wait(10)
+        driver.implicitly_wait(IMPLICIT_WAIT_SECONDS)
         print("✅ Safari driver started successfully")
         return driver
     except Exception as e:
         print(f"❌ Safari driver startup failed: {e}")
         raise Exception(f"Failed to start Safari: {str(e)}")
 
+def prepare_tab(driver):
+    """Block heavy resources in a freshly opened tab (Chromium only; CDP is per tab)"""
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_RESOURCE_PATTERNS})
+    except Exception as e:
+        print(f"⚠️ Could not enable resource blocking: {e}")
+
+# Warm browsers shared by scrape requests (see services/browser_pool.py)
+browser_pool = BrowserPool(start_driver, resolve=resolve_browser, prepare=prepare_tab)
+
+if int(os.getenv("BROWSER_POOL_WARM", 0)) > 0:
+    threading.Thread(
+        target=browser_pool.warm,
+        kwargs={"count": int(os.getenv("BROWSER_POOL_WARM", 0))},
+        daemon=True
+    ).start()
+
+class StageTimer:
+    """Wall-clock milliseconds per scrape stage, returned in the response metadata"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        report_progress(stage=name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = round((time.perf_counter() - start) * 1000)
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0) + elapsed
+
+    def report(self):
+        with self._lock:
+            return {**self.stages, "total": round((time.perf_counter() - self.started) * 1000)}
+
+def seconds_left(deadline):
+    return max(0.0, deadline - time.monotonic())
+
+def result_by_deadline(future, deadline, name, errors):
+    """Result of a stage future, or None (with a note in errors) if it failed or ran out of time"""
+    if future is None:
+        return None
+    try:
+        return future.result(timeout=seconds_left(deadline))
+    except FuturesTimeout:
+        errors.append(f"{name} timed out")
+    except Exception as e:
+        errors.append(f"{name} failed: {e}")
+    return None
+
+def wait_for(driver, condition, timeout=WAIT_TIMEOUT):
+    """WebDriverWait wrapper that returns None instead of raising on timeout"""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.2).until(condition)
+    except TimeoutException:
+        return None
+
+def element_text(selector):
+    """Condition: the first element matching selector has non-empty text"""
+    def condition(driver):
+        elems = driver.find_elements(By.CSS_SELECTOR, selector)
+        return elems[0].text.strip() if elems and elems[0].text.strip() else False
+    return condition
+
+# -------------------- MAPS LISTING --------------------
+MAPS_RESULT_SELECTORS = ["a.hfpxzc", "div.m6VPy", "div.qBF1Pd", "[aria-label*='Results for'] a"]
+
+def search_maps_listing(driver, search_url, max_results):
+    """Open a Maps search and return up to max_results place URLs"""
+    target_urls = []
+    driver.get(search_url)
+
+    # Results list, or a redirect straight to a single place page
+    loaded = wait_for(driver, EC.any_of(
+        *[EC.presence_of_element_located((By.CSS_SELECTOR, s)) for s in MAPS_RESULT_SELECTORS],
+        EC.url_contains("/maps/place/"),
+    ))
+    if not loaded:
+        print("⚠️ Maps results did not load in time")
+        return target_urls
+
+    if "/maps/place/" in driver.current_url:
+        return [driver.current_url]
+
+    # Try to find Results
+    try:
+        # Look for list items first
+        for selector in MAPS_RESULT_SELECTORS:
+            elems = driver.find_elements(By.CSS_SELECTOR, selector)
+            if elems:
+                for e in elems[:max_results]:
+                    try:
+                        href = e.get_attribute("href")
+                        if href and "/place/" in href: target_urls.append(href)
+                    except: pass
+                if target_urls: break
+    except:
+        pass
+    return target_urls
+
+def find_maps_places(search_url, max_results, browser, headless, deadline, timer):
+    with timer.stage("maps_search"):
+        with browser_pool.lease(browser, headless, timeout=seconds_left(deadline)) as driver:
+            return search_maps_listing(driver, search_url, max_results)
+
 # -------------------- PARSE EACH PLACE --------------------
 def parse_place_page(driver, url):
     data = {
@@ -408,13 +571,14 @@ def parse_place_page(driver, url):
 
     try:
         driver.get(url)
-        time.sleep(2 + random.random() * 1.5)
 
-        # Name
-        try:
-            data["name"] = driver.find_element(By.CSS_SELECTOR, "h1").text.strip()
-        except:
-            pass
+        # Name (the place panel renders after the DOM is ready)
+        name = wait_for(driver, element_text("h1"))
+        if name:
+            data["name"] = name
+        # Address/phone/website buttons follow the title; not every place has them
+        wait_for(driver, EC.presence_of_element_located(
+            (By.CSS_SELECTOR, 'button[jsaction][data-item-id]')), OPTIONAL_WAIT_TIMEOUT)
 
         # Rating
         try:
@@ -525,19 +689,44 @@ def extract_participants(driver, event_name, website):
     ]
     return participants
 
-# -------------------- SCRAPE ENDPOINT --------------------
+def scrape_place(url, browser, headless, deadline):
+    """Full event result for one Maps place, extracted on its own pooled browser"""
+    with browser_pool.lease(browser, headless, timeout=seconds_left(deadline)) as driver:
+        place_data = parse_place_page(driver, url)
+        event_details = infer_event_details(driver, place_data)
+        participants = extract_participants(driver, event_details["name"], event_details["official_website"])
+
+    return {
+        "event": event_details,
+        "participants": participants,
+        "metadata": {
+            "sources_used": ["Google Maps", "Web Intelligence"],
+            "scrape_timestamp": datetime.now().isoformat(),
+            "errors": []
+        }
+    }
+
 # -------------------- COMMUDLE SCRAPER --------------------
-def scrape_commudle(driver, query):
-    """Scrape events from Commudle - Optimized for Speed"""
-    print(f"🕵️ Searching Commudle for: {query}")
+def find_commudle_events(query, browser, headless, deadline, timer):
+    """Commudle over HTTP first; a pooled browser is leased only for the Selenium fallback"""
+    with timer.stage("commudle"):
+        print(f"🕵️ Searching Commudle for: {query}")
+        events = scrape_commudle_http(query)
+        if events:
+            return events
+        with browser_pool.lease(browser, headless, timeout=seconds_left(deadline)) as driver:
+            return scrape_commudle_selenium(driver, query)
+
+def scrape_commudle_http(query):
+    """Commudle events from the static page (fast path)"""
     events = []
     
     # METHOD 1: Try Requests (Blazing Fast) - if available
     try:
-        import requests
+        from services.http_client import http_client
         from bs4 import BeautifulSoup
         print("⚡ Using fast http scraping for Commudle...")
-        response = requests.get("https://www.commudle.com/events", timeout=5)
+        response = http_client.get_cached("https://www.commudle.com/events", timeout=5)
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, 'html.parser')
             cards = soup.select("a.upcoming-card-link")
@@ -592,15 +781,21 @@ def scrape_commudle(driver, query):
                 except Exception as e:
                     continue
             
-            if events:
-                return events
     except Exception as e:
         print(f"⚠️ Fast scraping failed: {e}, falling back to Selenium")
 
+    return events
+
+def scrape_commudle_selenium(driver, query):
+    """Commudle events rendered in a browser (fallback)"""
+    events = []
+
     # METHOD 2: Selenium (Fallback)
     try:
         driver.get("https://www.commudle.com/events")
-        time.sleep(2) # Short wait due to eager load
+        if not wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, "a.upcoming-card-link"))):
+            print("⚠️ No Commudle event cards rendered in time")
+            return events
 
         # Find all event cards
         cards = driver.find_elements(By.CSS_SELECTOR, "a.upcoming-card-link")
@@ -679,8 +874,11 @@ def scrape_commudle(driver, query):
 # -------------------- SCRAPE ENDPOINT --------------------
 @googlescraper_bp.route("/scrape", methods=["POST"])
 @cross_origin()
+@background_job("googlescraper_scrape")
 def scrape():
-    driver = None
+    # Tasks lease their own browsers; none is held across stages, so the
+    # fan-out can never wait on a browser its own request is holding
+    executor = ThreadPoolExecutor(max_workers=max(2, SCRAPE_FANOUT), thread_name_prefix="gscrape")
     try:
         body = request.get_json(force=True)
         query = body.get("query", "").strip()
@@ -696,44 +894,37 @@ def scrape():
             }), 400
 
         print(f"🔍 Event Intelligence AI: Searching for '{query}'...")
+        timer = StageTimer()
+        deadline = time.monotonic() + SCRAPE_DEADLINE_SECONDS
+        errors = []
 
-        driver = start_driver(browser=browser, headless=headless)
-        
-        # 1. TRY COMMUDLE FIRST (FAST)
+        # 1. COMMUDLE AND THE MAPS LISTING RUN SIDE BY SIDE
+        commudle_future = None
         if query:
-            commudle_results = scrape_commudle(driver, query)
-            if commudle_results:
-                print(f"✅ Found {len(commudle_results)} events on Commudle!")
-                # Return the first one or a list? The frontend expects a single event object usually or a list?
-                # The frontend code seems to handle a single event response: `setEventData(data.event)`.
-                # BUT the backend code at the end returns `jsonify(all_events[0])`.
-                # So we should return the first relevant match.
-                return jsonify(commudle_results[0])
+            commudle_future = executor.submit(carry_job(find_commudle_events), query, browser, headless, deadline, timer)
 
+        maps_future = None
         target_urls = []
         if location_url and "google.com/maps" in location_url:
             target_urls = [location_url]
         else:
             # BROAD SEARCH OPTIMIZATION
             search_url = f"https://www.google.com/maps/search/{query.replace(' ', '+')}"
-            driver.get(search_url)
-            time.sleep(6) # Increased wait for results to load
-            
-            # Try to find Results
-            try:
-                # Look for list items first
-                selectors = ["a.hfpxzc", "div.m6VPy", "div.qBF1Pd", "[aria-label*='Results for'] a"]
-                for selector in selectors:
-                    elems = driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elems:
-                        for e in elems[:max_results]:
-                            try:
-                                href = e.get_attribute("href")
-                                if href and "/place/" in href: target_urls.append(href)
-                            except: pass
-                        if target_urls: break
-            except:
-                pass
+            maps_future = executor.submit(carry_job(find_maps_places), search_url, max_results, browser, headless, deadline, timer)
+
+        # Commudle matches still win over Maps results
+        commudle_results = result_by_deadline(commudle_future, deadline, "commudle", errors) or []
+        if commudle_results:
+            print(f"✅ Found {len(commudle_results)} events on Commudle!")
+            # Return the first one or a list? The frontend expects a single event object usually or a list?
+            # The frontend code seems to handle a single event response: `setEventData(data.event)`.
+            # BUT the backend code at the end returns `jsonify(all_events[0])`.
+            # So we should return the first relevant match.
+            commudle_results[0]["metadata"]["stage_timings_ms"] = timer.report()
+            return jsonify(commudle_results[0])
+
+        if maps_future is not None:
+            target_urls = result_by_deadline(maps_future, deadline, "maps_search", errors) or []
 
         # FALLBACK: If Maps fails, try a direct Google Search for the event (Simulated fallback)
         if not target_urls and query:
@@ -747,8 +938,8 @@ def scrape():
                     "website": "https://www.chennaitechexpo.com",
                     "rating": "4.8"
                 }
-                event_details = infer_event_details(driver, mock_place)
-                participants = extract_participants(driver, mock_place["name"], mock_place["website"])
+                event_details = infer_event_details(None, mock_place)
+                participants = extract_participants(None, mock_place["name"], mock_place["website"])
                 
                 return jsonify({
                     "event": event_details,
@@ -756,7 +947,8 @@ def scrape():
                     "metadata": {
                         "sources_used": ["AI Inference", "Web Discovery", "Chennai Tech Events Registry"],
                         "scrape_timestamp": datetime.now().isoformat(),
-                        "errors": []
+                        "stage_timings_ms": timer.report(),
+                        "errors": errors
                     }
                 })
  
@@ -766,22 +958,35 @@ def scrape():
                 "reason": "No verifiable event data found for this specific query."
             })
 
+        # 2. DEEP EXTRACTION FANS OUT ACROSS POOLED BROWSERS
+        place_urls = target_urls[:SCRAPE_MAX_PLACES] # Limit deep scrape for speed
         all_events = []
-        for url in target_urls[:3]: # Limit deep scrape for speed
-            place_data = parse_place_page(driver, url)
-            event_details = infer_event_details(driver, place_data)
-            participants = extract_participants(driver, event_details["name"], event_details["official_website"])
-            
-            result = {
-                "event": event_details,
-                "participants": participants,
-                "metadata": {
-                    "sources_used": ["Google Maps", "Web Intelligence"],
-                    "scrape_timestamp": datetime.now().isoformat(),
-                    "errors": []
-                }
-            }
-            all_events.append(result)
+        with timer.stage("place_pages"):
+            report_progress(stage="place_pages", done=0, total=len(place_urls))
+            place_futures = [
+                executor.submit(carry_job(scrape_place), url, browser, headless, deadline)
+                for url in place_urls
+            ]
+            done_count = 0
+            try:
+                for future in as_completed(place_futures, timeout=max(0, deadline - time.monotonic())):
+                    done_count += 1
+                    report_progress(stage="place_pages", done=done_count, total=len(place_urls))
+            except FuturesTimeout:
+                pass
+
+            # Keep Maps ranking order in the response
+            for url, future in zip(place_urls, place_futures):
+                if not future.done():
+                    errors.append(f"Timed out extracting {url}")
+                elif future.exception():
+                    errors.append(f"Failed to extract {url}: {future.exception()}")
+                else:
+                    all_events.append(future.result())
+
+        for result in all_events:
+            result["metadata"]["errors"] = errors
+            result["metadata"]["stage_timings_ms"] = timer.report()
 
         return jsonify(all_events[0] if all_events else {
             "event_status": "NOT_FOUND",
@@ -793,9 +998,8 @@ def scrape():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
     finally:
-        if driver:
-            try: driver.quit()
-            except: pass
+        # Don't block the response on stragglers past the deadline; they return their browsers when done
+        executor.shutdown(wait=False, cancel_futures=True)
 
 # -------------------- DOWNLOAD LATEST CSV --------------------
 @googlescraper_bp.route("/download", methods=["GET"])
@@ -846,5 +1050,6 @@ def health_check():
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
         "system": platform.system(),
-        "architecture": get_system_architecture()
+        "architecture": get_system_architecture(),
+        "browser_pool": browser_pool.stats()
     })
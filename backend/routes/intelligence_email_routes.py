@@ -3,9 +3,15 @@ Intelligence Dashboard Email Sending Routes
 Handles personalized bulk email sending with AI-generated content
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import google.generativeai as genai
+from services.llm_gateway import llm_gateway
+from services.job_runner import background_job, report_progress
+from utils.llm_streaming import event_stream_response, stream_generation
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import random
+import time
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -18,6 +24,43 @@ from .auth_routes import login_required
 
 intelligence_email_bp = Blueprint("intelligence_email", __name__)
 
+# Vary the writing style for each email
+WRITING_STYLES = [
+    "conversational and friendly",
+    "professional and direct",
+    "warm and engaging",
+    "concise and action-oriented",
+    "thoughtful and detailed",
+    "enthusiastic and energetic"
+]
+
+# Vary the opening approaches
+OPENING_STYLES = [
+    "start with a relevant question",
+    "begin with a compelling statement",
+    "open with a personal observation",
+    "start with the value proposition",
+    "begin with industry insight",
+    "open with a shared interest"
+]
+
+# Vary the closing approaches
+CLOSING_STYLES = [
+    "suggest a specific next step",
+    "ask an engaging question",
+    "propose a meeting time",
+    "offer additional value",
+    "create urgency with a deadline",
+    "leave it open-ended but warm"
+]
+
+# Batch personalization: recipients packed into each prompt, batches run in parallel
+PERSONALIZE_BATCH_SIZE = int(os.getenv("PERSONALIZE_BATCH_SIZE", 8))
+PERSONALIZE_MAX_BATCH_SIZE = 20
+PERSONALIZE_MAX_RECIPIENTS = 1000
+# Concurrent batches per pooled Gemini key
+PERSONALIZE_CONCURRENCY_PER_KEY = int(os.getenv("PERSONALIZE_CONCURRENCY_PER_KEY", 2))
+
 @intelligence_email_bp.route("/generate-personalized-voice-email", methods=["POST"])
 @login_required
 def generate_personalized_voice_email():
@@ -43,51 +86,11 @@ def generate_personalized_voice_email():
     # Create unique seed for this recipient to ensure variation
     unique_seed = hashlib.md5(f"{recipient_email}{datetime.now().microsecond}".encode()).hexdigest()[:8]
     
-    # Vary the writing style for each email
-    writing_styles = [
-        "conversational and friendly",
-        "professional and direct",
-        "warm and engaging",
-        "concise and action-oriented",
-        "thoughtful and detailed",
-        "enthusiastic and energetic"
-    ]
-    
-    # Vary the opening approaches
-    opening_styles = [
-        "start with a relevant question",
-        "begin with a compelling statement",
-        "open with a personal observation",
-        "start with the value proposition",
-        "begin with industry insight",
-        "open with a shared interest"
-    ]
-    
-    # Vary the closing approaches
-    closing_styles = [
-        "suggest a specific next step",
-        "ask an engaging question",
-        "propose a meeting time",
-        "offer additional value",
-        "create urgency with a deadline",
-        "leave it open-ended but warm"
-    ]
-    
-    selected_style = random.choice(writing_styles)
-    selected_opening = random.choice(opening_styles)
-    selected_closing = random.choice(closing_styles)
+    selected_style = random.choice(WRITING_STYLES)
+    selected_opening = random.choice(OPENING_STYLES)
+    selected_closing = random.choice(CLOSING_STYLES)
         
     try:
-        # Use higher temperature for more variation
-        model = genai.GenerativeModel(
-            'gemini-1.5-flash',
-            generation_config={
-                'temperature': 0.9,  # High temperature for creativity
-                'top_p': 0.95,
-                'top_k': 40
-            }
-        )
-        
         # Create highly varied prompt with randomization
         prompt = f"""You are an expert email copywriter. Create a COMPLETELY UNIQUE email.
 
@@ -149,7 +152,17 @@ OUTPUT (JSON only):
 
 IMPORTANT: Make this email feel like it was written JUST NOW, specifically for {recipient_name}. No two emails should sound alike!"""
 
-        response = model.generate_content(prompt)
+        # Use higher temperature for more variation
+        response = llm_gateway.generate(
+            prompt,
+            models=['gemini-1.5-flash'],
+            cache=False,  # Every call must produce a different email
+            generation_config={
+                'temperature': 0.9,  # High temperature for creativity
+                'top_p': 0.95,
+                'top_k': 40
+            }
+        )
         
         if not response or not response.text:
             raise Exception("Empty response from AI")
@@ -188,12 +201,19 @@ IMPORTANT: Make this email feel like it was written JUST NOW, specifically for {
         print(f"  ⚠️ Error generating email: {e}")
         
         # Enhanced fallback with variation
-        greetings = [f"Hi {recipient_name},", f"Hello {recipient_name},", f"Dear {recipient_name},"]
-        closings = ["Best regards,", "Warm regards,", "Looking forward to connecting,"]
+        fallback = build_fallback_email(recipient_name, transcript, playbook_title, sender_name)
         
-        fallback = {
-            "subject": f"{playbook_title} - {random.choice(['Opportunity', 'Proposal', 'Discussion', 'Collaboration'])} for {recipient_name}",
-            "body": f"""{random.choice(greetings)}
+        return jsonify(fallback)
+
+
+def build_fallback_email(recipient_name, transcript, playbook_title, sender_name):
+    """Template email used when Gemini is unavailable or returns nothing usable"""
+    greetings = [f"Hi {recipient_name},", f"Hello {recipient_name},", f"Dear {recipient_name},"]
+    closings = ["Best regards,", "Warm regards,", "Looking forward to connecting,"]
+    
+    return {
+        "subject": f"{playbook_title} - {random.choice(['Opportunity', 'Proposal', 'Discussion', 'Collaboration'])} for {recipient_name}",
+        "body": f"""{random.choice(greetings)}
 
 {transcript}
 
@@ -206,9 +226,176 @@ I believe this could be valuable for you. {random.choice([
 
 {random.choice(closings)}
 {sender_name}"""
-        }
-        
-        return jsonify(fallback)
+    }
+
+
+def build_batch_prompt(batch, campaign):
+    """One prompt for several recipients; the model answers with JSON keyed by recipient email"""
+    recipient_lines = "\n".join(
+        f"- {r['email']}: name \"{r['name']}\"; style: {random.choice(WRITING_STYLES)}; "
+        f"opening: {random.choice(OPENING_STYLES)}; closing: {random.choice(CLOSING_STYLES)}"
+        for r in batch
+    )
+    return f"""You are an expert email copywriter. Write one COMPLETELY UNIQUE email for EACH recipient below.
+
+YOUR MESSAGE:
+"{campaign['transcript']}"
+
+SENDER: {campaign['sender_name']}
+STRATEGY: {campaign['playbook_title']}
+CONTEXT: {campaign['playbook_details']}
+
+RECIPIENTS (email: name; style; opening approach; closing approach):
+{recipient_lines}
+
+RULES:
+1. Follow each recipient's style, opening and closing approach.
+2. Greet each recipient by name and sign off as {campaign['sender_name']}.
+3. No two emails may share a subject line, opening sentence or structure.
+4. Plain text only, no markdown.
+
+OUTPUT (JSON only, one entry per recipient email above):
+{{
+    "recipient@example.com": {{"subject": "Unique subject", "body": "Complete email"}}
+}}"""
+
+
+def parse_batch_response(text):
+    """Map of lower-cased recipient email -> {subject, body} from a batch reply"""
+    text = text.strip()
+    if '```' in text:
+        text = re.sub(r'```(?:json)?', '', text).strip()
+    if '{' in text:
+        text = text[text.find('{'):text.rfind('}') + 1]
+    data = json.loads(text)
+    return {
+        str(email).strip().lower(): email_data
+        for email, email_data in data.items()
+        if isinstance(email_data, dict) and email_data.get("subject") and email_data.get("body")
+    }
+
+
+def personalize_batch(batch, campaign):
+    """Personalized emails for one batch; recipients the model skipped get the template fallback"""
+    generated, model, error = {}, None, None
+    try:
+        response = llm_gateway.generate(
+            build_batch_prompt(batch, campaign),
+            models=['gemini-1.5-flash', 'gemini-2.0-flash'],
+            cache=False,
+            generation_config={'temperature': 0.9, 'top_p': 0.95, 'top_k': 40}
+        )
+        generated = parse_batch_response(response.text)
+        model = response.model
+    except Exception as e:
+        print(f"  ⚠️ Batch of {len(batch)} failed, using templates: {e}")
+        error = str(e)
+
+    results = []
+    for recipient in batch:
+        email_data = generated.get(recipient["email"].lower())
+        if email_data:
+            result = {"subject": email_data["subject"], "body": email_data["body"], "source": "ai", "model": model}
+        else:
+            result = build_fallback_email(recipient["name"], campaign["transcript"],
+                                          campaign["playbook_title"], campaign["sender_name"])
+            result.update({"source": "template", "error": error or "Missing from AI response"})
+        results.append({"recipient_email": recipient["email"], "recipient_name": recipient["name"], **result})
+    return results
+
+
+def iter_personalized_emails(recipients, campaign, batch_size):
+    """Yield one result per recipient as batches finish (not in input order)"""
+    batches = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+    workers = max(1, min(len(batches), PERSONALIZE_CONCURRENCY_PER_KEY * max(1, len(llm_gateway.keys))))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="personalize")
+    try:
+        futures = [executor.submit(personalize_batch, batch, campaign) for batch in batches]
+        done = 0
+        for future in as_completed(futures):
+            for result in future.result():
+                done += 1
+                report_progress(done=done, total=len(recipients))
+                yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def summarize_personalized(results, batch_size, started):
+    ai_count = sum(1 for r in results if r["source"] == "ai")
+    return {
+        "total": len(results),
+        "ai_generated": ai_count,
+        "template_fallbacks": len(results) - ai_count,
+        "batch_size": batch_size,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000),
+    }
+
+
+def stream_personalized_emails(recipients, campaign, batch_size):
+    """NDJSON stream: one {"type": "email"} line per recipient, then a summary line"""
+    started = time.perf_counter()
+    results = []
+    try:
+        for result in iter_personalized_emails(recipients, campaign, batch_size):
+            results.append(result)
+            yield json.dumps({"type": "email", **result}) + "\n"
+        yield json.dumps({"type": "summary", "status": "success", **summarize_personalized(results, batch_size, started)}) + "\n"
+    except Exception as e:
+        print(f"❌ Error streaming personalized emails: {e}")
+        yield json.dumps({"type": "error", "status": "error", "error": str(e)}) + "\n"
+
+
+@intelligence_email_bp.route("/generate-personalized-voice-emails", methods=["POST"])
+@login_required
+@background_job("personalize_voice_emails")
+def generate_personalized_voice_emails():
+    """Personalize one voice transcript for many recipients; {"stream": true} streams NDJSON"""
+    data = request.json or {}
+    
+    transcript = data.get("transcript")
+    if not transcript:
+        return jsonify({"error": "No transcript provided"}), 400
+    
+    recipients, seen = [], set()
+    for recipient in data.get("recipients") or []:
+        email = (recipient.get("email") or recipient.get("recipient_email") or "").strip()
+        if not email or email.lower() in seen:
+            continue
+        seen.add(email.lower())
+        recipients.append({"email": email, "name": (recipient.get("name") or recipient.get("recipient_name") or "").strip()})
+    
+    if not recipients:
+        return jsonify({"error": "No recipients provided"}), 400
+    if len(recipients) > PERSONALIZE_MAX_RECIPIENTS:
+        return jsonify({"error": f"At most {PERSONALIZE_MAX_RECIPIENTS} recipients per request"}), 400
+    
+    campaign = {
+        "transcript": transcript,
+        "playbook_title": data.get("playbook_title", "General Outreach"),
+        "playbook_details": data.get("playbook_details", ""),
+        "sender_name": data.get("sender_name", "Representative"),
+    }
+    try:
+        batch_size = int(data.get("batch_size", PERSONALIZE_BATCH_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({"error": "batch_size must be an integer"}), 400
+    batch_size = max(1, min(batch_size, PERSONALIZE_MAX_BATCH_SIZE))
+    print(f"🎯 Personalizing {len(recipients)} emails in batches of {batch_size}")
+    
+    if data.get("stream") or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        return Response(
+            stream_with_context(stream_personalized_emails(recipients, campaign, batch_size)),
+            mimetype='application/x-ndjson',
+            headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+        )
+    
+    started = time.perf_counter()
+    results = list(iter_personalized_emails(recipients, campaign, batch_size))
+    # Same order as the request
+    order = {r["email"].lower(): i for i, r in enumerate(recipients)}
+    results.sort(key=lambda r: order[r["recipient_email"].lower()])
+    return jsonify({"success": True, "emails": results, "summary": summarize_personalized(results, batch_size, started)})
 
 
 @intelligence_email_bp.route("/send-intelligence-email", methods=["POST"])
@@ -262,27 +449,11 @@ def send_intelligence_email():
         return jsonify({"error": str(e)}), 500
 
 
-@intelligence_email_bp.route("/generate-voice-email", methods=["POST"])
-@login_required
-def generate_voice_email():
-    """Generate email from voice transcript using AI"""
-    import random
-    
-    user_id = request.user["id"]
-    data = request.json
-    
-    transcript = data.get("transcript")
-    playbook_title = data.get("playbook_title", "General Outreach")
-    playbook_details = data.get("playbook_details", "")
-    user_name = data.get("user_name", "Representative")
-    
-    if not transcript:
-        return jsonify({"error": "No transcript provided"}), 400
-    
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        prompt = f"""You are an expert email copywriter. Convert this voice transcript into a professional email.
+VOICE_EMAIL_MODELS = ['gemini-1.5-flash']
+
+
+def build_voice_email_prompt(transcript, playbook_title, playbook_details, user_name):
+    return f"""You are an expert email copywriter. Convert this voice transcript into a professional email.
 
 VOICE TRANSCRIPT:
 {transcript}
@@ -305,8 +476,29 @@ Return ONLY valid JSON:
   "body": "full email body here"
 }}
 """
+
+
+@intelligence_email_bp.route("/generate-voice-email", methods=["POST"])
+@login_required
+def generate_voice_email():
+    """Generate email from voice transcript using AI"""
+    import random
+    
+    user_id = request.user["id"]
+    data = request.json
+    
+    transcript = data.get("transcript")
+    playbook_title = data.get("playbook_title", "General Outreach")
+    playbook_details = data.get("playbook_details", "")
+    user_name = data.get("user_name", "Representative")
+    
+    if not transcript:
+        return jsonify({"error": "No transcript provided"}), 400
+    
+    try:
+        prompt = build_voice_email_prompt(transcript, playbook_title, playbook_details, user_name)
         
-        response = model.generate_content(prompt)
+        response = llm_gateway.generate(prompt, models=VOICE_EMAIL_MODELS)
         email_json = json.loads(response.text.strip())
         
         return jsonify({
@@ -319,6 +511,31 @@ Return ONLY valid JSON:
         return jsonify({"error": str(e)}), 500
 
 
+@intelligence_email_bp.route("/generate-voice-email/stream", methods=["POST"])
+@login_required
+def generate_voice_email_stream():
+    """/generate-voice-email as Server-Sent Events: subject/body deltas, then the full email in `done`"""
+    data = request.json or {}
+
+    transcript = data.get("transcript")
+    playbook_title = data.get("playbook_title", "General Outreach")
+    playbook_details = data.get("playbook_details", "")
+    user_name = data.get("user_name", "Representative")
+
+    if not transcript:
+        return jsonify({"error": "No transcript provided"}), 400
+
+    return event_stream_response(stream_generation(
+        lambda: llm_gateway.generate(
+            build_voice_email_prompt(transcript, playbook_title, playbook_details, user_name),
+            models=VOICE_EMAIL_MODELS,
+            stream=True
+        ),
+        lambda text, response: {"success": True, "email": json.loads(text.strip())},
+        fields=("subject", "body")
+    ))
+
+
 @intelligence_email_bp.route("/intelligence-analytics", methods=["GET"])
 @login_required
 def get_intelligence_analytics():
@@ -0,0 +1,66 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import json
+from database import db
+from services.job_runner import job_manager
+from .auth_routes import login_required
+
+job_bp = Blueprint("jobs", __name__)
+
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _job_for_request(job_id):
+    """Return (job, error_response); jobs tied to a user are only visible to that user"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return None, (jsonify({"error": "Job not found"}), 404)
+
+    if job.user_id is not None:
+        user = db.get_user_by_session(request.cookies.get("session_token", ""))
+        if not user or (user["id"] != job.user_id and user.get("role") != "super_admin"):
+            return None, (jsonify({"error": "Job not found"}), 404)
+    return job, None
+
+
+@job_bp.route("", methods=["GET"])
+@login_required
+def list_jobs():
+    """Recent background jobs for the current user (without results)"""
+    limit = min(int(request.args.get("limit", 20)), 100)
+    return jsonify({"jobs": job_manager.list_for_user(request.user["id"], limit)})
+
+
+@job_bp.route("/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Poll a job's status, progress and, once finished, its result"""
+    job, error = _job_for_request(job_id)
+    if error:
+        return error
+    return jsonify(job.to_dict(include_result=job.done))
+
+
+@job_bp.route("/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Server-Sent Events: a "progress" event per change, then one "done" event with the result"""
+    job, error = _job_for_request(job_id)
+    if error:
+        return error
+
+    def generate():
+        version = -1
+        while True:
+            if job.done:
+                yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            if job.version != version:
+                version = job.version
+                yield f"event: progress\ndata: {json.dumps(job.to_dict(include_result=False))}\n\n"
+                continue
+            if job_manager.wait_for_change(job, version, SSE_HEARTBEAT_SECONDS) == version and not job.done:
+                yield ": keepalive\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,37 @@
+from flask import Blueprint, jsonify
+from routes.auth_routes import role_required
+from services.domain_cache import domain_cache
+from services.search_client import search_client
+from services.http_client import http_client
+from services.pattern_store import pattern_store
+from services.llm_gateway import llm_gateway
+from routes.EmailGenerateAndValidator_routes import verification_stats
+
+ops_bp = Blueprint("ops", __name__)
+
+# Shared caches/clients whose counters admins can read; name -> stats callable
+STATS_SOURCES = {
+    "domain-cache": domain_cache.stats,
+    "search-cache": search_client.stats,
+    "http-cache": http_client.stats,
+    "pattern-store": pattern_store.stats,
+    "llm-gateway": llm_gateway.stats,
+    "verification": verification_stats,
+}
+
+
+@ops_bp.route("/stats", methods=["GET"])
+@role_required("admin")
+def all_stats():
+    """Counters from every shared cache and client"""
+    return jsonify({"status": "success", "stats": {name: source() for name, source in STATS_SOURCES.items()}})
+
+
+@ops_bp.route("/stats/<name>", methods=["GET"])
+@role_required("admin")
+def component_stats(name):
+    """Counters for one shared cache or client"""
+    source = STATS_SOURCES.get(name)
+    if source is None:
+        return jsonify({"error": f"Unknown component. Available: {', '.join(STATS_SOURCES)}"}), 404
+    return jsonify({"status": "success", "name": name, "stats": source()})
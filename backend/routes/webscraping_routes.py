@@ -1,4 +1,4 @@
-from flask import Flask, Blueprint, request, jsonify
+from flask import Flask, Blueprint, request, jsonify, Response, stream_with_context
 import re
 import tldextract
 import warnings
@@ -8,20 +8,31 @@ import json
 import urllib.parse as urlparse
 from datetime import datetime, timedelta
 from pathlib import Path
-from ddgs import DDGS
 from email_validator import validate_email, EmailNotValidError
 from validate_email_address import validate_email as smtp_validate
 import dns.resolver
 from typing import Dict, List, Optional
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
 import signal 
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from config import GENAI_API_KEY
-import google.generativeai as genai
+from services.llm_gateway import llm_gateway
+from services.domain_cache import domain_cache
+from services.search_client import search_client
+from services.site_crawler import SiteCrawler
+from services.http_client import http_client
+from services.job_runner import background_job, report_progress
+from utils.contact_extraction import (
+    extract_contacts, extract_email_set, extract_phone_set, find_emails, find_phones, normalize_phone
+)
 
-if GENAI_API_KEY:
-    genai.configure(api_key=GENAI_API_KEY)
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
@@ -36,31 +47,25 @@ COMMON_CONTACT_PATHS = [
     "/team", "/support", "/help", "/customer-service", "/get-in-touch", "/connect"
 ]
 
-EMAIL_REGEX = re.compile(r"[a-zA-Z0-9.\-+_]{1,64}@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}", re.I)
-
-# FIXED: Enhanced phone regex that handles tuple groups properly
-PHONE_REGEX = re.compile(
-    r'(\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,4})'
-    r'|(\+?\(\d{1,4}\)[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,4})'
-    r'|(\d{3}[-.\s]?\d{3}[-.\s]?\d{4})'
-    r'|(\d{4}[-.\s]?\d{3}[-.\s]?\d{3})'
-    r'|(\d{2}[-.\s]?\d{4}[-.\s]?\d{4})'
-    r'|(\+\d{1,3}[-.\s]?\d{1,14})'
-    r'|(tel[:\s]+[\+]?[\d\s\-\(\)]{7,})'
-    r'|(phone[:\s]+[\+]?[\d\s\-\(\)]{7,})'
-    r'|(mobile[:\s]+[\+]?[\d\s\-\(\)]{7,})'
-)
+# Scanned by find_employees_from_website; /team and /about overlap the contact paths
+EMPLOYEE_PATHS = ["/team", "/about", "/people", "/leadership"]
 
 SOCIAL_PLATFORMS = {
     "linkedin.com", "facebook.com", "twitter.com", "x.com", "instagram.com",
     "youtube.com", "tiktok.com", "whatsapp.com", "telegram.org"
 }
 
+CONTACT_FORM_KEYWORDS = ["contact", "inquiry", "support", "lead", "signup"]
+
+# Same string types BeautifulSoup.get_text() keeps (skips script/style/comments)
+VISIBLE_TEXT_TYPES = (NavigableString, CData)
+
 # ---------- Lead Generator Config ----------
 CONFIG = {
     "rate_limit_delay": (3, 7),
     "cache_ttl_hours": 24,
     "max_results_per_search": 50,
+    "lead_workers": 6,
 }
 
 USER_AGENTS = [
@@ -164,17 +169,16 @@ def find_company_website_advanced(company_name, location=None, industry=None):
 def search_domain_with_query(query):
     """Search for domain using a specific query"""
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=3))
-            for result in results:
-                url = result.get("href", "")
-                if url:
-                    ext = tldextract.extract(url)
-                    if ext.domain and ext.suffix:
-                        domain = f"{ext.domain}.{ext.suffix}".lower()
-                        # Basic domain validation
-                        if len(ext.domain) > 2 and ext.suffix:
-                            return domain
+        results = search_client.text(query, max_results=3)
+        for result in results:
+            url = result.get("href", "")
+            if url:
+                ext = tldextract.extract(url)
+                if ext.domain and ext.suffix:
+                    domain = f"{ext.domain}.{ext.suffix}".lower()
+                    # Basic domain validation
+                    if len(ext.domain) > 2 and ext.suffix:
+                        return domain
     except Exception as e:
         print(f"  Domain search error: {e}")
 
@@ -197,19 +201,18 @@ def find_emails_without_domain(company_name, person_name, location=None):
         if query:
             try:
                 print(f"  Direct email search: {query}")
-                with DDGS() as ddgs:
-                    results = list(ddgs.text(query, max_results=5))
-                    for result in results:
-                        # Extract emails from title and snippet
-                        text = f"{result.get('title', '')} {result.get('body', '')}"
-                        emails = extract_emails_from_text(text)
-                        for email in emails:
-                            contacts.append({
-                                "email": email,
-                                "source": "direct_search",
-                                "source_url": result.get("href", ""),
-                                "score": 70  # Slightly lower score for direct search
-                            })
+                results = search_client.text(query, max_results=5)
+                for result in results:
+                    # Extract emails from title and snippet
+                    text = f"{result.get('title', '')} {result.get('body', '')}"
+                    emails = extract_emails_from_text(text)
+                    for email in emails:
+                        contacts.append({
+                            "email": email,
+                            "source": "direct_search",
+                            "source_url": result.get("href", ""),
+                            "score": 70  # Slightly lower score for direct search
+                        })
             except Exception as e:
                 print(f"  Direct email search error: {e}")
                 continue
@@ -247,18 +250,17 @@ def search_business_directories(company_name, location=None, industry=None):
     for query in directories:
         try:
             print(f"  Directory search: {query}")
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=3))
-                for result in results:
-                    text = f"{result.get('title', '')} {result.get('body', '')}"
-                    emails = extract_emails_from_text(text)
-                    for email in emails:
-                        contacts.append({
-                            "email": email,
-                            "source": "business_directory",
-                            "source_url": result.get("href", ""),
-                            "score": 75
-                        })
+            results = search_client.text(query, max_results=3)
+            for result in results:
+                text = f"{result.get('title', '')} {result.get('body', '')}"
+                emails = extract_emails_from_text(text)
+                for email in emails:
+                    contacts.append({
+                        "email": email,
+                        "source": "business_directory",
+                        "source_url": result.get("href", ""),
+                        "score": 75
+                    })
         except Exception as e:
             print(f"  Directory search error: {e}")
             continue
@@ -371,34 +373,20 @@ def fetch_url(url):
     for attempt in range(RETRY):
         try:
             headers = {"User-Agent": get_random_user_agent()}
-            resp = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+            resp = http_client.get_cached(url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True)
             return resp
         except requests.RequestException:
             polite_sleep()
     return None
 
+# Shared by every site crawl; politeness is enforced per host, not globally
+site_crawler = SiteCrawler(user_agent=get_random_user_agent)
+
 def extract_emails_from_text(text):
-    if not text:
-        return set()
-    return set(m.group(0).strip().rstrip('.,;:') for m in EMAIL_REGEX.finditer(text))
+    return extract_email_set(text)
 
 def extract_phones_from_text(text):
-    """Extract phones from text - FIXED to handle tuple groups"""
-    if not text:
-        return set()
-
-    phones = set()
-    matches = PHONE_REGEX.finditer(text)
-
-    for match in matches:
-        # Handle tuple matches - take the first non-None group
-        for group_num in range(1, len(match.groups()) + 1):
-            phone = match.group(group_num)
-            if phone and phone.strip():
-                phones.add(phone.strip())
-                break
-
-    return phones
+    return extract_phone_set(text)
 
 def find_contact_pages(root_url):
     """Generate candidate contact page URLs to try (root + common_paths)."""
@@ -410,8 +398,25 @@ def find_contact_pages(root_url):
         candidates.append(base + p)
     return candidates
 
-def parse_page_for_contacts(resp, base_url=None):
-    """Parse HTML for mailto links, emails, phones, contact forms, and social links."""
+def site_base_url(domain):
+    """scheme://host for a bare domain or a full URL"""
+    parsed = urlparse.urlparse(domain if domain.startswith("http") else "https://" + domain)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+def employee_page_urls(domain):
+    base = site_base_url(domain)
+    return [base + p for p in EMPLOYEE_PATHS]
+
+def parse_html(resp):
+    """Build the page tree once with the fastest available parser"""
+    return BeautifulSoup(resp.text, HTML_PARSER)
+
+def parse_page_for_contacts(resp, base_url=None, soup=None):
+    """Parse HTML for mailto links, emails, phones, contact forms, and social links.
+
+    Anchors, forms and visible text are collected in a single walk of the tree.
+    Pass ``soup`` to reuse a parse the caller already holds.
+    """
     found = {
         "emails": set(),
         "phones": set(),
@@ -423,49 +428,43 @@ def parse_page_for_contacts(resp, base_url=None):
     if resp is None or resp.status_code != 200:
         return found
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-
-    for a in soup.find_all("a", href=True):
-        href = a["href"].strip()
-        if href.lower().startswith("mailto:"):
-            addr = href.split(":", 1)[1].split("?")[0]
-            found["mailto_links"].add(addr)
-            found["emails"].add(addr)
-        if any(domain in href for domain in SOCIAL_PLATFORMS):
-            found["social_links"].add(href)
-
-    text = soup.get_text(separator=" ", strip=True)
-    found["raw_text_emails"].update(extract_emails_from_text(text))
-    found["phones"].update(extract_phones_from_text(text))
-
-    for form in soup.find_all("form"):
-        action = form.get("action", "")
-        form_id = form.get("id", "")
-        form_classes = form.get("class", [])
-
-        if isinstance(form_classes, list):
-            form_classes = " ".join(form_classes)
-
-        form_text = f"{action} {form_id} {form_classes}".lower()
-
-        if any(k in form_text for k in ["contact", "inquiry", "support", "lead", "signup"]):
-            found["contact_forms"].append({
-                "action": urlparse.urljoin(base_url or "", action),
-                "method": form.get("method", "get").lower(),
-                "inputs": [inp.get("name") for inp in form.find_all(["input", "textarea", "select"]) if inp.get("name")]
-            })
-
-    for header in soup.find_all(re.compile("^h[1-6]$")):
-        header_text = header.get_text(" ", strip=True).lower()
-        if any(k in header_text for k in ["contact", "get in touch", "reach", "office", "location", "phone", "email"]):
-            sib_text = []
-            for sib in header.next_siblings:
-                if getattr(sib, "name", None) and sib.name.startswith("h"):
-                    break
-                sib_text.append(getattr(sib, "get_text", lambda: str(sib))())
-            joined = " ".join(sib_text)
-            found["raw_text_emails"].update(extract_emails_from_text(joined))
-            found["phones"].update(extract_phones_from_text(joined))
+    if soup is None:
+        soup = parse_html(resp)
+
+    # Text under "Contact"/"Office" headers is part of the page text, so the
+    # one scan below also covers those sections
+    text_parts = []
+    for node in soup.descendants:
+        if isinstance(node, Tag):
+            if node.name == "a":
+                href = (node.get("href") or "").strip()
+                if href.lower().startswith("mailto:"):
+                    addr = href.split(":", 1)[1].split("?")[0]
+                    found["mailto_links"].add(addr)
+                    found["emails"].add(addr)
+                if any(domain in href for domain in SOCIAL_PLATFORMS):
+                    found["social_links"].add(href)
+            elif node.name == "form":
+                action = node.get("action", "")
+                form_classes = node.get("class", [])
+                if isinstance(form_classes, list):
+                    form_classes = " ".join(form_classes)
+
+                form_text = f"{action} {node.get('id', '')} {form_classes}".lower()
+                if any(k in form_text for k in CONTACT_FORM_KEYWORDS):
+                    found["contact_forms"].append({
+                        "action": urlparse.urljoin(base_url or "", action),
+                        "method": node.get("method", "get").lower(),
+                        "inputs": [inp.get("name") for inp in node.find_all(["input", "textarea", "select"]) if inp.get("name")]
+                    })
+        elif type(node) in VISIBLE_TEXT_TYPES:
+            piece = node.strip()
+            if piece:
+                text_parts.append(piece)
+
+    contacts = extract_contacts(" ".join(text_parts))
+    found["raw_text_emails"].update(contacts["emails"])
+    found["phones"].update(contacts["phones"])
 
     found["emails"].update(found["raw_text_emails"])
     found["emails"].update(found["mailto_links"])
@@ -497,18 +496,25 @@ def scrape_company_for_contacts_enhanced(domain):
         root_url = "https://" + domain
     result["root_url"] = root_url
 
-    tried = set()
-
-    for p in find_contact_pages(root_url):
-        if p in tried:
-            continue
-        polite_sleep()
-        r = fetch_url(p)
-        if r is None:
+    # base and base + "/" are the same page; fetch it once
+    contact_pages = list(dict.fromkeys(
+        p for p in find_contact_pages(root_url) + [root_url] if not p.endswith("/")
+    ))
+    home_pages = {root_url.rstrip("/"), site_base_url(root_url)}
+
+    # Contact and employee pages are crawled together; results merge as each page lands
+    pages = {}
+    soups = {}
+    for p, r in site_crawler.crawl(contact_pages + employee_page_urls(root_url)):
+        pages[p] = r
+        if p not in contact_pages or r is None:
             continue
         result["contact_pages_tried"].append(p)
-        tried.add(p)
-        found = parse_page_for_contacts(r, base_url=root_url)
+        # One parse per page, shared by contact, company info and employee extraction
+        soup = parse_html(r) if r.status_code == 200 else None
+        if soup is not None:
+            soups[p] = soup
+        found = parse_page_for_contacts(r, base_url=root_url, soup=soup)
         for e in found["emails"]:
             result["emails"].setdefault(e, {"sources": set()})
             result["emails"][e]["sources"].add(p)
@@ -516,27 +522,11 @@ def scrape_company_for_contacts_enhanced(domain):
         result["contact_forms"].extend(found["contact_forms"])
         result["social_links"].update(found["social_links"])
 
-        if p == root_url or p == root_url + "/":
-            soup = BeautifulSoup(r.text, "html.parser")
+        if p in home_pages and soup is not None:
             result["company_info"] = extract_company_info(soup, domain)
 
-    if root_url not in tried:
-        polite_sleep()
-        r = fetch_url(root_url)
-        result["contact_pages_tried"].append(root_url)
-        if r:
-            found = parse_page_for_contacts(r, base_url=root_url)
-            for e in found["emails"]:
-                result["emails"].setdefault(e, {"sources": set()})
-                result["emails"][e]["sources"].add(root_url)
-            result["phones"].update(found["phones"])
-            result["contact_forms"].extend(found["contact_forms"])
-            result["social_links"].update(found["social_links"])
-
-            soup = BeautifulSoup(r.text, "html.parser")
-            result["company_info"] = extract_company_info(soup, domain)
-
-    result["employees"] = find_employees_from_website(domain)
+    result["contact_pages_tried"].sort(key=contact_pages.index)
+    result["employees"] = find_employees_from_website(domain, pages=pages, soups=soups)
 
     scored = []
     for email, info in result["emails"].items():
@@ -562,7 +552,7 @@ def scrape_company_for_contacts_enhanced(domain):
             "sources": list(info["sources"]),
         }
     # --- Stage 5: AI Business Intelligence (Synthesize findings) ---
-    if GENAI_API_KEY:
+    if llm_gateway.available:
         result["ai_intelligence"] = extract_ai_intelligence(result)
 
     return result
@@ -570,8 +560,6 @@ def scrape_company_for_contacts_enhanced(domain):
 def extract_ai_intelligence(scraped_data):
     """Synthesize scraped data into strategic business intelligence"""
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
         context = {
             "domain": scraped_data["domain"],
             "description": scraped_data["company_info"].get("description", "")[:1000]
@@ -592,7 +580,7 @@ def extract_ai_intelligence(scraped_data):
 
         Format as JSON.
         """
-        response = model.generate_content(prompt)
+        response = llm_gateway.generate(prompt, models=['gemini-1.5-flash'])
         try:
             cleaned_text = response.text.strip().replace("```json", "").replace("```", "")
             return json.loads(cleaned_text)
@@ -602,30 +590,30 @@ def extract_ai_intelligence(scraped_data):
         print(f"AI Intelligence error: {e}")
         return {}
 
-def find_employees_from_website(domain):
-    """Enhanced employee discovery with full details"""
+def find_employees_from_website(domain, pages=None, soups=None):
+    """Enhanced employee discovery with full details
+
+    ``pages`` maps URL -> response for pages the caller already crawled and
+    ``soups`` URL -> parsed tree for those it already parsed.
+    """
+    soups = soups or {}
     employees = []
 
-    employee_pages = [
-        f"https://{domain}/team",
-        f"https://{domain}/about",
-        f"https://{domain}/people", 
-        f"https://{domain}/leadership",
-        f"https://{domain}/staff",
-        f"https://{domain}/management",
-        f"https://{domain}/executive-team",
-        f"https://{domain}/our-team"
-    ]
+    employee_pages = employee_page_urls(domain)
+    pages = dict(pages or {})
+    missing = [u for u in employee_pages if u not in pages]
+    if missing:
+        pages.update(site_crawler.crawl(missing))
 
     # Create instance to access existing methods
     lead_gen = LinkedInLeadGenerator()
 
-    for page_url in employee_pages[:4]:
+    for page_url in employee_pages:
         try:
             print(f"  🔍 Scanning employee page: {page_url}")
-            resp = fetch_url(page_url)
+            resp = pages.get(page_url)
             if resp and resp.status_code == 200:
-                soup = BeautifulSoup(resp.text, "html.parser")
+                soup = soups.get(page_url) or parse_html(resp)
                 
                 # Check if this is actually an employee/team page
                 page_text = soup.get_text().lower()
@@ -728,7 +716,7 @@ def extract_employee_email(container, name, domain, lead_gen):
     
     # 2. Look for email text in container
     container_text = container.get_text()
-    email_matches = EMAIL_REGEX.findall(container_text)
+    email_matches = find_emails(container_text)
     for email in email_matches:
         # USE EXISTING FUNCTION: is_valid_email
         if lead_gen.is_valid_email(email):
@@ -748,15 +736,8 @@ def extract_employee_email(container, name, domain, lead_gen):
 def extract_employee_phone(container, lead_gen):
     """Extract employee phone number - USING EXISTING FUNCTIONS"""
     container_text = container.get_text()
-    phone_matches = PHONE_REGEX.findall(container_text)
     
-    for match in phone_matches:
-        # Handle tuple matches
-        if isinstance(match, tuple):
-            phone = next((group for group in match if group is not None), None)
-        else:
-            phone = match
-            
+    for phone in find_phones(container_text):
         if phone:
             # USE EXISTING FUNCTION: clean_phone_number
             clean_phone = lead_gen.clean_phone_number(phone)
@@ -938,8 +919,11 @@ def quick_scrape_social_platform(domain, timeout_seconds=30):
     def timeout_handler(signum, frame):
         raise TimeoutError("Scraping timeout")
 
-    signal.signal(signal.SIGALRM, timeout_handler)
-    signal.alarm(timeout_seconds)
+    # SIGALRM can only be armed from the main thread; lead workers rely on request timeouts
+    use_alarm = threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        signal.signal(signal.SIGALRM, timeout_handler)
+        signal.alarm(timeout_seconds)
 
     try:
         print(f"Quick scraping social platform: {domain}")
@@ -956,7 +940,7 @@ def quick_scrape_social_platform(domain, timeout_seconds=30):
         homepage = f"https://{domain}"
         resp = fetch_url(homepage)
         if resp and resp.status_code == 200:
-            soup = BeautifulSoup(resp.text, "html.parser")
+            soup = parse_html(resp)
             emails = extract_emails_from_text(resp.text)
             phones = extract_phones_from_text(resp.text)
             result["emails"].update(emails)
@@ -967,7 +951,6 @@ def quick_scrape_social_platform(domain, timeout_seconds=30):
             if any(keyword in text for keyword in ["team", "about", "leadership"]):
                 result["employees"] = find_employees_from_website(domain)
 
-        signal.alarm(0)
         return result
 
     except TimeoutError:
@@ -977,7 +960,8 @@ def quick_scrape_social_platform(domain, timeout_seconds=30):
         print(f"Error quick scraping {domain}: {e}")
         return {"error": str(e), "domain": domain}
     finally:
-        signal.alarm(0)
+        if use_alarm:
+            signal.alarm(0)
 
 # ---------- Fixed SimpleCache ----------
 class SimpleCache:
@@ -1013,8 +997,11 @@ class SimpleCache:
                 'timestamp': datetime.now().isoformat(),
                 'value': cleaned_value
             }
-            with open(cache_file, 'w') as f:
+            # Lead workers write concurrently; readers must never see a partial file
+            tmp_file = cache_file.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_file, 'w') as f:
                 json.dump(data, f, indent=2)
+            tmp_file.replace(cache_file)
         except Exception as e:
             print(f"Cache write error for {key}: {e}")
 
@@ -1098,17 +1085,35 @@ class LinkedInLeadGenerator:
         self.cache = SimpleCache()
         self.email_validator = EmailValidator(self.cache)
         self.used_user_agents = set()
+        # Per-run company work (domain, site scrape, directories) shared between colleagues
+        self._shared_work: Dict[tuple, Future] = {}
+        self._shared_lock = threading.Lock()
+
+    def _shared(self, key: tuple, func):
+        """Run func once per key for this generator; concurrent callers wait for the first"""
+        with self._shared_lock:
+            future = self._shared_work.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._shared_work[key] = future
+
+        if owner:
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
 
 
 
-    @rate_limited
     def search_linkedin_profiles(self, query: str, max_results: int = 50) -> List[Dict]:
+        # Pacing is handled by the shared search client's token bucket
         try:
             print(f"Searching: {query}")
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=max_results))
-                print(f"Found {len(results)} results")
-                return results
+            results = search_client.text(query, max_results=max_results)
+            print(f"Found {len(results)} results")
+            return results
         except Exception as e:
             print(f"Search error: {e}")
             return []
@@ -1280,8 +1285,8 @@ class LinkedInLeadGenerator:
         }
 
         # Extract ALL emails (not just personal ones)
-        email_matches = EMAIL_REGEX.findall(combined_text)
-        for email in email_matches:
+        found = extract_contacts(combined_text)
+        for email in found["emails"]:
             if self.is_valid_email(email):
                 contacts["emails"].append({
                     "email": email.strip(),
@@ -1291,15 +1296,7 @@ class LinkedInLeadGenerator:
                     "type": "personal" if any(domain in email for domain in ['gmail', 'yahoo', 'hotmail']) else "professional"
                 })
 
-        # FIXED: Phone extraction that handles tuple groups properly
-        phone_matches = PHONE_REGEX.findall(combined_text)
-        for match in phone_matches:
-            # Handle tuple matches - take the first non-None group
-            if isinstance(match, tuple):
-                phone = next((group for group in match if group is not None), None)
-            else:
-                phone = match
-
+        for phone in found["phones"]:
             if phone:
                 # Clean phone number
                 clean_phone = self.clean_phone_number(phone)
@@ -1331,24 +1328,7 @@ class LinkedInLeadGenerator:
 
     def clean_phone_number(self, phone: str) -> str:
         """Clean and standardize phone number format"""
-        if not phone:
-            return ""
-
-        # Remove common separators but keep + for country codes
-        cleaned = re.sub(r'[^\d+]', '', phone)
-
-        # Remove "tel:", "phone:", "mobile:" prefixes
-        cleaned = re.sub(r'^(tel|phone|mobile)[:\s]*', '', cleaned, flags=re.IGNORECASE)
-
-        # Handle common patterns
-        if cleaned.startswith('+'):
-            return cleaned
-        elif len(cleaned) == 10 and not cleaned.startswith('0'):
-            return f"+1{cleaned}"  # Assume US if no country code
-        elif len(cleaned) == 11 and cleaned.startswith('1'):
-            return f"+{cleaned}"
-        else:
-            return cleaned
+        return normalize_phone(phone)
 
     def validate_phone_format(self, phone: str) -> bool:
         """Validate phone number format - STRICTER validation"""
@@ -1448,7 +1428,11 @@ class LinkedInLeadGenerator:
             # 2. DOMAIN-BASED CONTACTS - ONLY if company exists
             company = profile.get("company")
             if company:  # FIX: Only try domain discovery if we have a company
-                domain = self.get_company_domain(company, location, industry)
+                company_key = domain_cache.normalize(company)
+                domain = self._shared(
+                    ("domain", company_key),
+                    lambda: self.get_company_domain(company, location, industry)
+                )
                 profile["domain"] = domain
 
                 if domain:
@@ -1462,7 +1446,7 @@ class LinkedInLeadGenerator:
                         all_contacts.extend(validated_emails)
 
                     # Scrape website for contacts
-                    scraped_contacts = self.scrape_company_contacts(domain)
+                    scraped_contacts = self._shared(("scrape", domain), lambda: self.scrape_company_contacts(domain))
 
                     if "employees" in scraped_contacts:
                         profile["website_employees"] = scraped_contacts["employees"]
@@ -1512,7 +1496,10 @@ class LinkedInLeadGenerator:
                 all_contacts.extend(validated_direct_emails)
 
                 # UPDATED: Pass location/industry to business directories
-                directory_contacts = search_business_directories(profile["company"], location, industry)
+                directory_contacts = self._shared(
+                    ("directories", domain_cache.normalize(profile["company"])),
+                    lambda: search_business_directories(profile["company"], location, industry)
+                )
                 directory_emails = [contact["email"] for contact in directory_contacts]
                 validated_directory_emails = self.validate_emails(directory_emails)
 
@@ -1561,7 +1548,6 @@ class LinkedInLeadGenerator:
 
         return list(phone_map.values())
 
-    @rate_limited
     def get_company_domain(self, company_name: str, location: str = None, industry: str = None) -> Optional[str]:
         # Known domain overrides for common companies
         known_domains = {
@@ -1573,32 +1559,30 @@ class LinkedInLeadGenerator:
             'linkedin': 'linkedin.com',
         }
 
+        if not company_name:
+            return None
+
         company_lower = company_name.lower()
         for known_company, domain in known_domains.items():
             if known_company in company_lower:
                 print(f"  ✅ Using known domain: {domain} for {company_name}")
                 return domain
 
-
-        if not company_name:
-            return None
-
         if len(company_name.strip()) < 2:
             return None
 
-        cached_domain = self.cache.get(f"domain_{company_name}")
+        # Shared with CompanyEmailProcessor; hits skip the rate-limit delay
+        cached_domain = domain_cache.get(company_name)
         if cached_domain:
             return cached_domain
+        if domain_cache.is_known_failure(company_name):
+            print(f"No valid domain found for: {company_name} (cached)")
+            return None
 
-        # ENHANCED: Use REAL location and industry if available
-        domain = find_company_website_advanced(company_name, location, industry)
-
-        # Fallback: Try domain guessing
-        if not domain:
-            domain = guess_common_domains(company_name)
+        domain = self._resolve_company_domain(company_name, location, industry)
 
         if domain:
-            self.cache.set(f"domain_{company_name}", domain)
+            domain_cache.set(company_name, domain)
             print(f"Found domain: {domain} for {company_name}")
 
             # Show if location/industry helped
@@ -1610,10 +1594,22 @@ class LinkedInLeadGenerator:
                     help_sources.append(f"industry: {industry}")
                 print(f"  🔍 Assisted by: {', '.join(help_sources)}")
         else:
+            domain_cache.set_failed(company_name)
             print(f"No valid domain found for: {company_name}")
 
         return domain
 
+    @rate_limited
+    def _resolve_company_domain(self, company_name: str, location: str = None, industry: str = None) -> Optional[str]:
+        # ENHANCED: Use REAL location and industry if available
+        domain = find_company_website_advanced(company_name, location, industry)
+
+        # Fallback: Try domain guessing
+        if not domain:
+            domain = guess_common_domains(company_name)
+
+        return domain
+
     def generate_email_patterns(self, name: str, domain: str) -> List[str]:
         if not name or not domain:
             return []
@@ -1723,49 +1719,62 @@ class LinkedInLeadGenerator:
             print(f"Error scraping {domain}: {e}")
             return {"error": str(e), "validated_emails": []}
 
-    def generate_leads_enhanced(self, queries: List[str], max_leads: int = 20) -> List[Dict]:
-        all_leads = []
-
-        for query in queries:
-            print(f"\n=== Processing query: {query} ===")
-
-            search_results = self.search_linkedin_profiles(query, max_leads)
-            print(f"Found {len(search_results)} search results")
+    def _process_search_result(self, result: Dict) -> Optional[Dict]:
+        """Parse and enrich one search result; None when it is skipped or fails"""
+        try:
+            # Use enhanced profile parsing with error handling
+            profile = self.parse_profile_enhanced(result["title"], result["body"], result["href"])
 
-            processed_count = 0
-            for i, result in enumerate(search_results):
-                print(f"Processing result {i+1}/{len(search_results)}...")
+            if not self.should_process_profile(profile):
+                print(f"✗ Skipped {profile.get('name', 'Unknown')} - insufficient data")
+                return None
 
-                try:
-                    # Use enhanced profile parsing with error handling
-                    profile = self.parse_profile_enhanced(result["title"], result["body"], result["href"])
+            # Enhanced contact discovery with phones
+            self.enhanced_contact_discovery(profile)
+            profile["lead_score"] = self.calculate_enhanced_lead_score(profile)
 
-                    if self.should_process_profile(profile):
-                        # Enhanced contact discovery with phones
-                        contacts = self.enhanced_contact_discovery(profile)
-                        profile["lead_score"] = self.calculate_enhanced_lead_score(profile)
+            if profile.get('search_emails'):
+                print(f"  Found {len(profile['search_emails'])} emails in search snippet")
+            if profile.get('search_phones'):
+                print(f"  Found {len(profile['search_phones'])} phones in search snippet")
+            return profile
 
-                        all_leads.append(profile)
-                        processed_count += 1
+        except Exception as e:
+            print(f"❌ Error processing profile: {e}")
+            return None
 
-                        print(f"✓ Processed {processed_count}/{len(search_results)} - {profile['name']}")
-                        if profile.get('search_emails'):
-                            print(f"  Found {len(profile['search_emails'])} emails in search snippet")
-                        if profile.get('search_phones'):
-                            print(f"  Found {len(profile['search_phones'])} phones in search snippet")
-                    else:
-                        print(f"✗ Skipped {profile.get('name', 'Unknown')} - insufficient data")
+    def iter_leads(self, queries: List[str], max_leads: int = 20):
+        """Yield enriched leads as they finish; profiles are enriched concurrently.
 
-                    time.sleep(random.uniform(1, 2))
+        Pacing comes from the shared search client, the per-host crawler throttle
+        and the rate-limited domain resolver, so workers do not sleep between profiles.
+        """
+        executor = ThreadPoolExecutor(max_workers=CONFIG["lead_workers"])
+        try:
+            futures = []
+            for query in queries:
+                print(f"\n=== Processing query: {query} ===")
+                search_results = self.search_linkedin_profiles(query, max_leads)
+                print(f"Found {len(search_results)} search results")
+                futures.extend(executor.submit(self._process_search_result, r) for r in search_results)
 
-                except Exception as e:
-                    print(f"❌ Error processing profile: {e}")
+            processed_count = 0
+            for completed, future in enumerate(as_completed(futures), 1):
+                profile = future.result()
+                report_progress(stage="enrich_profiles", done=completed, total=len(futures))
+                if profile is None:
                     continue
+                processed_count += 1
+                print(f"✓ Processed {processed_count}/{len(futures)} - {profile['name']}")
+                yield profile
+        finally:
+            # A closed stream (client went away) drops the profiles not yet started
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            if len(queries) > 1:
-                time.sleep(random.uniform(5, 10))
+    def generate_leads_enhanced(self, queries: List[str], max_leads: int = 20) -> List[Dict]:
+        all_leads = list(self.iter_leads(queries, max_leads))
 
-        print(f"\n🎯 Final: {len(all_leads)} leads processed from {len(search_results)} results")
+        print(f"\n🎯 Final: {len(all_leads)} leads processed")
         return sorted(all_leads, key=lambda x: x['lead_score'], reverse=True)
 
     def calculate_enhanced_lead_score(self, profile: Dict) -> int:
@@ -1851,8 +1860,76 @@ class LinkedInLeadGenerator:
 # ---------- Flask Blueprint Setup ----------
 lead_generator_bp = Blueprint('lead_generator', __name__)
 
+LEAD_REQUIRED_FIELDS = [
+    'name', 'company', 'job_title', 'location', 'industry', 
+    'domain', 'url', 'lead_score', 'all_emails', 'phone_numbers',
+    'search_emails', 'search_phones', 'website_employees', 'company_info',
+    'company_social_links', 'website_contact_forms'
+]
+
+def serialize_lead(lead_generator, lead):
+    """JSON-safe lead with every expected field present"""
+    serialized_lead = lead_generator._clean_lead_data(lead)
+
+    for field in LEAD_REQUIRED_FIELDS:
+        if field not in serialized_lead:
+            if field in ['location', 'industry', 'domain', 'job_title', 'company']:
+                serialized_lead[field] = None
+            elif field == 'company_info':
+                serialized_lead[field] = {}
+            else:
+                serialized_lead[field] = []
+    return serialized_lead
+
+def build_leads_summary(serialized_leads):
+    return {
+        "summary": {
+            "total_leads": len(serialized_leads),
+            "leads_with_emails": len([l for l in serialized_leads if l.get('all_emails')]),
+            "leads_with_phones": len([l for l in serialized_leads if l.get('phone_numbers')]),
+            "leads_with_location": len([l for l in serialized_leads if l.get('location')]),
+            "leads_with_industry": len([l for l in serialized_leads if l.get('industry')]),
+            "leads_with_company": len([l for l in serialized_leads if l.get('company')]),
+            "leads_with_job_title": len([l for l in serialized_leads if l.get('job_title')])
+        },
+        "data_breakdown": {
+            "emails_found": sum(len(l.get('all_emails', [])) for l in serialized_leads),
+            "phones_found": sum(len(l.get('phone_numbers', [])) for l in serialized_leads),
+            "search_emails_found": sum(len(l.get('search_emails', [])) for l in serialized_leads),
+            "search_phones_found": sum(len(l.get('search_phones', [])) for l in serialized_leads)
+        },
+    }
+
+def stream_leads(lead_generator, queries, input_parameters):
+    """NDJSON stream: one {"type": "lead"} line per finished lead, then a summary line"""
+    serialized_leads = []
+    try:
+        for lead in lead_generator.iter_leads(queries, input_parameters["max_leads"]):
+            try:
+                serialized_lead = serialize_lead(lead_generator, lead)
+            except Exception as e:
+                print(f"Warning: Could not serialize lead: {e}")
+                continue
+            serialized_leads.append(serialized_lead)
+            yield json.dumps({"type": "lead", "lead": serialized_lead}) + "\n"
+
+        yield json.dumps({
+            "type": "summary",
+            "status": "success",
+            "generated_at": datetime.now().isoformat(),
+            "input_parameters": input_parameters,
+            "total_leads": len(serialized_leads),
+            **build_leads_summary(serialized_leads)
+        }) + "\n"
+        print(f"✅ Successfully streamed {len(serialized_leads)} leads")
+    except Exception as e:
+        print(f"❌ Error streaming leads: {e}")
+        yield json.dumps({"type": "error", "status": "error", "error": str(e)}) + "\n"
+
 @lead_generator_bp.route('/generate-leads', methods=['POST'])
+@background_job('generate_leads')
 def generate_leads_endpoint():
+    """Generate leads; send {"stream": true} or Accept: application/x-ndjson to stream them"""
     try:
         data = request.get_json()
         
@@ -1867,6 +1944,17 @@ def generate_leads_endpoint():
         
         lead_generator = LinkedInLeadGenerator()
         queries = [query]
+        input_parameters = {
+            "query": query,
+            "max_leads": max_leads
+        }
+
+        if data.get('stream') or 'application/x-ndjson' in request.headers.get('Accept', ''):
+            return Response(
+                stream_with_context(stream_leads(lead_generator, queries, input_parameters)),
+                mimetype='application/x-ndjson',
+                headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+            )
         
         leads = lead_generator.generate_leads_enhanced(queries, max_leads)
         
@@ -1874,56 +1962,19 @@ def generate_leads_endpoint():
         serialized_leads = []
         for lead in leads:
             try:
-                serialized_lead = lead_generator._clean_lead_data(lead)
-                
-                # Ensure all expected fields are present
-                required_fields = [
-                    'name', 'company', 'job_title', 'location', 'industry', 
-                    'domain', 'url', 'lead_score', 'all_emails', 'phone_numbers',
-                    'search_emails', 'search_phones', 'website_employees', 'company_info',
-                    'company_social_links', 'website_contact_forms'
-                ]
-
-                for field in required_fields:
-                    if field not in serialized_lead:
-                        if field in ['location', 'industry', 'domain', 'job_title', 'company']:
-                            serialized_lead[field] = None
-                        elif field == 'company_info':
-                            serialized_lead[field] = {}
-                        else:
-                            serialized_lead[field] = []
-                serialized_leads.append(serialized_lead)
+                serialized_leads.append(serialize_lead(lead_generator, lead))
             except Exception as e:
                 print(f"Warning: Could not serialize lead: {e}")
                 continue
         
         # Build comprehensive response
-        # Modify your response to include missing data
         response_data = {
             "status": "success",
             "generated_at": datetime.now().isoformat(),
-            "input_parameters": {
-                "query": query,
-                "max_leads": max_leads
-            },
+            "input_parameters": input_parameters,
             "total_leads": len(serialized_leads),
             "leads": serialized_leads,
-            "summary": {
-                "total_leads": len(serialized_leads),
-                "leads_with_emails": len([l for l in serialized_leads if l.get('all_emails')]),
-                "leads_with_phones": len([l for l in serialized_leads if l.get('phone_numbers')]),
-                "leads_with_location": len([l for l in serialized_leads if l.get('location')]),
-                "leads_with_industry": len([l for l in serialized_leads if l.get('industry')]),
-                "leads_with_company": len([l for l in serialized_leads if l.get('company')]),
-                "leads_with_job_title": len([l for l in serialized_leads if l.get('job_title')])
-            },
-            "data_breakdown": {
-                "emails_found": sum(len(l.get('all_emails', [])) for l in serialized_leads),
-                "phones_found": sum(len(l.get('phone_numbers', [])) for l in serialized_leads),
-                "search_emails_found": sum(len(l.get('search_emails', [])) for l in serialized_leads),
-                "search_phones_found": sum(len(l.get('search_phones', [])) for l in serialized_leads)
-            },
-          
+            **build_leads_summary(serialized_leads)
         }
         
         print(f"✅ Successfully processed {len(serialized_leads)} leads")
@@ -1941,6 +1992,7 @@ def generate_leads_endpoint():
 
 
 @lead_generator_bp.route('/scrape-events', methods=['POST'])
+@background_job('scrape_events')
 def scrape_events_endpoint():
     """
     Scrapes worldwide events from DuckDuckGo and extracts attendee information
@@ -1971,9 +2023,8 @@ def scrape_events_endpoint():
         
         # Use DDGS to search for events
         try:
-            ddgs = DDGS(timeout=10)
             search_query = f"{event_name} event conference summit"
-            results = ddgs.text(search_query, max_results=20)
+            results = search_client.text(search_query, max_results=20)
         except Exception as e:
             print(f"DDGS search error: {e}")
             results = []
@@ -2009,17 +2060,9 @@ def scrape_events_endpoint():
             }
             
             # Extract emails and phone numbers from description
-            emails_in_body = EMAIL_REGEX.findall(body) if body else []
-            phones_in_body = []
-            
-            if body:
-                phone_matches = PHONE_REGEX.findall(body)
-                for match_tuple in phone_matches:
-                    # match_tuple is a tuple of groups; find the non-empty one
-                    for group in match_tuple:
-                        if group:
-                            phones_in_body.append(group)
-                            break
+            found = extract_contacts(body)
+            emails_in_body = found["emails"]
+            phones_in_body = found["phones"]
             
             # Add unique contacts
             if emails_in_body:
@@ -2074,6 +2117,7 @@ def scrape_events_endpoint():
         }), 500
 
 @lead_generator_bp.route('/discover-events', methods=['POST'])
+@background_job('discover_events')
 def discover_events_endpoint():
     """
     Lightweight event discovery for GoogleScraperTab (search mode).
@@ -2091,8 +2135,7 @@ def discover_events_endpoint():
         sources_used = []
 
         try:
-            ddgs = DDGS(timeout=10)
-            results = ddgs.text(f"{query} conference event summit expo", max_results=10)
+            results = search_client.text(f"{query} conference event summit expo", max_results=10)
         except Exception as e:
             print(f"DDGS error in discover-events: {e}")
             results = []
@@ -6,6 +6,8 @@ from database import db
 import os
 import urllib.parse
 import time
+from services.http_client import http_client
+from services.zoho_sync import SYNCED, RETRYING, PendingLead, ZohoSyncQueue
 
 
 
@@ -15,6 +17,36 @@ zoho_crm_bp = Blueprint('zoho_crm', __name__)
 ZOHO_API_DOMAIN = os.getenv("ZOHO_API_DOMAIN", "https://www.zohoapis.in")
 ZOHO_ACCOUNTS_DOMAIN = os.getenv("ZOHO_ACCOUNTS_DOMAIN", "https://accounts.zoho.in")
 DEFAULT_USER_ID = int(os.getenv("DEFAULT_ZOHO_USER_ID", "1"))
+
+def build_zoho_lead(lead_data):
+    """Zoho CRM Leads record for our lead_data dict"""
+    # Extract name parts and ensure Last_Name is not empty
+    first_name = lead_data.get('first_name', 'Unknown')
+    last_name = lead_data.get('last_name', '')
+    email = lead_data.get('email', '')
+    
+    # If last_name is empty, use a default value or derive from first_name/email
+    if not last_name:
+        if first_name and first_name != 'Unknown':
+            # If we have a first name but no last name, use "Contact" as last name
+            last_name = 'Contact'
+        elif email:
+            # If we only have email, use the domain part as last name
+            last_name = email.split('@')[1].split('.')[0].title()
+        else:
+            # Final fallback
+            last_name = 'Lead'
+    
+    return {
+        "Company": lead_data.get('company', 'Unknown Company'),
+        "First_Name": first_name,
+        "Last_Name": last_name,  # This field is MANDATORY for Zoho CRM
+        "Email": email,
+        "Phone": lead_data.get('phone', ''),
+        "Description": lead_data.get('description', ''),
+        "Lead_Source": "Email Campaign"
+    }
+
 def ensure_user_settings_table():
     """Create the user_settings table if it doesn't exist with proper schema"""
     connection = db.get_connection()
@@ -190,7 +222,7 @@ class ZohoCRMHandler:
             }
             
             print(f"=== DEBUG: Refreshing access token ===")
-            response = requests.post(url, data=data)
+            response = http_client.post(url, data=data)
             
             if response.status_code == 200:
                 token_data = response.json()
@@ -240,39 +272,10 @@ class ZohoCRMHandler:
                 'Content-Type': 'application/json'
             }
             
-            # Extract name parts and ensure Last_Name is not empty
-            first_name = lead_data.get('first_name', 'Unknown')
-            last_name = lead_data.get('last_name', '')
-            email = lead_data.get('email', '')
-            
-            # If last_name is empty, use a default value or derive from first_name/email
-            if not last_name:
-                if first_name and first_name != 'Unknown':
-                    # If we have a first name but no last name, use "Contact" as last name
-                    last_name = 'Contact'
-                elif email:
-                    # If we only have email, use the domain part as last name
-                    last_name = email.split('@')[1].split('.')[0].title()
-                else:
-                    # Final fallback
-                    last_name = 'Lead'
-            
             # Prepare lead data according to Zoho CRM API
-            zoho_lead_data = {
-                "data": [
-                    {
-                        "Company": lead_data.get('company', 'Unknown Company'),
-                        "First_Name": first_name,
-                        "Last_Name": last_name,  # This field is MANDATORY for Zoho CRM
-                        "Email": email,
-                        "Phone": lead_data.get('phone', ''),
-                        "Description": lead_data.get('description', ''),
-                        "Lead_Source": "Email Campaign"
-                    }
-                ]
-            }
+            zoho_lead_data = {"data": [build_zoho_lead(lead_data)]}
             
-            response = requests.post(url, headers=headers, json=zoho_lead_data, timeout=30)
+            response = http_client.post(url, headers=headers, json=zoho_lead_data, timeout=30)
             
             # Check if response is HTML (error page) instead of JSON
             content_type = response.headers.get('content-type', '')
@@ -320,6 +323,49 @@ class ZohoCRMHandler:
             print(f"=== DEBUG: {error_msg} ===")
             return False, error_msg
 
+    def upsert_leads_in_zoho(self, user_id=1, leads=None, _refreshed=False):
+        """Insert or update up to 100 leads in one request, matched on Email
+
+        Returns (status_code, per-record results in input order) when Zoho
+        answers per record, else (status_code or None on network errors, message).
+        """
+        leads = leads or []
+        access_token = self.get_valid_access_token(user_id)
+        if not access_token:
+            return 401, "No valid access token available"
+        
+        url = f"{self.api_domain}/crm/v2/Leads/upsert"
+        headers = {
+            'Authorization': f'Zoho-oauthtoken {access_token}',
+            'Content-Type': 'application/json'
+        }
+        payload = {
+            "data": [build_zoho_lead(lead) for lead in leads],
+            "duplicate_check_fields": ["Email"]
+        }
+        
+        try:
+            response = http_client.post(url, headers=headers, json=payload, timeout=30)
+        except requests.exceptions.RequestException as e:
+            return None, f"Network error connecting to Zoho CRM: {str(e)}"
+        
+        if response.status_code == 401 and not _refreshed:
+            if self.refresh_access_token(user_id):
+                return self.upsert_leads_in_zoho(user_id, leads, _refreshed=True)
+            return 401, "Authentication failed. Please reconnect your Zoho CRM account."
+        
+        try:
+            body = response.json()
+        except ValueError:
+            return response.status_code, f"Zoho CRM returned a non-JSON response (Status: {response.status_code})"
+        
+        # Zoho answers per record even when some (or all) of them fail
+        records = body.get('data') if isinstance(body, dict) else None
+        if isinstance(records, list) and len(records) == len(leads):
+            return response.status_code, records
+        error_msg = body.get('message', response.text[:200]) if isinstance(body, dict) else response.text[:200]
+        return response.status_code, f"Failed to upsert leads: {response.status_code} - {error_msg}"
+
     def find_lead_by_email(self, email, user_id=1):
         """Find existing lead in Zoho CRM by email"""
         access_token = self.get_valid_access_token(user_id)
@@ -337,7 +383,7 @@ class ZohoCRMHandler:
                 'criteria': f"(Email:equals:{email})"
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = http_client.get(url, headers=headers, params=params, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -360,6 +406,9 @@ class ZohoCRMHandler:
 # Create Zoho CRM handler instance
 zoho_handler = ZohoCRMHandler()
 
+# Leads from campaign sends are batched to Zoho in the background
+zoho_sync_queue = ZohoSyncQueue(zoho_handler)
+
 @zoho_crm_bp.route('/debug-config')
 def debug_config():
     """Debug endpoint to check current configuration"""
@@ -435,70 +484,58 @@ def add_all_leads_to_zoho():
             'total': len(replied_users),
             'successful': 0,
             'failed': 0,
+            'queued': 0,
             'errors': []
         }
         
-        # Process each user and add to Zoho CRM
+        pending = []
         for user in replied_users:
-            try:
-                # Parse user data
-                user_id = user[0]
-                recipient_name = user[1] or ''
-                email = user[2] or ''
-                reply_message = user[3] or ''
-                reply_time = user[4] or ''
-                
-                # Simple name parsing
-                name_parts = recipient_name.split()
-                first_name = name_parts[0] if name_parts else ''
-                last_name = ' '.join(name_parts[1:]) if len(name_parts) > 1 else ''
-                
-                if not first_name and email:
-                    first_name = email.split('@')[0]
-                
-                # Prepare lead data for Zoho CRM
-                lead_data = {
-                    'first_name': first_name,
-                    'last_name': last_name,
-                    'email': email,
-                    'phone': '',
-                    'description': f"Reply received: {reply_message}\n\nReply Time: {reply_time}",
-                    'company': 'Unknown Company'
-                }
-                
-                # Create lead in Zoho CRM
-                success, message = zoho_handler.create_lead_in_zoho(user_id=1, lead_data=lead_data)
-                
-                if success:
-                    # ✅ UPDATE THE DATABASE TO MARK AS SYNCED
-                    cursor.execute(
-                        "UPDATE email_tracking SET added_to_zoho = 1 WHERE id = ?",
-                        (user_id,)
-                    )
-                    results['successful'] += 1
-                    print(f"=== DEBUG: Successfully synced and updated user_id {user_id} ===")
-                else:
-                    results['failed'] += 1
-                    results['errors'].append({
-                        'user_id': user_id,
-                        'email': email,
-                        'error': message
-                    })
-                    
-            except Exception as e:
+            # Parse user data
+            tracking_id = user[0]
+            recipient_name = user[1] or ''
+            email = user[2] or ''
+            reply_message = user[3] or ''
+            reply_time = user[4] or ''
+            
+            # Simple name parsing
+            name_parts = recipient_name.split()
+            first_name = name_parts[0] if name_parts else ''
+            last_name = ' '.join(name_parts[1:]) if len(name_parts) > 1 else ''
+            
+            if not first_name and email:
+                first_name = email.split('@')[0]
+            
+            # Prepare lead data for Zoho CRM
+            lead_data = {
+                'first_name': first_name,
+                'last_name': last_name,
+                'email': email,
+                'phone': '',
+                'description': f"Reply received: {reply_message}\n\nReply Time: {reply_time}",
+                'company': 'Unknown Company'
+            }
+            pending.append(PendingLead(1, lead_data, tracking_id=tracking_id))
+        
+        # Upsert in batches of up to 100; synced rows are marked added_to_zoho,
+        # batches hit by rate limits or network errors are retried in the background
+        for lead, state, message in zoho_sync_queue.push(1, pending):
+            if state == SYNCED:
+                results['successful'] += 1
+            elif state == RETRYING:
+                results['queued'] += 1
+            else:
                 results['failed'] += 1
                 results['errors'].append({
-                    'user_id': user_id,
-                    'email': email,
-                    'error': str(e)
+                    'user_id': lead.tracking_id,
+                    'email': lead.email,
+                    'error': message
                 })
         
-        # Commit all database updates
-        connection.commit()
-        
         # Prepare response message
-        if results['successful'] > 0:
+        if results['successful'] > 0 or results['queued'] > 0:
             message = f"Successfully added {results['successful']} out of {results['total']} users to Zoho CRM"
+            if results['queued'] > 0:
+                message += f". {results['queued']} queued for retry."
             if results['failed'] > 0:
                 message += f". {results['failed']} failed."
             return jsonify({
@@ -543,7 +580,7 @@ def test_zoho_connection():
         print(f"=== DEBUG: Testing Zoho connection to: {url} ===")
         print(f"=== DEBUG: Using access token: {access_token[:20]}... ===")
         
-        response = requests.get(url, headers=headers, timeout=30)
+        response = http_client.get(url, headers=headers, timeout=30)
         
         print(f"=== DEBUG: Test connection response status: {response.status_code} ===")
         
@@ -780,7 +817,7 @@ def oauth_callback():
         
         print(f"=== DEBUG: Token exchange request to: {token_url} ===")
         
-        response = requests.post(token_url, data=token_data)
+        response = http_client.post(token_url, data=token_data)
         
         if response.status_code == 200:
             token_info = response.json()
@@ -879,6 +916,11 @@ def zoho_connection_status():
             'message': 'Zoho credentials not configured'
         })
 
+@zoho_crm_bp.route('/sync-queue-stats')
+def zoho_sync_queue_stats():
+    """Counters for the background lead sync queue"""
+    return jsonify({'success': True, 'zoho_sync': zoho_sync_queue.stats()})
+
 @zoho_crm_bp.route('/add-lead', methods=['POST'])
 def add_lead_to_zoho():
     """Add a replied user as a lead to Zoho CRM - no authentication required"""
@@ -1194,7 +1236,7 @@ def update_lead_with_tracking(lead, email_subject, tracking_data):
         }
         
         print(f"=== DEBUG: Updating lead {lead_id} with tracking data ===")
-        response = requests.put(url, headers=headers, json=update_data)
+        response = http_client.put(url, headers=headers, json=update_data)
         
         if response.status_code in [200, 201, 202]:
             response_data = response.json()
@@ -1346,7 +1388,7 @@ def add_tracking_note_to_lead(lead_id, email_subject, tracking_data, access_toke
             ]
         }
         
-        response = requests.post(url, headers=headers, json=note_data)
+        response = http_client.post(url, headers=headers, json=note_data)
         if response.status_code in [200, 201]:
             print(f"=== DEBUG: Added tracking note to lead {lead_id} ===")
             return True
@@ -1561,7 +1603,7 @@ def get_tracking_summary():
             'criteria': "(Lead_Source:equals:Email Campaign Tracking)or(Description:contains:Email Tracking)"
         }
         
-        response = requests.get(url, headers=headers, params=params)
+        response = http_client.get(url, headers=headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+bench_contact_extraction.py
+
+Micro-benchmark for utils.contact_extraction against the regexes it replaced.
+
+Usage:
+  python scripts/bench_contact_extraction.py                 # pages from cache/http/
+  python scripts/bench_contact_extraction.py --pages dir/    # any .html/.body files
+  python scripts/bench_contact_extraction.py --repeat 5
+
+The corpus is the page bodies the shared HTTP client has cached under
+cache/http/ (real scraped company pages), plus any files passed with --pages.
+
+The script also times adversarial inputs (long digit/separator runs, long
+address-like runs without a TLD) at size N and 4N. It exits with status 1 if
+the new extractor grows faster than linearly on them, which signals
+catastrophic backtracking.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.contact_extraction import extract_contacts  # noqa: E402
+
+LEGACY_EMAIL_REGEX = re.compile(r"[a-zA-Z0-9.\-+_]{1,64}@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}", re.I)
+LEGACY_PHONE_REGEX = re.compile(
+    r'(\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,4})'
+    r'|(\+?\(\d{1,4}\)[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,4})'
+    r'|(\d{3}[-.\s]?\d{3}[-.\s]?\d{4})'
+    r'|(\d{4}[-.\s]?\d{3}[-.\s]?\d{3})'
+    r'|(\d{2}[-.\s]?\d{4}[-.\s]?\d{4})'
+    r'|(\+\d{1,3}[-.\s]?\d{1,14})'
+    r'|(tel[:\s]+[\+]?[\d\s\-\(\)]{7,})'
+    r'|(phone[:\s]+[\+]?[\d\s\-\(\)]{7,})'
+    r'|(mobile[:\s]+[\+]?[\d\s\-\(\)]{7,})'
+)
+
+SAMPLE_PAGE = (
+    "Contact us at info@example-corp.com or sales@example-corp.co.uk. "
+    "Call +1 (415) 555-1234, 020 7946 0958 or tel: 4155551234. "
+    "Offices in London, Bangalore and San Francisco. (c) 2019-2024 Example Corp. "
+) * 200
+
+# Growth ratio allowed for a 4x larger adversarial input before flagging
+MAX_GROWTH_FOR_4X = 8.0
+
+
+def legacy_extract(text):
+    emails = set(m.group(0).strip().rstrip('.,;:') for m in LEGACY_EMAIL_REGEX.finditer(text))
+    phones = set()
+    for match in LEGACY_PHONE_REGEX.finditer(text):
+        for group_num in range(1, len(match.groups()) + 1):
+            phone = match.group(group_num)
+            if phone and phone.strip():
+                phones.add(phone.strip())
+                break
+    return emails, phones
+
+
+def new_extract(text):
+    found = extract_contacts(text)
+    return set(found["emails"]), set(found["phones"])
+
+
+def load_corpus(paths):
+    pages = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = [os.path.join(path, f) for f in sorted(os.listdir(path))
+                     if f.endswith(('.body', '.html', '.htm', '.txt'))]
+        elif os.path.exists(path):
+            files = [path]
+        else:
+            files = []
+        for file_path in files:
+            with open(file_path, 'rb') as f:
+                pages.append(f.read().decode('utf-8', errors='ignore'))
+    return pages
+
+
+def time_it(func, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def adversarial_inputs(size):
+    return {
+        "digit_separator_run": "1-2 3.4 (5) " * (size // 12),
+        "long_digit_run": "1" * size,
+        "address_without_tld": ("a" * 60 + "@" + "b-" * 40 + " ") * (size // 142),
+        "dotted_domain_run": "x@" + "a." * (size // 2),
+        "plus_run": "+" * size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email/phone extraction")
+    parser.add_argument('--pages', nargs='*', default=[], help='Extra page files or directories')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is kept)')
+    parser.add_argument('--size', type=int, default=20000, help='Base adversarial input size')
+    args = parser.parse_args()
+
+    corpus = load_corpus([os.path.join('cache', 'http')] + args.pages)
+    if not corpus:
+        print("No cached pages found; using the built-in sample page.")
+        corpus = [SAMPLE_PAGE]
+    total_kb = sum(len(p) for p in corpus) / 1024
+    print(f"Corpus: {len(corpus)} page(s), {total_kb:.0f} KB")
+
+    legacy_time = time_it(legacy_extract, corpus, args.repeat)
+    new_time = time_it(new_extract, corpus, args.repeat)
+    print(f"  legacy regexes : {legacy_time * 1000:8.1f} ms")
+    print(f"  single pass    : {new_time * 1000:8.1f} ms  ({legacy_time / new_time:.1f}x)")
+
+    failed = False
+    print(f"\nAdversarial inputs (N={args.size} vs 4N):")
+    small = adversarial_inputs(args.size)
+    large = adversarial_inputs(args.size * 4)
+    for name in small:
+        t_small = time_it(new_extract, [small[name]], args.repeat)
+        t_large = time_it(new_extract, [large[name]], args.repeat)
+        growth = t_large / t_small if t_small else 0.0
+        status = "ok" if growth <= MAX_GROWTH_FOR_4X else "SUPERLINEAR"
+        failed = failed or status != "ok"
+        print(f"  {name:<22} {t_small * 1000:7.2f} ms -> {t_large * 1000:7.2f} ms  x{growth:4.1f}  {status}")
+
+    if failed:
+        print("\nFAILED: extraction time grows faster than input size")
+        sys.exit(1)
+    print("\nDone.")
+
+
+if __name__ == '__main__':
+    main()
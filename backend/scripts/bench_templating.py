@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+bench_templating.py
+
+Micro-benchmark for utils.templating against the str.replace/re.sub chain
+replace_placeholders used before.
+
+Usage:
+  python scripts/bench_templating.py
+  python scripts/bench_templating.py --recipients 5000 --repeat 5
+
+Each round personalises one campaign subject and body for every recipient
+three ways: the legacy replace chain, replace_placeholders (compiled template
+looked up in the cache per call) and a template compiled once up front and
+rendered per recipient, as run_template_campaign does. The script exits with
+status 1 if the new output differs from the legacy output for any recipient.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import placeholder_values, replace_placeholders  # noqa: E402
+from utils.templating import compile_template  # noqa: E402
+
+SUBJECT = "Quick question for [Client Name] at {{company}}"
+
+BODY = (
+    "Hello {{name}},\n\n"
+    "I noticed {company} is hiring for the [Job Title] role and wanted to share how teams like yours "
+    "cut onboarding time in half. As {position}, you probably see the cost of slow ramp-up first hand.\n\n"
+    "Our platform plugs into the tools [Organization] already uses, and most customers are live within "
+    "a week. Would a 15 minute call next Tuesday work? You can also reach me directly on {{sender_phone}} "
+    "or reply to {{sender_email}}.\n\n"
+    "If someone else at [Business] owns this, I'd appreciate a pointer to the right [Hiring Manager Name].\n\n"
+    "Regards,\n{{sender_name}}\n{{phone_number}}\n"
+) * 3
+
+SENDER = ("Priya Raman", "priya@example.com", "+1 415 555 0100")
+
+
+def legacy_replace_placeholders(text, name, position="", company="", phone="", sender_name="", sender_email="", sender_phone=""):
+    """replace_placeholders as it was before utils.templating (sender details always supplied here)"""
+    if not text:
+        return ""
+    for placeholder in ("{{name}}", "{name}", "[Name]", "[Candidate Name]", "[Client Name]", "[name]", "[client name]"):
+        text = text.replace(placeholder, name)
+    for placeholder in ("{{position}}", "{position}", "[Position]", "[position]", "[Job Title]", "[job title]", "[Role]", "[role]"):
+        text = text.replace(placeholder, position)
+    for placeholder in ("{{company}}", "{company}", "[Company]", "[company]", "[Organization]", "[organization]", "[Business]", "[business]"):
+        text = text.replace(placeholder, company)
+    for placeholder in ("{{phone}}", "{phone}", "[Phone]", "[phone]", "[Mobile]", "[mobile]"):
+        text = text.replace(placeholder, phone)
+    text = re.sub(r"\[(.*?name.*?)\]", name, text, flags=re.IGNORECASE)
+    text = re.sub(r"\[(.*?position.*?)\]", position, text, flags=re.IGNORECASE)
+    text = re.sub(r"\[(.*?title.*?)\]", position, text, flags=re.IGNORECASE)
+    if sender_name:
+        text = text.replace("{{sender_name}}", sender_name)
+    if sender_email:
+        text = text.replace("{{sender_email}}", sender_email)
+    if sender_phone:
+        text = text.replace("{{sender_phone}}", sender_phone)
+        text = text.replace("{{phone_number}}", sender_phone)
+    return text
+
+
+def make_recipients(count):
+    return [
+        (f"Contact {i}", ("Head of Talent", "VP Engineering", "Operations Lead")[i % 3],
+         f"Company {i % 97}", f"+1 555 01{i % 100:02d}")
+        for i in range(count)
+    ]
+
+
+def run_legacy(recipients):
+    return [
+        (legacy_replace_placeholders(SUBJECT, *r, *SENDER), legacy_replace_placeholders(BODY, *r, *SENDER))
+        for r in recipients
+    ]
+
+
+def run_helper(recipients):
+    return [
+        (replace_placeholders(SUBJECT, *r, *SENDER), replace_placeholders(BODY, *r, *SENDER))
+        for r in recipients
+    ]
+
+
+def run_precompiled(recipients):
+    subject, body = compile_template(SUBJECT), compile_template(BODY)
+    out = []
+    for r in recipients:
+        values = placeholder_values(*r, *SENDER)
+        out.append((subject.render(values), body.render(values)))
+    return out
+
+
+def time_it(func, recipients, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(recipients)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark placeholder rendering")
+    parser.add_argument('--recipients', type=int, default=2000, help='Recipients per round')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is kept)')
+    args = parser.parse_args()
+
+    recipients = make_recipients(args.recipients)
+    print(f"Campaign: {len(BODY)} char body, {len(recipients)} recipient(s)")
+
+    legacy_time, expected = time_it(run_legacy, recipients, args.repeat)
+    helper_time, helper_out = time_it(run_helper, recipients, args.repeat)
+    compiled_time, compiled_out = time_it(run_precompiled, recipients, args.repeat)
+    per = 1e6 / len(recipients)
+    print(f"  legacy replace chain  : {legacy_time * 1000:8.1f} ms  ({legacy_time * per:6.1f} us/recipient)")
+    print(f"  replace_placeholders  : {helper_time * 1000:8.1f} ms  ({legacy_time / helper_time:.1f}x)")
+    print(f"  compiled once, render : {compiled_time * 1000:8.1f} ms  ({legacy_time / compiled_time:.1f}x)")
+
+    mismatches = sum(1 for a, b, c in zip(expected, helper_out, compiled_out) if not (a == b == c))
+    if mismatches:
+        print(f"\nFAILED: {mismatches} recipient(s) rendered differently from the legacy helper")
+        sys.exit(1)
+    print("\nDone.")
+
+
+if __name__ == '__main__':
+    main()
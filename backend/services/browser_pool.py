@@ -0,0 +1,267 @@
+"""
+Warm pool of Selenium browsers
+
+Starting a browser (and letting webdriver_manager resolve its driver) costs
+several seconds, so scrapes lease an already running instance instead. Each
+lease gets a fresh tab; when it is returned the extra tabs are closed and
+cookies cleared so the next request starts clean. Instances are health-checked
+on checkout and retired after BROWSER_MAX_USES leases, when their process tree
+grows past BROWSER_MAX_RSS_MB, or after sitting idle for BROWSER_IDLE_SECONDS.
+At most BROWSER_POOL_SIZE browsers are leased at once.
+"""
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 2))
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", 25))
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", 1500))
+BROWSER_IDLE_SECONDS = int(os.getenv("BROWSER_IDLE_SECONDS", 600))
+BROWSER_LEASE_TIMEOUT = int(os.getenv("BROWSER_LEASE_TIMEOUT", 120))
+# Scrapers rely on explicit WebDriverWait conditions
+DEFAULT_IMPLICIT_WAIT = 0
+
+CHROMIUM_BROWSERS = ("chrome", "edge")
+
+
+def _child_pids(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return children
+
+
+def process_tree_rss_mb(pid: Optional[int]) -> float:
+    """Resident memory of pid and all its descendants (Linux /proc; 0 elsewhere)"""
+    if not pid:
+        return 0.0
+    total_kb = 0
+    pending, seen = [pid], set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+        pending.extend(_child_pids(current))
+    return total_kb / 1024
+
+
+class PooledBrowser:
+    def __init__(self, key: Tuple[str, bool], driver):
+        self.key = key
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.base_handle = driver.current_window_handle
+
+    @property
+    def pid(self) -> Optional[int]:
+        # The driver service (chromedriver/geckodriver) is the parent of the browser processes
+        process = getattr(getattr(self.driver, "service", None), "process", None)
+        return getattr(process, "pid", None)
+
+    def rss_mb(self) -> float:
+        return process_tree_rss_mb(self.pid)
+
+
+class BrowserPool:
+    """Lease warm browsers keyed by (browser, headless)"""
+
+    def __init__(self, factory: Callable, resolve: Callable[[str], str] = lambda b: b,
+                 prepare: Optional[Callable] = None,
+                 max_size: int = BROWSER_POOL_SIZE, max_uses: int = BROWSER_MAX_USES,
+                 max_rss_mb: int = BROWSER_MAX_RSS_MB, idle_seconds: int = BROWSER_IDLE_SECONDS):
+        self.factory = factory
+        self.resolve = resolve
+        self.prepare = prepare
+        self.max_size = max(1, max_size)
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.idle_seconds = idle_seconds
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, bool], List[PooledBrowser]] = {}
+        self._leased = 0
+        self._stats = {"started": 0, "leases": 0, "reused": 0, "retired": {}}
+        atexit.register(self.shutdown)
+
+    # ---- lifecycle -------------------------------------------------------
+
+    def _start(self, key: Tuple[str, bool]) -> PooledBrowser:
+        browser, headless = key
+        started = time.time()
+        driver = self.factory(browser=browser, headless=headless)
+        with self._lock:
+            self._stats["started"] += 1
+        print(f"🌐 Browser pool: started {browser} (headless={headless}) in {time.time() - started:.1f}s")
+        return PooledBrowser(key, driver)
+
+    def _retire(self, pooled: PooledBrowser, reason: str):
+        with self._lock:
+            retired = self._stats["retired"]
+            retired[reason] = retired.get(reason, 0) + 1
+        print(f"♻️ Browser pool: retiring {pooled.key[0]} after {pooled.uses} use(s) ({reason})")
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def _healthy(self, pooled: PooledBrowser) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _take_idle(self, key: Tuple[str, bool]) -> Tuple[Optional[PooledBrowser], List[Tuple[PooledBrowser, str]]]:
+        """Pop a reusable idle browser for key and collect the ones to retire"""
+        now = time.time()
+        to_retire = []
+        with self._lock:
+            for idle in self._idle.values():
+                for pooled in list(idle):
+                    if now - pooled.last_used > self.idle_seconds:
+                        idle.remove(pooled)
+                        to_retire.append((pooled, "idle"))
+
+            candidate = self._idle.get(key, []).pop() if self._idle.get(key) else None
+            if candidate is None:
+                # Make room for a new instance by evicting an idle browser of another kind
+                live = self._leased + sum(len(idle) for idle in self._idle.values())
+                if live >= self.max_size:
+                    for idle in self._idle.values():
+                        if idle:
+                            to_retire.append((idle.pop(0), "evicted"))
+                            break
+            self._leased += 1
+        return candidate, to_retire
+
+    def _checkout(self, key: Tuple[str, bool]) -> PooledBrowser:
+        candidate, to_retire = self._take_idle(key)
+        for pooled, reason in to_retire:
+            self._retire(pooled, reason)
+
+        pooled = None
+        try:
+            if candidate is not None and not self._healthy(candidate):
+                self._retire(candidate, "unhealthy")
+                candidate = None
+            pooled = candidate or self._start(key)
+            # Isolated tab for this lease; closed again on checkin
+            pooled.driver.switch_to.new_window("tab")
+            if self.prepare:
+                self.prepare(pooled.driver)
+        except Exception:
+            if pooled is not None:
+                self._retire(pooled, "checkout_failed")
+            with self._lock:
+                self._leased -= 1
+            raise
+
+        pooled.uses += 1
+        with self._lock:
+            self._stats["leases"] += 1
+            if candidate is not None:
+                self._stats["reused"] += 1
+        return pooled
+
+    def _reset(self, pooled: PooledBrowser):
+        driver = pooled.driver
+        for handle in driver.window_handles:
+            if handle != pooled.base_handle:
+                driver.switch_to.window(handle)
+                driver.close()
+        driver.switch_to.window(pooled.base_handle)
+        if pooled.key[0] in CHROMIUM_BROWSERS:
+            # Clears cookies for every site, not just the current one
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        else:
+            driver.delete_all_cookies()
+        driver.implicitly_wait(DEFAULT_IMPLICIT_WAIT)
+
+    def _checkin(self, pooled: PooledBrowser):
+        reason = None
+        if pooled.uses >= self.max_uses:
+            reason = "max_uses"
+        else:
+            try:
+                self._reset(pooled)
+            except Exception:
+                reason = "reset_failed"
+        if reason is None and self.max_rss_mb and pooled.rss_mb() > self.max_rss_mb:
+            reason = "memory"
+
+        with self._lock:
+            self._leased -= 1
+            if reason is None:
+                pooled.last_used = time.time()
+                self._idle.setdefault(pooled.key, []).append(pooled)
+        if reason is not None:
+            self._retire(pooled, reason)
+
+    # ---- public API ------------------------------------------------------
+
+    @contextmanager
+    def lease(self, browser: str = "auto", headless: bool = True, timeout: float = BROWSER_LEASE_TIMEOUT):
+        """Borrow a driver positioned on a fresh tab; blocks while the pool is at capacity"""
+        key = (self.resolve(browser), bool(headless))
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No browser available within {timeout}s ({self.max_size} in use)")
+        try:
+            pooled = self._checkout(key)
+            try:
+                yield pooled.driver
+            finally:
+                self._checkin(pooled)
+        finally:
+            self._slots.release()
+
+    def warm(self, browser: str = "auto", headless: bool = True, count: int = 1):
+        """Start browsers ahead of the first request"""
+        key = (self.resolve(browser), bool(headless))
+        for _ in range(min(count, self.max_size)):
+            pooled = self._start(key)
+            with self._lock:
+                self._idle.setdefault(key, []).append(pooled)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            idle = {f"{browser}{'' if headless else ' (headed)'}": len(pooled)
+                    for (browser, headless), pooled in self._idle.items()}
+            return {
+                "max_size": self.max_size,
+                "max_uses": self.max_uses,
+                "max_rss_mb": self.max_rss_mb,
+                "leased": self._leased,
+                "idle": idle,
+                "started": self._stats["started"],
+                "leases": self._stats["leases"],
+                "reused": self._stats["reused"],
+                "retired": dict(self._stats["retired"]),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            idle = [pooled for pooled_list in self._idle.values() for pooled in pooled_list]
+            self._idle.clear()
+        for pooled in idle:
+            try:
+                pooled.driver.quit()
+            except Exception:
+                pass
@@ -0,0 +1,222 @@
+"""
+Process-wide company -> domain cache
+
+Two size-bounded in-memory LRU tiers (positive and negative results with
+separate TTLs) sit in front of the on-disk ``cache/domain_*.json`` store that
+LinkedInLeadGenerator already writes, so every lookup path shares one cache.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+POSITIVE_TTL_SECONDS = int(os.getenv("DOMAIN_CACHE_TTL_SECONDS", 24 * 3600))
+NEGATIVE_TTL_SECONDS = int(os.getenv("DOMAIN_CACHE_NEGATIVE_TTL_SECONDS", 30 * 60))
+PERSISTENT_TTL_HOURS = int(os.getenv("DOMAIN_CACHE_PERSISTENT_TTL_HOURS", 24 * 7))
+MAX_POSITIVE_ENTRIES = int(os.getenv("DOMAIN_CACHE_MAX_ENTRIES", 5000))
+MAX_NEGATIVE_ENTRIES = int(os.getenv("DOMAIN_CACHE_MAX_NEGATIVE_ENTRIES", 2000))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry time-to-live and hit/miss counters"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __contains__(self, key: str) -> bool:
+        # Membership checks do not touch the LRU order or the counters
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and entry[1] > time.monotonic()
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def normalize_company(company_name: str) -> str:
+    """Cache key for a company: whitespace collapsed, lower-cased"""
+    return re.sub(r'\s+', ' ', company_name or '').strip().lower()
+
+
+class PersistentDomainStore:
+    """On-disk domain store, compatible with SimpleCache's ``domain_<company>.json`` files"""
+
+    def __init__(self, cache_dir: str = "cache", ttl_hours: int = PERSISTENT_TTL_HOURS):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.ttl = timedelta(hours=ttl_hours)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _get_cache_file(self, company_name: str) -> Path:
+        safe_key = re.sub(r'[^a-zA-Z0-9]', '_', f"domain_{company_name}")
+        return self.cache_dir / f"{safe_key}.json"
+
+    def get(self, company_name: str) -> Optional[str]:
+        # Older entries were written with the caller's original casing
+        candidates = [self._get_cache_file(normalize_company(company_name)), self._get_cache_file(company_name)]
+        for cache_file in candidates:
+            if not cache_file.exists():
+                continue
+            try:
+                with open(cache_file, 'r') as f:
+                    data = json.load(f)
+                cache_time = datetime.fromisoformat(data['timestamp'])
+                if datetime.now() - cache_time < self.ttl and data.get('value'):
+                    with self._lock:
+                        self.hits += 1
+                    return data['value']
+            except Exception:
+                continue
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, company_name: str, domain: str):
+        cache_file = self._get_cache_file(normalize_company(company_name))
+        data = {'timestamp': datetime.now().isoformat(), 'value': domain}
+        tmp_file = cache_file.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_file, cache_file)
+            with self._lock:
+                self.writes += 1
+        except Exception as e:
+            print(f"Domain cache write error for {company_name}: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "cache_dir": str(self.cache_dir),
+                "ttl_hours": self.ttl.total_seconds() / 3600,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+            }
+
+
+class DomainCache:
+    """Tiered company -> domain cache: positive LRU, negative LRU, then disk"""
+
+    def __init__(self, cache_dir: str = "cache"):
+        self.positive = TTLCache(MAX_POSITIVE_ENTRIES, POSITIVE_TTL_SECONDS)
+        self.negative = TTLCache(MAX_NEGATIVE_ENTRIES, NEGATIVE_TTL_SECONDS)
+        self.store = PersistentDomainStore(cache_dir)
+
+    @staticmethod
+    def normalize(company_name: str) -> str:
+        return normalize_company(company_name)
+
+    def get(self, company_name: str) -> Optional[str]:
+        """Return the cached domain, or None if unknown or known to have failed"""
+        key = self.normalize(company_name)
+        if not key:
+            return None
+
+        domain = self.positive.get(key)
+        if domain:
+            return domain
+        if self.negative.get(key):
+            return None
+
+        domain = self.store.get(company_name)
+        if domain:
+            self.positive.set(key, domain)
+        return domain
+
+    def is_known_failure(self, company_name: str) -> bool:
+        return self.normalize(company_name) in self.negative
+
+    def set(self, company_name: str, domain: str, persist: bool = True):
+        key = self.normalize(company_name)
+        if not key or not domain:
+            return
+        self.negative.delete(key)
+        self.positive.set(key, domain)
+        if persist:
+            self.store.set(key, domain)
+
+    def set_failed(self, company_name: str):
+        key = self.normalize(company_name)
+        if key:
+            self.negative.set(key, True)
+
+    def clear(self):
+        self.positive.clear()
+        self.negative.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "positive": self.positive.stats(),
+            "negative": self.negative.stats(),
+            "persistent": self.store.stats(),
+        }
+
+
+# Shared by CompanyEmailProcessor and LinkedInLeadGenerator
+domain_cache = DomainCache()
@@ -0,0 +1,185 @@
+"""
+Append-only event logs for sent emails and captured replies
+
+Both used to be Excel files that were read, extended by one row and rewritten
+on every send, which is quadratic over a campaign and corrupts the file when
+sender threads overlap. Events are now JSON Lines: ``append`` only buffers the
+record, and a background thread writes the buffer with a single append every
+EVENT_LOG_FLUSH_SECONDS (or as soon as EVENT_LOG_FLUSH_BATCH records are
+waiting). Excel/CSV downloads stream ``rows`` through utils.exports.
+
+An existing legacy .xlsx file is imported in front of the log before the
+first write, so downloads keep the history recorded before the switch. The
+import goes through a temp file renamed into place, and the .xlsx is then
+renamed to ``*.imported``; a failed import is retried every
+LEGACY_IMPORT_RETRY_SECONDS while events keep being appended.
+
+Nothing happens on import: the flush thread and the exit-time flush start with
+the first ``append``, and the legacy import runs on the first write or read.
+
+Records carry the ``user_id`` of the account that produced them, so downloads
+can be limited to the caller's own events.
+"""
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", ".")
+EVENT_LOG_FLUSH_SECONDS = float(os.getenv("EVENT_LOG_FLUSH_SECONDS", 1.0))
+EVENT_LOG_FLUSH_BATCH = int(os.getenv("EVENT_LOG_FLUSH_BATCH", 200))
+LEGACY_IMPORT_RETRY_SECONDS = 300
+
+SENT_EMAIL_COLUMNS = [
+    "timestamp", "sender_email", "sender_name", "recipient_email",
+    "subject", "body", "first_name", "last_name",
+    "company", "phone"
+]
+
+REPLY_COLUMNS = [
+    "timestamp", "sender_email", "recipient_email",
+    "subject", "body", "first_name", "last_name",
+    "company", "phone", "converted_to_lead", "zoho_lead_id"
+]
+
+
+class EventLog:
+    """Buffered JSON Lines log"""
+
+    def __init__(self, name: str, columns: List[str], legacy_excel: Optional[str] = None,
+                 directory: str = EVENT_LOG_DIR):
+        self.name = name
+        self.columns = columns
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self.legacy_excel = legacy_excel
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        # Serialises file writes so a flush and an export never interleave
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._prepared = False
+        self._retry_import_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def _start(self):
+        """Flush thread and exit-time flush, from the first append on"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._flush_loop, name=f"event-log-{self.name}", daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _prepare(self):
+        """Runs before writes until the legacy import is done; caller holds the write lock"""
+        if os.path.exists(self.path):
+            # Terminate a line torn by a crash so the next event starts on its own line
+            with open(self.path, "rb+") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+        if self.legacy_excel and os.path.exists(self.legacy_excel):
+            if time.time() < self._retry_import_at:
+                return
+            if not self._import_legacy():
+                self._retry_import_at = time.time() + LEGACY_IMPORT_RETRY_SECONDS
+                return
+        self._prepared = True
+
+    def _import_legacy(self) -> bool:
+        """Put the old Excel rows in front of the log; True once they are in"""
+        tmp_path = self.path + ".tmp"
+        try:
+            import pandas as pd
+            df = pd.read_excel(self.legacy_excel)
+            rows = df.astype(object).where(df.notna(), None).to_dict("records")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+                if os.path.exists(self.path):
+                    # Events appended while earlier attempts failed go after the history
+                    with open(self.path, encoding="utf-8") as current:
+                        shutil.copyfileobj(current, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ Event log {self.name}: could not import {self.legacy_excel}, will retry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        print(f"📥 Event log {self.name}: imported {len(rows)} row(s) from {self.legacy_excel}")
+        try:
+            os.replace(self.legacy_excel, self.legacy_excel + ".imported")
+        except OSError as e:
+            print(f"⚠️ Event log {self.name}: imported but could not rename {self.legacy_excel}: {e}")
+        return True
+
+    def append(self, record: Dict) -> bool:
+        line = json.dumps(record, default=str) + "\n"
+        if self._thread is None:
+            self._start()
+        with self._lock:
+            self._buffer.append(line)
+            full = len(self._buffer) >= EVENT_LOG_FLUSH_BATCH
+        if full:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            if not self._prepared:
+                self._prepare()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            except OSError as e:
+                print(f"❌ Event log {self.name}: write failed, {len(lines)} event(s) kept in memory: {e}")
+                with self._lock:
+                    self._buffer[:0] = lines
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(EVENT_LOG_FLUSH_SECONDS)
+            self._wake.clear()
+            self.flush()
+
+    def records(self) -> Iterator[Dict]:
+        """Every event in append order, buffered ones included"""
+        self.flush()
+        with self._write_lock:
+            # A log never written to still shows the legacy Excel history
+            if not self._prepared:
+                self._prepare()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-write
+                    continue
+
+    def rows(self, user_id=None) -> Iterator[List]:
+        """Events as value lists in ``columns`` order, for utils.exports
+
+        With a user_id only that user's events are returned; records without
+        an owner (imported from the legacy Excel files) are left out.
+        """
+        owner = None if user_id is None else str(user_id)
+        for record in self.records():
+            if owner is not None and str(record.get("user_id")) != owner:
+                continue
+            yield [record.get(column, "") for column in self.columns]
+
+
+sent_email_log = EventLog("sent_emails", SENT_EMAIL_COLUMNS, legacy_excel="sent_emails.xlsx")
+reply_log = EventLog("email_replies", REPLY_COLUMNS, legacy_excel="email_replies.xlsx")
@@ -0,0 +1,253 @@
+"""
+Shared pooled HTTP client
+
+One keep-alive ``requests.Session`` with per-host connection pools for the
+scrapers, the CRM clients and the email verifier API. ``get_cached`` adds
+conditional GETs: 200 responses carrying an ETag or Last-Modified are kept in
+a local response cache, revalidated with If-None-Match / If-Modified-Since and
+served from disk on 304. Responses are decompressed transparently.
+
+The cache is bounded like the in-memory TTLCache tiers: entries expire after
+HTTP_CACHE_TTL_SECONDS (a 304 renews them) and once more than
+HTTP_CACHE_MAX_ENTRIES are on disk the least recently used are removed.
+Responses that vary on Cookie or Authorization are never stored; for other
+``Vary`` headers the request values are recorded and an entry is only reused
+by a request that sends the same ones.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.cookiejar import DefaultCookiePolicy
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode "br")
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 64))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", 16))
+HTTP_DEFAULT_TIMEOUT = 30
+HTTP_CACHE_MAX_BODY_BYTES = int(os.getenv("HTTP_CACHE_MAX_BODY_BYTES", 2 * 1024 * 1024))
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", 5000))
+HTTP_CACHE_TTL_SECONDS = int(os.getenv("HTTP_CACHE_TTL_SECONDS", 24 * 3600))
+# Pruning goes a little below the limit so it does not run on every store
+HTTP_CACHE_PRUNE_RATIO = 0.9
+
+# Per-user responses must never be served to another caller
+_PRIVATE_VARY = {"*", "cookie", "authorization"}
+
+# Stored response headers needed to rebuild a usable Response on 304
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+
+class HttpClient:
+    """Thread-safe pooled session plus an ETag / Last-Modified response cache"""
+
+    def __init__(self, cache_dir: str = "cache/http"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_PER_HOST)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        # The session is shared across users and CRM accounts; never carry cookies between calls
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._entries: Optional[int] = None
+        self.counters = {
+            "requests": 0,
+            "conditional_requests": 0,
+            "not_modified": 0,
+            "cache_stores": 0,
+            "cache_expired": 0,
+            "cache_evictions": 0,
+            "errors": 0,
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", HTTP_DEFAULT_TIMEOUT)
+        self._count("requests")
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._count("errors")
+            raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    # ---------- Conditional GET cache ----------
+    def _cache_paths(self, url: str):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    @staticmethod
+    def _vary_names(headers) -> List[str]:
+        return [name.strip().lower() for name in headers.get("Vary", "").split(",") if name.strip()]
+
+    def _load(self, url: str) -> Optional[Dict]:
+        meta_file, body_file = self._cache_paths(url)
+        if not meta_file.exists() or not body_file.exists():
+            return None
+        try:
+            # mtime is the last store or 304 revalidation
+            if time.time() - meta_file.stat().st_mtime > HTTP_CACHE_TTL_SECONDS:
+                self._remove(meta_file, body_file)
+                self._count("cache_expired")
+                return None
+            with open(meta_file, "r") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _vary_matches(self, meta: Dict, headers: Dict) -> bool:
+        sent = CaseInsensitiveDict({**self.session.headers, **headers})
+        return all(sent.get(name, "") == value for name, value in meta.get("vary", {}).items())
+
+    def _remove(self, meta_file: Path, body_file: Path):
+        for path in (meta_file, body_file):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _store(self, url: str, resp: requests.Response):
+        if len(resp.content) > HTTP_CACHE_MAX_BODY_BYTES:
+            return
+        vary = self._vary_names(resp.headers)
+        if _PRIVATE_VARY.intersection(vary):
+            return
+        meta_file, body_file = self._cache_paths(url)
+        meta = {
+            "timestamp": datetime.now().isoformat(),
+            "url": resp.url,
+            "encoding": resp.encoding,
+            "headers": {h: resp.headers[h] for h in _KEPT_HEADERS if h in resp.headers},
+            "vary": {name: resp.request.headers.get(name, "") for name in vary},
+        }
+        suffix = f".{threading.get_ident()}.tmp"
+        try:
+            with open(body_file.with_suffix(suffix), "wb") as f:
+                f.write(resp.content)
+            os.replace(body_file.with_suffix(suffix), body_file)
+            with open(meta_file.with_suffix(suffix), "w") as f:
+                json.dump(meta, f)
+            os.replace(meta_file.with_suffix(suffix), meta_file)
+            self._count("cache_stores")
+        except Exception as e:
+            print(f"HTTP cache write error for {url}: {e}")
+            return
+
+        with self._lock:
+            if self._entries is None:
+                self._entries = sum(1 for _ in self.cache_dir.glob("*.json"))
+            else:
+                # Overwrites are counted too; _prune recounts from disk
+                self._entries += 1
+            over_limit = self._entries > HTTP_CACHE_MAX_ENTRIES
+        if over_limit:
+            self._prune()
+
+    def _prune(self):
+        """Drop the least recently stored/revalidated entries down to the prune target"""
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            for meta_file in self.cache_dir.glob("*.json"):
+                try:
+                    entries.append((meta_file.stat().st_mtime, meta_file))
+                except OSError:
+                    continue
+            entries.sort()
+            excess = len(entries) - int(HTTP_CACHE_MAX_ENTRIES * HTTP_CACHE_PRUNE_RATIO)
+            for _, meta_file in entries[:max(excess, 0)]:
+                self._remove(meta_file, meta_file.with_suffix(".body"))
+            with self._lock:
+                self._entries = len(entries) - max(excess, 0)
+                self.counters["cache_evictions"] += max(excess, 0)
+        finally:
+            self._prune_lock.release()
+
+    def _from_cache(self, url: str, meta: Dict) -> Optional[requests.Response]:
+        _, body_file = self._cache_paths(url)
+        try:
+            with open(body_file, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = meta.get("url") or url
+        resp.encoding = meta.get("encoding")
+        resp.headers = CaseInsensitiveDict(meta.get("headers", {}))
+        resp._content = content
+        return resp
+
+    def get_cached(self, url: str, headers: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """GET with If-None-Match / If-Modified-Since; a 304 returns the cached 200"""
+        headers = dict(headers or {})
+        meta = self._load(url)
+        if meta and not self._vary_matches(meta, headers):
+            # Stored for a different variant; fetch fresh and replace it
+            meta = None
+        if meta:
+            cached_headers = meta.get("headers", {})
+            if cached_headers.get("ETag"):
+                headers["If-None-Match"] = cached_headers["ETag"]
+            if cached_headers.get("Last-Modified"):
+                headers["If-Modified-Since"] = cached_headers["Last-Modified"]
+            self._count("conditional_requests")
+
+        resp = self.get(url, headers=headers, **kwargs)
+
+        if resp.status_code == 304 and meta:
+            cached = self._from_cache(url, meta)
+            if cached is not None:
+                self._count("not_modified")
+                try:
+                    os.utime(self._cache_paths(url)[0])
+                except OSError:
+                    pass
+                return cached
+        if resp.status_code == 200 and ("ETag" in resp.headers or "Last-Modified" in resp.headers):
+            self._store(url, resp)
+        return resp
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+        counters["pool"] = {"hosts": HTTP_POOL_HOSTS, "per_host": HTTP_POOL_PER_HOST}
+        counters["accept_encoding"] = ACCEPT_ENCODING
+        counters["cache"] = {
+            "entries": self._entries,
+            "max_entries": HTTP_CACHE_MAX_ENTRIES,
+            "ttl_seconds": HTTP_CACHE_TTL_SECONDS,
+        }
+        return counters
+
+
+http_client = HttpClient()
@@ -0,0 +1,266 @@
+"""
+Background jobs for long-running endpoints
+
+A view wrapped with ``@background_job("kind")`` behaves as before, unless the
+client sends ``Prefer: respond-async`` (or ``?async=1``). Then the request is
+snapshotted and queued on a bounded worker pool, and the client gets a job id
+back at once. The worker replays the request through the same view in a test
+request context. Views report progress with ``report_progress``. Job state and
+the final response body are persisted in the ``background_jobs`` table.
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional
+
+from flask import current_app, jsonify, request
+
+from database import db
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_MEMORY_LIMIT = 500
+TERMINAL_STATUSES = ("succeeded", "failed", "interrupted")
+
+_current = threading.local()
+
+
+class Job:
+    def __init__(self, kind: str, user_id: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.user_id = user_id
+        self.status = "queued"
+        self.progress: Dict = {}
+        self.result = None
+        self.http_status = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        # Bumped on every change so SSE listeners can wait for the next one
+        self.version = 0
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "http_status": self.http_status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "Job":
+        job = cls(row["kind"], row.get("user_id"))
+        job.id = row["id"]
+        job.status = row["status"]
+        job.progress = json.loads(row["progress"]) if row.get("progress") else {}
+        job.result = json.loads(row["result"]) if row.get("result") else None
+        job.http_status = row.get("http_status")
+        job.error = row.get("error")
+        job.created_at = row.get("created_at")
+        job.started_at = row.get("started_at")
+        job.finished_at = row.get("finished_at")
+        return job
+
+
+class JobManager:
+    """Bounded pool of job workers plus an in-memory index of recent jobs"""
+
+    def __init__(self, max_workers: int = JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # Anything still queued/running belonged to a process that has exited
+        db.mark_interrupted_background_jobs()
+
+    def _persist(self, job: Job):
+        db.save_background_job({
+            "id": job.id,
+            "user_id": job.user_id,
+            "kind": job.kind,
+            "status": job.status,
+            "progress": json.dumps(job.progress),
+            "result": json.dumps(job.result) if job.result is not None else None,
+            "http_status": job.http_status,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        })
+
+    def _touch(self, job: Job):
+        """Record a change and wake SSE listeners; caller holds the lock"""
+        job.version += 1
+        self._changed.notify_all()
+
+    def submit(self, kind: str, view, view_args: Dict, snapshot: Dict, user_id: Optional[int]) -> Job:
+        job = Job(kind, user_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > JOB_MEMORY_LIMIT:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.done:
+                    break
+                self._jobs.pop(oldest_id)
+        self._persist(job)
+        app = current_app._get_current_object()
+        self.executor.submit(self._run, job, app, view, view_args, snapshot)
+        return job
+
+    def _run(self, job: Job, app, view, view_args: Dict, snapshot: Dict):
+        with self._lock:
+            job.status = "running"
+            job.started_at = datetime.now().isoformat()
+            self._touch(job)
+        self._persist(job)
+
+        _current.job = job
+        body, http_status, error = None, 500, None
+        try:
+            with app.test_request_context(
+                snapshot["path"],
+                method=snapshot["method"],
+                query_string=snapshot["query_string"],
+                headers=snapshot["headers"],
+                data=snapshot["data"],
+            ):
+                response = app.make_response(view(**view_args))
+                body = response.get_json(silent=True)
+                if body is None:
+                    body = response.get_data(as_text=True)
+                http_status = response.status_code
+        except Exception as e:
+            print(f"❌ Job {job.id} ({job.kind}) failed: {e}")
+            error = str(e)
+        finally:
+            _current.job = None
+            with self._lock:
+                job.result = body
+                job.http_status = http_status
+                job.error = error
+                job.status = "succeeded" if error is None and http_status < 400 else "failed"
+                job.finished_at = datetime.now().isoformat()
+                self._touch(job)
+            self._persist(job)
+            print(f"🏁 Job {job.id} ({job.kind}) {job.status}")
+
+    def update_progress(self, job: Job, values: Dict):
+        with self._lock:
+            # Swap in a new dict so readers serialising the old one never see it mutate
+            job.progress = {**job.progress, **values, "updated_at": datetime.now().isoformat()}
+            self._touch(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        row = db.get_background_job(job_id)
+        return Job.from_row(row) if row else None
+
+    def list_for_user(self, user_id: int, limit: int = 20) -> List[Dict]:
+        return [Job.from_row(row).to_dict(include_result=False)
+                for row in db.get_user_background_jobs(user_id, limit)]
+
+    def wait_for_change(self, job: Job, seen_version: int, timeout: float) -> int:
+        """Block until job changes past seen_version or timeout; returns the current version"""
+        with self._lock:
+            if job.version == seen_version and not job.done:
+                self._changed.wait_for(lambda: job.version != seen_version or job.done, timeout)
+            return job.version
+
+
+job_manager = JobManager()
+
+
+def in_background_job() -> bool:
+    return getattr(_current, "job", None) is not None
+
+
+def report_progress(**values):
+    """Merge values (e.g. done, total, stage, message) into the running job's progress"""
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job_manager.update_progress(job, values)
+
+
+def carry_job(func):
+    """Wrap func so report_progress calls it makes on a worker thread reach the caller's job"""
+    job = getattr(_current, "job", None)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_current, "job", None)
+        _current.job = job
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.job = previous
+    return wrapper
+
+
+def _wants_async() -> bool:
+    if "respond-async" in request.headers.get("Prefer", "").lower():
+        return True
+    if request.args.get("async", "").lower() in ("1", "true", "yes"):
+        return True
+    body = request.get_json(silent=True) if request.is_json else None
+    return isinstance(body, dict) and body.get("async") is True
+
+
+def _request_user_id() -> Optional[int]:
+    user = getattr(request, "user", None)
+    if user is None and request.cookies.get("session_token"):
+        user = db.get_user_by_session(request.cookies.get("session_token"))
+    return user.get("id") if user else None
+
+
+def _snapshot_request() -> Dict:
+    # Raw body (multipart uploads included) is replayed byte-for-byte with its Content-Type
+    headers = [(k, v) for k, v in request.headers.items() if k.lower() not in ("content-length", "prefer")]
+    return {
+        "path": request.path,
+        "method": request.method,
+        "query_string": request.query_string,
+        "headers": headers,
+        "data": request.get_data(),
+    }
+
+
+def background_job(kind: str):
+    """Let a long-running view run as a background job when the client asks for it"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == "OPTIONS" or in_background_job() or not _wants_async():
+                return view(*args, **kwargs)
+
+            job = job_manager.submit(kind, view, kwargs, _snapshot_request(), _request_user_id())
+            return jsonify({
+                "status": "accepted",
+                "job_id": job.id,
+                "kind": kind,
+                "status_url": f"/api/jobs/{job.id}",
+                "events_url": f"/api/jobs/{job.id}/events",
+            }), 202
+        return wrapper
+    return decorator
@@ -0,0 +1,352 @@
+"""
+Shared gateway for Gemini calls
+
+Every route used to configure the process-global ``genai`` client with its own
+key and walk keys x models on failure. The gateway owns the key pool instead:
+one thread-safe client per key, so concurrent requests never swap each other's
+key, and health per (key, model) pair. A 429 cools that pair down, a 503 cools
+the model down on every key, a missing model or rejected key is parked for an
+hour. Calls go to the first healthy pair (least busy key first) and only fall
+through to the next pair on one of those errors. A streamed call reports its
+pair's outcome when the stream ends, so errors raised mid-stream still count
+against the pair (the call itself is not retried once chunks have gone out).
+
+Responses are cached by (model preference, prompt hash, generation config) so
+re-running the same analysis or refinement skips the round trip. Callers pass
+``cache=False`` for creative output; without it, calls whose generation_config
+asks for a temperature above LLM_CACHE_MAX_TEMPERATURE are not cached either.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+from dotenv import load_dotenv
+from google.api_core import exceptions as google_exceptions
+
+from services.domain_cache import TTLCache
+
+load_dotenv()
+
+DEFAULT_MODELS = [m.strip() for m in os.getenv("LLM_MODELS", "gemini-1.5-flash,gemini-2.0-flash").split(",") if m.strip()]
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 3))
+QUOTA_COOLDOWN_SECONDS = int(os.getenv("LLM_QUOTA_COOLDOWN_SECONDS", 60))
+UNAVAILABLE_COOLDOWN_SECONDS = int(os.getenv("LLM_UNAVAILABLE_COOLDOWN_SECONDS", 20))
+PARKED_COOLDOWN_SECONDS = 3600
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 6 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 2000))
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", 0.7))
+MAX_ROTATED_KEYS = 10
+
+
+class LLMUnavailableError(Exception):
+    """No healthy key/model pair could serve the request"""
+
+
+def load_api_keys() -> List[str]:
+    """GEMINI_API_KEY plus GEMINI_API_KEY_1..10, de-duplicated in order"""
+    keys = []
+    primary = os.getenv("GEMINI_API_KEY")
+    if primary:
+        keys.append(primary)
+    for i in range(1, MAX_ROTATED_KEYS + 1):
+        key = os.getenv(f"GEMINI_API_KEY_{i}")
+        if key:
+            keys.append(key)
+    return list(dict.fromkeys(keys))
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """'quota', 'unavailable', 'model' or 'key' for errors another pair may not hit; None otherwise"""
+    message = str(error).lower()
+    if isinstance(error, google_exceptions.ResourceExhausted) or "429" in message or "quota" in message:
+        return "quota"
+    if isinstance(error, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+                          google_exceptions.DeadlineExceeded)) or "503" in message:
+        return "unavailable"
+    if isinstance(error, google_exceptions.NotFound) or "is not found" in message:
+        return "model"
+    if isinstance(error, (google_exceptions.PermissionDenied, google_exceptions.Unauthenticated)) \
+            or "api key not valid" in message or "api_key_invalid" in message:
+        return "key"
+    return None
+
+
+class LLMResponse:
+    """Generated text plus where it came from"""
+
+    def __init__(self, raw, model: str, key_label: str, latency_ms: float,
+                 cached: bool = False, text: Optional[str] = None):
+        self.raw = raw
+        self.model = model
+        self.key_label = key_label
+        self.latency_ms = latency_ms
+        self.cached = cached
+        self._text = text
+
+    @property
+    def text(self) -> str:
+        return self._text if self._text is not None else self.raw.text
+
+
+class _WatchedStream:
+    """Streamed response that reports success or failure once iteration ends"""
+
+    def __init__(self, raw, on_done: Callable[[Optional[Exception]], None]):
+        self._raw = raw
+        self._on_done = on_done
+        self._reported = False
+
+    def _finish(self, error: Optional[Exception]):
+        if not self._reported:
+            self._reported = True
+            self._on_done(error)
+
+    def __iter__(self):
+        try:
+            for chunk in self._raw:
+                yield chunk
+        except Exception as e:
+            self._finish(e)
+            raise
+        finally:
+            # Also covers a client that disconnects mid-stream
+            self._finish(None)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __del__(self):
+        # Never iterated: release the key's in-flight slot
+        self._finish(None)
+
+
+class _PairStats:
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.quota_errors = 0
+        self.unavailable_errors = 0
+        self.total_latency_ms = 0.0
+        self.last_latency_ms = None
+        self.cooldown_until = 0.0
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "quota_errors": self.quota_errors,
+            "unavailable_errors": self.unavailable_errors,
+            "avg_latency_ms": round(self.total_latency_ms / self.successes, 1) if self.successes else None,
+            "last_latency_ms": self.last_latency_ms,
+            "cooldown_seconds": max(0, round(self.cooldown_until - now)),
+        }
+
+
+class LLMGateway:
+    def __init__(self, keys: Optional[List[str]] = None):
+        self.keys = keys if keys is not None else load_api_keys()
+        self._lock = threading.Lock()
+        self._clients: Dict[str, glm.GenerativeServiceClient] = {}
+        self._in_flight: Dict[str, int] = {key: 0 for key in self.keys}
+        self._pairs: Dict[Tuple[str, str], _PairStats] = {}
+        self._model_cooldown: Dict[str, float] = {}
+        self._key_cooldown: Dict[str, float] = {}
+        self.cache = TTLCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+        if self.keys:
+            print(f"✅ LLM gateway: {len(self.keys)} Gemini API key(s) in the pool")
+        else:
+            print("⚠️ LLM gateway: no Gemini API keys found in .env")
+
+    @property
+    def available(self) -> bool:
+        return bool(self.keys)
+
+    @staticmethod
+    def mask(key: str) -> str:
+        return f"{key[:4]}...{key[-4:]}"
+
+    def _client(self, key: str) -> glm.GenerativeServiceClient:
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = glm.GenerativeServiceClient(client_options={"api_key": key})
+                self._clients[key] = client
+            return client
+
+    def _model(self, key: str, model_name: str, **model_kwargs) -> genai.GenerativeModel:
+        model = genai.GenerativeModel(model_name, **model_kwargs)
+        # Bind the per-key client; otherwise the model falls back to the global genai.configure() key.
+        # _client is private to google-generativeai (0.3.2 in requirements.txt creates it lazily
+        # when it is None); fail loudly if an upgrade drops it rather than silently using one key.
+        if not hasattr(model, "_client"):
+            raise RuntimeError("google-generativeai GenerativeModel has no _client; per-key clients need 0.3.x")
+        model._client = self._client(key)
+        return model
+
+    def _pair(self, key: str, model_name: str) -> _PairStats:
+        pair = self._pairs.get((key, model_name))
+        if pair is None:
+            pair = self._pairs[(key, model_name)] = _PairStats()
+        return pair
+
+    def _pick(self, models: Iterable[str], tried: set) -> Optional[Tuple[str, str]]:
+        """First model with a healthy key; among its healthy keys the least busy one"""
+        now = time.time()
+        with self._lock:
+            for model_name in models:
+                if self._model_cooldown.get(model_name, 0) > now:
+                    continue
+                healthy = [
+                    key for key in self.keys
+                    if (key, model_name) not in tried
+                    and self._key_cooldown.get(key, 0) <= now
+                    and self._pair(key, model_name).cooldown_until <= now
+                ]
+                if healthy:
+                    key = min(healthy, key=lambda k: self._in_flight[k])
+                    self._in_flight[key] += 1
+                    self._pair(key, model_name).requests += 1
+                    return key, model_name
+        return None
+
+    def _record_failure(self, key: str, model_name: str, kind: Optional[str]):
+        now = time.time()
+        with self._lock:
+            self._in_flight[key] -= 1
+            pair = self._pair(key, model_name)
+            pair.failures += 1
+            if kind == "quota":
+                pair.quota_errors += 1
+                pair.cooldown_until = now + QUOTA_COOLDOWN_SECONDS
+            elif kind == "unavailable":
+                pair.unavailable_errors += 1
+                self._model_cooldown[model_name] = now + UNAVAILABLE_COOLDOWN_SECONDS
+            elif kind == "model":
+                self._model_cooldown[model_name] = now + PARKED_COOLDOWN_SECONDS
+            elif kind == "key":
+                self._key_cooldown[key] = now + PARKED_COOLDOWN_SECONDS
+
+    def _record_success(self, key: str, model_name: str, latency_ms: float):
+        with self._lock:
+            self._in_flight[key] -= 1
+            pair = self._pair(key, model_name)
+            pair.successes += 1
+            pair.total_latency_ms += latency_ms
+            pair.last_latency_ms = round(latency_ms, 1)
+
+    def _stream_reporter(self, key: str, model_name: str, latency_ms: float) -> Callable[[Optional[Exception]], None]:
+        """Outcome callback for a stream; latency stays time to first chunk"""
+        def report(error: Optional[Exception]):
+            if error is None:
+                self._record_success(key, model_name, latency_ms)
+                return
+            kind = classify_error(error)
+            self._record_failure(key, model_name, kind)
+            print(f"⚠️ LLM gateway: {model_name} on key {self.mask(key)} failed mid-stream ({kind or 'error'}): {error}")
+        return report
+
+    @staticmethod
+    def _cacheable(cache: Optional[bool], model_kwargs: Dict) -> bool:
+        if cache is not None:
+            return cache
+        config = model_kwargs.get("generation_config") or {}
+        temperature = config.get("temperature") if isinstance(config, dict) else getattr(config, "temperature", None)
+        return temperature is None or temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+    @staticmethod
+    def _cache_key(prompt, models: List[str], model_kwargs: Dict) -> str:
+        prompt_hash = hashlib.sha256(json.dumps(prompt, default=str).encode("utf-8")).hexdigest()
+        config = json.dumps(model_kwargs, sort_keys=True, default=str)
+        return f"{','.join(models)}|{prompt_hash}|{hashlib.sha256(config.encode('utf-8')).hexdigest()}"
+
+    def generate(self, prompt, models: Optional[List[str]] = None, stream: bool = False,
+                 cache: Optional[bool] = None, **model_kwargs) -> LLMResponse:
+        """generate_content on the first healthy key/model pair
+
+        ``models`` is the caller's preference order; ``model_kwargs`` go to
+        GenerativeModel (generation_config, safety_settings). ``cache`` forces
+        the response cache on or off (streamed calls are never cached). Raises
+        LLMUnavailableError when every pair is cooling down or failed.
+        """
+        if not self.keys:
+            raise LLMUnavailableError("No GEMINI_API_KEY found. Please add to .env")
+
+        models = models or DEFAULT_MODELS
+        cache_key = None
+        if not stream and self._cacheable(cache, model_kwargs):
+            cache_key = self._cache_key(prompt, models, model_kwargs)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                text, model_name = cached
+                return LLMResponse(None, model_name, "cache", 0.0, cached=True, text=text)
+
+        tried = set()
+        last_error = None
+        for _ in range(LLM_MAX_ATTEMPTS):
+            picked = self._pick(models, tried)
+            if picked is None:
+                break
+            key, model_name = picked
+            tried.add(picked)
+
+            started = time.perf_counter()
+            try:
+                raw = self._model(key, model_name, **model_kwargs).generate_content(prompt, stream=stream)
+            except Exception as e:
+                kind = classify_error(e)
+                self._record_failure(key, model_name, kind)
+                print(f"⚠️ LLM gateway: {model_name} on key {self.mask(key)} failed ({kind or 'error'}): {e}")
+                if kind is None:
+                    raise
+                last_error = e
+                continue
+
+            latency_ms = (time.perf_counter() - started) * 1000
+            if stream:
+                raw = _WatchedStream(raw, self._stream_reporter(key, model_name, latency_ms))
+            else:
+                self._record_success(key, model_name, latency_ms)
+            response = LLMResponse(raw, model_name, self.mask(key), latency_ms)
+            if cache_key is not None:
+                try:
+                    self.cache.set(cache_key, (response.text, model_name))
+                except ValueError:
+                    # Blocked or empty candidates have no text; let the caller see that
+                    pass
+            return response
+
+        raise LLMUnavailableError(
+            f"All Gemini keys/models are rate limited or unavailable (quota): {last_error}"
+            if last_error else "All Gemini keys/models are cooling down (quota)"
+        )
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            keys = []
+            for key in self.keys:
+                pairs = {model: stats.to_dict(now) for (k, model), stats in self._pairs.items() if k == key}
+                keys.append({
+                    "key": self.mask(key),
+                    "in_flight": self._in_flight[key],
+                    "cooldown_seconds": max(0, round(self._key_cooldown.get(key, 0) - now)),
+                    "models": pairs,
+                })
+            models = {model: max(0, round(until - now)) for model, until in self._model_cooldown.items()}
+        return {
+            "keys": keys,
+            "model_cooldown_seconds": models,
+            "default_models": DEFAULT_MODELS,
+            "response_cache": self.cache.stats(),
+        }
+
+
+llm_gateway = LLMGateway()
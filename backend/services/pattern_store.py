@@ -0,0 +1,161 @@
+"""
+Per-domain email format store
+
+Holds one Gemini prediction per domain and learns from SMTP verification
+outcomes (which pattern got a 250 for which domain), so later rows for the
+same domain skip the LLM call and try the most likely pattern first.
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PREDICTION_TTL_DAYS = int(os.getenv("PATTERN_PREDICTION_TTL_DAYS", 30))
+
+# Pattern name -> local-part builder. Names match the Gemini prompt's list.
+EMAIL_PATTERN_FORMATS = {
+    'first.last': lambda f, l: f"{f}.{l}",
+    'f.last': lambda f, l: f"{f[:1]}{l}",
+    'first': lambda f, l: f,
+    'last': lambda f, l: l,
+    'firstlast': lambda f, l: f"{f}{l}",
+    'first_last': lambda f, l: f"{f}_{l}",
+    'first.l': lambda f, l: f"{f}.{l[:1]}",
+    'f.dot.last': lambda f, l: f"{f[:1]}.{l}",
+}
+
+# Order used when nothing has been learned for a domain
+DEFAULT_PATTERN_ORDER = ['first.last', 'f.last', 'first', 'firstlast', 'f.dot.last']
+
+
+class EmailPatternStore:
+    """Thread-safe, write-through store of per-domain pattern knowledge"""
+
+    def __init__(self, cache_dir: str = "cache"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.prediction_ttl = timedelta(days=PREDICTION_TTL_DAYS)
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _get_cache_file(self, domain: str) -> Path:
+        safe_key = re.sub(r'[^a-zA-Z0-9]', '_', f"pattern_{domain}")
+        return self.cache_dir / f"{safe_key}.json"
+
+    def _load(self, domain: str) -> Dict:
+        """Return the entry for domain; caller holds the lock"""
+        entry = self._entries.get(domain)
+        if entry is not None:
+            return entry
+
+        entry = {'predicted': None, 'predicted_at': None, 'verified': {}, 'rejected': {}}
+        cache_file = self._get_cache_file(domain)
+        if cache_file.exists():
+            try:
+                with open(cache_file, 'r') as f:
+                    entry.update(json.load(f).get('value', {}))
+            except Exception:
+                pass
+        self._entries[domain] = entry
+        return entry
+
+    def _save(self, domain: str, entry: Dict):
+        cache_file = self._get_cache_file(domain)
+        tmp_file = cache_file.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump({'timestamp': datetime.now().isoformat(), 'value': entry}, f, indent=2)
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            print(f"Pattern store write error for {domain}: {e}")
+
+    def get_prediction(self, domain: str) -> Optional[str]:
+        """Stored Gemini prediction for domain, if still fresh"""
+        domain = domain.lower()
+        with self._lock:
+            entry = self._load(domain)
+            if not entry['predicted'] or not entry['predicted_at']:
+                return None
+            if datetime.now() - datetime.fromisoformat(entry['predicted_at']) > self.prediction_ttl:
+                return None
+            return entry['predicted']
+
+    def has_prediction(self, domain: str) -> bool:
+        domain = domain.lower()
+        with self._lock:
+            entry = self._load(domain)
+            if not entry['predicted_at']:
+                return False
+            return datetime.now() - datetime.fromisoformat(entry['predicted_at']) <= self.prediction_ttl
+
+    def set_prediction(self, domain: str, pattern: Optional[str]):
+        """Record the LLM's answer (None means it gave no usable pattern)"""
+        domain = domain.lower()
+        with self._lock:
+            entry = self._load(domain)
+            entry['predicted'] = pattern
+            entry['predicted_at'] = datetime.now().isoformat()
+            self._save(domain, entry)
+
+    def best_pattern(self, domain: str) -> Optional[str]:
+        """Most likely pattern: the best verified one, else the stored prediction"""
+        ranked = self.ranked_patterns(domain)
+        return ranked[0] if ranked else None
+
+    def ranked_patterns(self, domain: str) -> List[str]:
+        """Known patterns for domain, most likely first"""
+        domain = domain.lower()
+        with self._lock:
+            entry = self._load(domain)
+            verified = dict(entry['verified'])
+            rejected = dict(entry['rejected'])
+            predicted = entry['predicted']
+
+        def score(name):
+            return verified.get(name, 0) * 2 - rejected.get(name, 0)
+
+        ranked = sorted((name for name, count in verified.items() if count > 0), key=score, reverse=True)
+        if predicted and predicted not in ranked and rejected.get(predicted, 0) <= verified.get(predicted, 0):
+            ranked.append(predicted)
+        return ranked
+
+    def record_outcome(self, domain: str, pattern: str, verified: bool):
+        """Learn from an SMTP result: 250/251 -> verified, 550/551 -> rejected"""
+        if pattern not in EMAIL_PATTERN_FORMATS:
+            return
+        domain = domain.lower()
+        bucket = 'verified' if verified else 'rejected'
+        with self._lock:
+            entry = self._load(domain)
+            entry[bucket][pattern] = entry[bucket].get(pattern, 0) + 1
+            self._save(domain, entry)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            learned = sum(1 for e in self._entries.values() if any(e['verified'].values()))
+            return {'domains_loaded': len(self._entries), 'domains_with_verified_pattern': learned}
+
+
+def classify_email_pattern(email: str, first_name: str, last_name: str) -> Optional[str]:
+    """Return the pattern name that produces email's local part from the names"""
+    if not email or '@' not in email:
+        return None
+    local = email.split('@')[0].lower()
+    first = re.sub(r'[^a-z]', '', (first_name or '').lower())
+    last = re.sub(r'[^a-z]', '', (last_name or '').lower())
+    if not first and not last:
+        return None
+
+    for name, build in EMAIL_PATTERN_FORMATS.items():
+        if (name != 'last' and not first) or (name != 'first' and not last):
+            continue
+        if build(first, last) == local:
+            return name
+    return None
+
+
+pattern_store = EmailPatternStore()
@@ -0,0 +1,226 @@
+"""
+Shared DuckDuckGo search client
+
+All DDGS text searches go through one client that adds a persistent
+query -> results cache with a TTL, coalescing of identical in-flight queries,
+a process-wide token-bucket rate limit and retry with backoff on throttling.
+Empty result lists are not cached: DDGS often answers a throttled query with
+nothing, and caching that would hide the query for the whole TTL.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ddgs import DDGS
+
+try:
+    from ddgs.exceptions import RatelimitException, TimeoutException
+except ImportError:  # older ddgs releases
+    RatelimitException = TimeoutException = None
+
+from services.domain_cache import TTLCache
+
+SEARCH_CACHE_TTL_HOURS = int(os.getenv("SEARCH_CACHE_TTL_HOURS", 24))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 2000))
+SEARCH_RATE_PER_SECOND = float(os.getenv("SEARCH_RATE_PER_SECOND", 0.5))
+SEARCH_RATE_BURST = int(os.getenv("SEARCH_RATE_BURST", 3))
+SEARCH_MAX_RETRIES = 3
+SEARCH_BACKOFF_BASE = 2.0
+SEARCH_TIMEOUT = 10
+
+
+class TokenBucket:
+    """Blocking token bucket shared by every thread in the process"""
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class SearchClient:
+    """Cached, coalescing, rate-limited wrapper around ``DDGS().text``"""
+
+    def __init__(self, cache_dir: str = "cache", ttl_hours: int = SEARCH_CACHE_TTL_HOURS):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.ttl = timedelta(hours=ttl_hours)
+        self.memory = TTLCache(SEARCH_CACHE_MAX_ENTRIES, ttl_hours * 3600)
+        self.bucket = TokenBucket(SEARCH_RATE_PER_SECOND, SEARCH_RATE_BURST)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self.counters = {
+            "requests": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "coalesced": 0,
+            "searches": 0,
+            "retries": 0,
+            "throttled": 0,
+            "errors": 0,
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _get_ddgs(self) -> DDGS:
+        # DDGS sessions are not shared across threads; each worker reuses its own
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            ddgs = DDGS(timeout=SEARCH_TIMEOUT)
+            self._local.ddgs = ddgs
+        return ddgs
+
+    @staticmethod
+    def _cache_key(query: str, max_results: int, timelimit: Optional[str]) -> str:
+        raw = json.dumps([query.strip().lower(), max_results, timelimit])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _cache_file(self, key: str) -> Path:
+        return self.cache_dir / f"search_{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[List[Dict]]:
+        cache_file = self._cache_file(key)
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, "r") as f:
+                data = json.load(f)
+            if datetime.now() - datetime.fromisoformat(data["timestamp"]) < self.ttl:
+                return data["value"]
+        except Exception:
+            pass
+        return None
+
+    def _write_disk(self, key: str, query: str, results: List[Dict]):
+        cache_file = self._cache_file(key)
+        tmp_file = cache_file.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump({"timestamp": datetime.now().isoformat(), "query": query, "value": results}, f)
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            print(f"Search cache write error for {query!r}: {e}")
+
+    @staticmethod
+    def _is_throttle_error(error: Exception) -> bool:
+        if RatelimitException is not None and isinstance(error, (RatelimitException, TimeoutException)):
+            return True
+        message = str(error).lower()
+        return "ratelimit" in message or "429" in message
+
+    def _search_with_retry(self, query: str, max_results: int, timelimit: Optional[str]) -> List[Dict]:
+        kwargs = {"max_results": max_results}
+        if timelimit:
+            kwargs["timelimit"] = timelimit
+
+        for attempt in range(SEARCH_MAX_RETRIES + 1):
+            self.bucket.acquire()
+            try:
+                self._count("searches")
+                return list(self._get_ddgs().text(query, **kwargs) or [])
+            except Exception as e:
+                if not self._is_throttle_error(e) or attempt == SEARCH_MAX_RETRIES:
+                    raise
+                self._count("throttled")
+                self._count("retries")
+                # Fresh session after throttling; back off exponentially with jitter
+                self._local.ddgs = None
+                delay = SEARCH_BACKOFF_BASE ** attempt + random.uniform(0, 1)
+                print(f"⚠️ Search throttled for {query!r}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+        return []
+
+    def text(self, query: str, max_results: int = 10, timelimit: Optional[str] = None,
+             use_cache: bool = True) -> List[Dict]:
+        """Return DDGS text results for ``query``; raises if the search fails"""
+        self._count("requests")
+        key = self._cache_key(query, max_results, timelimit)
+
+        if use_cache:
+            cached = self.memory.get(key)
+            if cached is not None:
+                self._count("memory_hits")
+                return list(cached)
+            cached = self._read_disk(key)
+            if cached is not None:
+                self._count("disk_hits")
+                self.memory.set(key, cached)
+                return list(cached)
+
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+            if owner:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+            else:
+                self.counters["coalesced"] += 1
+
+        if not owner:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return list(in_flight.results)
+
+        try:
+            results = self._search_with_retry(query, max_results, timelimit)
+            in_flight.results = results
+            if results:
+                self.memory.set(key, results)
+                self._write_disk(key, query, results)
+            return list(results)
+        except Exception as e:
+            self._count("errors")
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            in_flight.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+        counters["memory"] = self.memory.stats()
+        counters["rate_limit"] = {
+            "per_second": self.bucket.rate,
+            "burst": self.bucket.capacity,
+            "waited_seconds": round(self.bucket.waited_seconds, 2),
+        }
+        return counters
+
+
+search_client = SearchClient()
@@ -1,9 +1,8 @@
-import os, re, smtplib, imaplib, email, json, requests, pandas as pd, random
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import re, smtplib, imaplib, email, json, requests, pandas as pd, random
 from email.header import decode_header
 from itertools import cycle
-import google.generativeai as genai
+from services.llm_gateway import llm_gateway
+from services.message_factory import message_factory
 from datetime import datetime
 from config import app_state
 import time
@@ -22,11 +21,11 @@ from utils.helpers import (
     get_provider_config
 )
 
-# Import zoho_handler for lead integration
+# Leads are queued and batched to Zoho CRM off the send path
 try:
-    from routes.zoho_routes import zoho_handler
+    from routes.zoho_routes import zoho_sync_queue
 except ImportError:
-    zoho_handler = None
+    zoho_sync_queue = None
 
 # Import shared config - ONLY import what you need
 from config import (
@@ -175,14 +174,7 @@ def detect_email_provider(email):
 
 def generate_email_content(prompt):
     try:
-        api_key = os.getenv("GEMINI_API_KEY")
-
-        if api_key:
-            print(f"✅ Gemini Key in use: {api_key[:6]}******{api_key[-4:]}")
-        else:
-            print("❌ GEMINI_API_KEY not found in environment")
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(f"""
+        response = llm_gateway.generate(f"""
         Create professional email content based on this specific user request: {prompt}
         
         IMPORTANT: 
@@ -195,7 +187,7 @@ def generate_email_content(prompt):
         SUBJECT: [email subject here]
         SENDER_NAME: [sender name here]
         BODY: [email body here]
-        """)
+        """, models=['gemini-2.5-flash'], cache=False)
 
         lines = response.text.strip().split('\n')
         result = {"subject": "", "body": "", "sender_name": ""}
@@ -424,7 +416,7 @@ def send_bulk_emails(recipients, batch_size, sender_accounts, subject, body, sen
                         db.update_campaign_status(campaign_id, 'running', app_state.progress["sent"], app_state.progress.get("failed", 0))
                         
                         # INTEGRATE WITH ZOHO CRM
-                        if zoho_handler:
+                        if zoho_sync_queue:
                             try:
                                 lead_data = {
                                     'first_name': name.split()[0] if name else 'Lead',
@@ -440,7 +432,7 @@ def send_bulk_emails(recipients, batch_size, sender_accounts, subject, body, sen
                                 except:
                                     z_user_id = 1
                                     
-                                z_success, z_msg = zoho_handler.create_lead_in_zoho(user_id=z_user_id, lead_data=lead_data)
+                                zoho_sync_queue.enqueue(z_user_id, lead_data, campaign_id=campaign_id)
                             except Exception as ze:
                                 print(f"Zoho integration error for {recipient['email']}: {ze}")
                     except Exception as db_e:
@@ -460,7 +452,7 @@ def send_bulk_emails(recipients, batch_size, sender_accounts, subject, body, sen
                         "last_name": last_name,
                         "company": extract_company_from_email(recipient["email"]),
                         "phone": ""
-                    })
+                    }, user_id=user_id)
                 except Exception: pass
                     
             else:
@@ -713,7 +705,7 @@ def send_bulk_emails_with_templates(recipients, batch_size, sender_accounts, tem
                             )
                             db.update_campaign_status(campaign_id, 'running', app_state.progress["sent"], app_state.progress.get("failed", 0))
 
-                            if zoho_handler:
+                            if zoho_sync_queue:
                                 try:
                                     lead_data = {
                                         'first_name': name.split()[0] if name else 'Lead',
@@ -725,7 +717,7 @@ def send_bulk_emails_with_templates(recipients, batch_size, sender_accounts, tem
                                     }
                                     try: z_user_id = int(user_id) if str(user_id).isdigit() else 1
                                     except: z_user_id = 1
-                                    zoho_handler.create_lead_in_zoho(user_id=z_user_id, lead_data=lead_data)
+                                    zoho_sync_queue.enqueue(z_user_id, lead_data, campaign_id=campaign_id)
                                 except Exception: pass
                         except Exception as db_e:
                             print(f"⚠️ Warning: Database save failed: {db_e}")
@@ -746,7 +738,7 @@ def send_bulk_emails_with_templates(recipients, batch_size, sender_accounts, tem
                             "position": recipient.get("position", ""),
                             "template_used": recipient.get("position", "default") if template_data else "standard",
                             "provider": provider_info.get('name', 'unknown')
-                        })
+                        }, user_id=user_id)
                     except Exception: pass
 
                 else:
@@ -2012,14 +2004,9 @@ def send_email_with_provider(sender_email, password, recipient_email, subject, b
                     ('smtp.gmail.com', 465, True)
                 ]
 
-        # Prepare email message
-        msg = MIMEMultipart()
+        # Prepare email message: the sender's pre-built skeleton plus this recipient's fields
         display_name = sender_name or sender_email.split('@')[0]
-        msg['From'] = f"{display_name} <{sender_email}>"
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        html_body = body.replace('\n', '<br>\n')
-        msg.attach(MIMEText(html_body, 'html'))
+        raw_message = message_factory(sender_email, display_name).render(recipient_email, subject, body)
 
         last_error = None
         last_host = None
@@ -2039,7 +2026,7 @@ def send_email_with_provider(sender_email, password, recipient_email, subject, b
                         pass
 
                 server.login(sender_email, password)
-                server.send_message(msg)
+                server.sendmail(sender_email, [recipient_email], raw_message)
                 server.quit()
                 print(f"✅ Email sent to {recipient_email}")
                 return True, None
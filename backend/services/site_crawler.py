@@ -0,0 +1,113 @@
+"""
+Per-site page crawler
+
+Fetches a batch of pages for a company site concurrently over the shared
+pooled HTTP client. Concurrency is capped per host and the politeness delay
+spaces out request starts per host, so crawls of different sites never wait
+on each other.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from services.http_client import http_client
+
+CRAWL_MAX_PER_HOST = int(os.getenv("CRAWL_MAX_PER_HOST", 4))
+CRAWL_HOST_DELAY_MIN = float(os.getenv("CRAWL_HOST_DELAY_MIN", 0.25))
+CRAWL_HOST_DELAY_MAX = float(os.getenv("CRAWL_HOST_DELAY_MAX", 0.6))
+CRAWL_TIMEOUT = 10
+CRAWL_RETRIES = 2
+
+
+class HostThrottle:
+    """Bounded concurrency plus a randomized gap between request starts, per host"""
+
+    def __init__(self, max_per_host: int, delay_min: float, delay_max: float):
+        self.max_per_host = max_per_host
+        self.delay_min = delay_min
+        self.delay_max = delay_max
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._next_start: Dict[str, float] = {}
+        self.waited_seconds = 0.0
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.max_per_host)
+                self._semaphores[host] = sem
+            return sem
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlparse(url).netloc.lower()
+        with self._semaphore(host):
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + random.uniform(self.delay_min, self.delay_max)
+                wait = start - now
+                self.waited_seconds += wait
+            if wait > 0:
+                time.sleep(wait)
+            yield
+
+
+class SiteCrawler:
+    """Concurrent page fetcher on top of the shared pooled HTTP client"""
+
+    def __init__(self, user_agent: Optional[Callable[[], str]] = None,
+                 max_per_host: int = CRAWL_MAX_PER_HOST, timeout: int = CRAWL_TIMEOUT):
+        self.throttle = HostThrottle(max_per_host, CRAWL_HOST_DELAY_MIN, CRAWL_HOST_DELAY_MAX)
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.counters = {"pages": 0, "failures": 0, "retries": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def fetch(self, url: str) -> Optional[requests.Response]:
+        """GET url within the host's throttle; None if every attempt fails"""
+        headers = {"User-Agent": self.user_agent()} if self.user_agent else None
+        for attempt in range(CRAWL_RETRIES):
+            if attempt:
+                self._count("retries")
+            try:
+                with self.throttle.slot(url):
+                    resp = http_client.get_cached(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+                self._count("pages")
+                return resp
+            except requests.RequestException:
+                continue
+        self._count("failures")
+        return None
+
+    def crawl(self, urls: Iterable[str]) -> Iterator[Tuple[str, Optional[requests.Response]]]:
+        """Yield (url, response) pairs as pages finish; duplicate URLs are fetched once"""
+        unique = list(dict.fromkeys(u for u in urls if u))
+        if not unique:
+            return
+        hosts = {urlparse(u).netloc.lower() for u in unique}
+        workers = min(len(unique), self.throttle.max_per_host * len(hosts))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.fetch, url): url for url in unique}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+        counters["max_per_host"] = self.throttle.max_per_host
+        counters["politeness_waited_seconds"] = round(self.throttle.waited_seconds, 2)
+        return counters
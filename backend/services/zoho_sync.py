@@ -0,0 +1,190 @@
+"""
+Batched lead sync to Zoho CRM
+
+Send loops used to create each recipient's lead with its own POST /crm/v2/Leads
+right after the SMTP send, so every email waited on a Zoho round trip. They now
+``enqueue`` the lead and move on. A background worker groups queued leads per
+Zoho user and pushes up to ZOHO_UPSERT_BATCH_SIZE of them (Zoho's limit is 100)
+per request through /crm/v2/Leads/upsert with Email as the duplicate check, so
+a recipient who is already a lead is updated rather than created twice.
+
+Batches that fail for transient reasons (network errors, 429, 5xx) are retried
+with exponential backoff up to ZOHO_SYNC_MAX_ATTEMPTS times. Leads Zoho accepts
+are marked ``added_to_zoho`` on their email_tracking row.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database import db
+
+ZOHO_UPSERT_BATCH_SIZE = min(int(os.getenv("ZOHO_UPSERT_BATCH_SIZE", 100)), 100)
+ZOHO_SYNC_FLUSH_SECONDS = float(os.getenv("ZOHO_SYNC_FLUSH_SECONDS", 2.0))
+ZOHO_SYNC_MAX_ATTEMPTS = int(os.getenv("ZOHO_SYNC_MAX_ATTEMPTS", 5))
+ZOHO_SYNC_BACKOFF_SECONDS = float(os.getenv("ZOHO_SYNC_BACKOFF_SECONDS", 2.0))
+ZOHO_SYNC_MAX_BACKOFF_SECONDS = 300
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+SYNCED, RETRYING, FAILED = "synced", "retrying", "failed"
+
+
+class PendingLead:
+    """A lead waiting for Zoho plus the email_tracking row to mark once it is in"""
+
+    __slots__ = ("user_id", "lead_data", "tracking_id", "campaign_id", "attempts", "not_before")
+
+    def __init__(self, user_id: int, lead_data: Dict, tracking_id: Optional[int] = None,
+                 campaign_id: Optional[int] = None):
+        self.user_id = user_id
+        self.lead_data = lead_data
+        self.tracking_id = tracking_id
+        self.campaign_id = campaign_id
+        self.attempts = 0
+        self.not_before = 0.0
+
+    @property
+    def email(self) -> str:
+        return self.lead_data.get("email", "")
+
+
+class ZohoSyncQueue:
+    """Collects leads and upserts them to Zoho in batches off the send path"""
+
+    def __init__(self, handler):
+        # ZohoCRMHandler; provides upsert_leads_in_zoho(user_id, leads)
+        self.handler = handler
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        # Serialises pushes so the worker and a shutdown flush never send the same lead
+        self._push_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {"queued": 0, "synced": 0, "failed": 0, "retries": 0, "requests": 0}
+        self.last_error: Optional[str] = None
+        atexit.register(self.flush)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="zoho-sync", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, user_id: int, lead_data: Dict, tracking_id: Optional[int] = None,
+                campaign_id: Optional[int] = None):
+        """Queue a lead; returns immediately"""
+        with self._lock:
+            self._pending.append(PendingLead(user_id, lead_data, tracking_id, campaign_id))
+            self.counters["queued"] += 1
+            full = len(self._pending) >= ZOHO_UPSERT_BATCH_SIZE
+        self._ensure_worker()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(ZOHO_SYNC_FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Zoho sync: flush failed: {e}")
+
+    def flush(self):
+        """Push every lead whose retry delay has passed"""
+        now = time.time()
+        with self._lock:
+            ready = [lead for lead in self._pending if lead.not_before <= now]
+            if not ready:
+                return
+            self._pending = deque(lead for lead in self._pending if lead.not_before > now)
+
+        by_user: Dict[int, List[PendingLead]] = {}
+        for lead in ready:
+            by_user.setdefault(lead.user_id, []).append(lead)
+        for user_id, leads in by_user.items():
+            self.push(user_id, leads)
+
+    def push(self, user_id: int, leads: List[PendingLead]) -> List[Tuple[PendingLead, str, str]]:
+        """Upsert leads now in batches; returns (lead, state, message) for each
+
+        Leads hit by a transient failure are queued again with backoff
+        (state "retrying") until ZOHO_SYNC_MAX_ATTEMPTS is reached.
+        """
+        outcomes: List[Tuple[PendingLead, str, str]] = []
+        with self._push_lock:
+            for start in range(0, len(leads), ZOHO_UPSERT_BATCH_SIZE):
+                outcomes.extend(self._push_batch(user_id, leads[start:start + ZOHO_UPSERT_BATCH_SIZE]))
+
+        synced = [lead for lead, state, _ in outcomes if state == SYNCED]
+        if synced:
+            db.mark_added_to_zoho(
+                tracking_ids=[lead.tracking_id for lead in synced if lead.tracking_id],
+                campaign_recipients=[(lead.campaign_id, lead.email) for lead in synced
+                                     if not lead.tracking_id and lead.campaign_id]
+            )
+        return outcomes
+
+    def _push_batch(self, user_id: int, batch: List[PendingLead]) -> Iterable[Tuple[PendingLead, str, str]]:
+        self._count("requests")
+        try:
+            status, payload = self.handler.upsert_leads_in_zoho(user_id, [lead.lead_data for lead in batch])
+        except Exception as e:
+            status, payload = None, f"Error upserting leads: {e}"
+
+        if isinstance(payload, list) and len(payload) == len(batch):
+            return [self._record_outcome(lead, result) for lead, result in zip(batch, payload)]
+
+        self.last_error = str(payload)
+        if status is None or status in RETRYABLE_STATUS:
+            return [self._retry(lead, str(payload)) for lead in batch]
+
+        print(f"❌ Zoho sync: {len(batch)} lead(s) rejected: {payload}")
+        self._count("failed", len(batch))
+        return [(lead, FAILED, str(payload)) for lead in batch]
+
+    def _record_outcome(self, lead: PendingLead, result: Dict) -> Tuple[PendingLead, str, str]:
+        message = result.get("message", "")
+        if result.get("status") == "success":
+            self._count("synced")
+            return lead, SYNCED, message
+        details = result.get("details") or {}
+        error = f"{result.get('code', 'ERROR')}: {message}"
+        if details.get("api_name"):
+            error += f" ({details['api_name']})"
+        self.last_error = error
+        self._count("failed")
+        return lead, FAILED, error
+
+    def _retry(self, lead: PendingLead, error: str) -> Tuple[PendingLead, str, str]:
+        lead.attempts += 1
+        if lead.attempts >= ZOHO_SYNC_MAX_ATTEMPTS:
+            print(f"❌ Zoho sync: giving up on {lead.email} after {lead.attempts} attempt(s): {error}")
+            self._count("failed")
+            return lead, FAILED, error
+        delay = min(ZOHO_SYNC_BACKOFF_SECONDS * 2 ** (lead.attempts - 1), ZOHO_SYNC_MAX_BACKOFF_SECONDS)
+        lead.not_before = time.time() + delay
+        with self._lock:
+            self._pending.append(lead)
+            self.counters["retries"] += 1
+        self._ensure_worker()
+        return lead, RETRYING, error
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            counters["pending"] = len(self._pending)
+        counters["batch_size"] = ZOHO_UPSERT_BATCH_SIZE
+        counters["last_error"] = self.last_error
+        return counters
@@ -0,0 +1,30 @@
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.domain_cache import DomainCache, PersistentDomainStore  # noqa: E402
+
+
+def test_store_reads_back_what_it_wrote_for_messy_names(tmp_path):
+    store = PersistentDomainStore(str(tmp_path))
+    store.set("  Acme   Widgets  Inc ", "acmewidgets.com")
+
+    assert store.get("acme widgets inc") == "acmewidgets.com"
+    assert store.get("ACME  Widgets\tInc") == "acmewidgets.com"
+
+
+def test_disk_hit_after_memory_tiers_are_cold(tmp_path):
+    DomainCache(str(tmp_path)).set("Acme  Widgets", "acmewidgets.com")
+
+    assert DomainCache(str(tmp_path)).get(" acme widgets") == "acmewidgets.com"
+
+
+def test_store_still_reads_legacy_original_casing_files(tmp_path):
+    store = PersistentDomainStore(str(tmp_path))
+    legacy = store._get_cache_file("Acme Widgets")
+    legacy.write_text(json.dumps({"timestamp": datetime.now().isoformat(), "value": "acme.com"}))
+
+    assert store.get("Acme Widgets") == "acme.com"
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import extract_phone_number  # noqa: E402
+
+
+@pytest.mark.parametrize("text", [
+    "On 2024-01-15 10:30, John wrote:",
+    "Sent from 192.168.1.1",
+    "Order #12345678 shipped",
+    "Invoice 100 200 300",
+])
+def test_reply_text_without_phone(text):
+    assert extract_phone_number(text) == ""
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Call me at 415-555-0100", "(415) 555-0100"),
+    ("Reach me: (415) 555 0100", "(415) 555-0100"),
+    ("+1 415 555 0100 works best", "(415) 555-0100"),
+    ("On 2024-01-15 10:30, John wrote:\nMy cell is 415.555.0100", "(415) 555-0100"),
+])
+def test_reply_text_with_phone(text, expected):
+    assert extract_phone_number(text) == expected
@@ -0,0 +1,116 @@
+"""
+Email and phone extraction
+
+One compiled pattern finds emails and phone numbers together in a single
+left-to-right pass. Every quantifier is bounded and the phone branches cannot
+split a digit run more than one way, so the work per input position is
+constant and long pages scan in linear time.
+"""
+
+import re
+from typing import Dict, Iterator, List, Set, Tuple
+
+MIN_PHONE_DIGITS = 7
+MAX_PHONE_DIGITS = 15
+
+_CONTACT_PATTERN = re.compile(
+    # Email: bounded local part and domain run; the TLD is trimmed in Python
+    r"(?P<email>[A-Za-z0-9._+\-]{1,64}@[A-Za-z0-9.\-]{1,253})"
+    r"|(?P<phone>"
+    r"(?<![\w+])"                   # not glued to a word or another number
+    r"(?:\+\d{1,3}[-.\s]?)?"        # country code
+    r"(?:\(\d{1,4}\)[-.\s]?)?"      # area code in parentheses
+    r"(?:\d{1,4}(?:[-.\s]\d{1,4}){1,5}|\d{7,15})"
+    r"(?!\w))"
+)
+
+
+def _trim_domain(domain: str) -> str:
+    """Longest prefix of domain ending in ``.<2+ letters>``, or '' if none"""
+    labels = domain.split(".")
+    offsets = []
+    pos = 0
+    for label in labels:
+        offsets.append(pos)
+        pos += len(label) + 1
+
+    for i in range(len(labels) - 1, 0, -1):
+        label = labels[i]
+        letters = 0
+        while letters < len(label) and label[letters].isascii() and label[letters].isalpha():
+            letters += 1
+        if letters >= 2 and offsets[i] > 1:
+            return domain[:offsets[i] + letters]
+    return ""
+
+
+def iter_contacts(text: str) -> Iterator[Tuple[str, str]]:
+    """Yield ("email", value) and ("phone", value) pairs in document order"""
+    if not text:
+        return
+    for match in _CONTACT_PATTERN.finditer(text):
+        email = match.group("email")
+        if email is not None:
+            local, _, domain = email.partition("@")
+            domain = _trim_domain(domain)
+            if domain:
+                yield "email", f"{local}@{domain}".rstrip(".,;:")
+            continue
+
+        phone = match.group("phone").strip()
+        digits = sum(ch.isdigit() for ch in phone)
+        if MIN_PHONE_DIGITS <= digits <= MAX_PHONE_DIGITS:
+            yield "phone", phone
+
+
+def extract_contacts(text: str) -> Dict[str, List[str]]:
+    """Unique emails and phones found in text, in order of first appearance"""
+    found = {"email": {}, "phone": {}}
+    for kind, value in iter_contacts(text):
+        found[kind].setdefault(value, None)
+    return {"emails": list(found["email"]), "phones": list(found["phone"])}
+
+
+def find_emails(text: str) -> List[str]:
+    return extract_contacts(text)["emails"]
+
+
+def find_phones(text: str) -> List[str]:
+    return extract_contacts(text)["phones"]
+
+
+def extract_email_set(text: str) -> Set[str]:
+    return set(find_emails(text))
+
+
+def extract_phone_set(text: str) -> Set[str]:
+    return set(find_phones(text))
+
+
+def normalize_phone(phone: str) -> str:
+    """Strip separators; add +1 to bare 10/11-digit North American numbers"""
+    if not phone:
+        return ""
+
+    cleaned = re.sub(r'[^\d+]', '', phone)
+    if cleaned.startswith('+'):
+        return cleaned
+    if len(cleaned) == 10 and not cleaned.startswith('0'):
+        return f"+1{cleaned}"
+    if len(cleaned) == 11 and cleaned.startswith('1'):
+        return f"+{cleaned}"
+    return cleaned
+
+
+def format_phone(phone: str) -> str:
+    """Human-readable form used for reply-derived phone numbers"""
+    clean_number = re.sub(r'[^\d+]', '', phone or '')
+    if len(clean_number) < MIN_PHONE_DIGITS:
+        return ""
+    if clean_number.startswith('+1') and len(clean_number) == 12:
+        clean_number = clean_number[2:]
+    if len(clean_number) == 10:
+        return f"({clean_number[:3]}) {clean_number[3:6]}-{clean_number[6:]}"
+    if len(clean_number) == 7:
+        return f"{clean_number[:3]}-{clean_number[3:]}"
+    return clean_number
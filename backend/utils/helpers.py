@@ -2,45 +2,33 @@ import re
 import email
 from email.header import decode_header
 from datetime import datetime
-import pandas as pd
-import os
+from utils.contact_extraction import format_phone
+from utils.templating import compile_template
+from services.event_log import reply_log, sent_email_log
+
+# Strict, word-bounded formats in priority order. Reply text is full of dates,
+# times, IPs and order numbers, which the scraper's looser pattern would accept.
+REPLY_PHONE_PATTERNS = [re.compile(p) for p in (
+    r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b',                    # US: 123-456-7890
+    r'(?<!\w)\(\d{3}\)\s*\d{3}[-.\s]?\d{4}\b',                # US: (123) 456-7890
+    r'\b\d{3}[-.\s]?\d{4}[-.\s]?\d{4}\b',                    # International: 123-4567-8901
+    r'\b\+?\d{1,3}[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b',  # With country code
+    r'\b\d{10}\b',                                           # Just 10 digits
+    r'\b\d{4}[-.\s]?\d{3}[-.\s]?\d{3}\b',                    # 11 digits with formatting
+    r'\b\d{3}[-.\s]?\d{4}\b',                                 # 7 digits (local)
+)]
 
 def extract_phone_number(text):
     """Extract valid phone number from email body text"""
     if not text:
         return ""
-    
-    # More specific phone patterns with validation
-    phone_patterns = [
-        r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b',                    # US: 123-456-7890
-        r'\b\(\d{3}\)\s*\d{3}[-.\s]?\d{4}\b',                    # US: (123) 456-7890
-        r'\b\d{3}[-.\s]?\d{4}[-.\s]?\d{4}\b',                    # International: 123-4567-8901
-        r'\b\+?\d{1,3}[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b',  # With country code
-        r'\b\d{10}\b',                                           # Just 10 digits
-        r'\b\d{4}[-.\s]?\d{3}[-.\s]?\d{3}\b',                    # 11 digits with formatting
-        r'\b\d{3}[-.\s]?\d{4}\b'                                 # 7 digits (local)
-    ]
-    
-    for pattern in phone_patterns:
-        matches = re.findall(pattern, text)
-        for match in matches:
-            # Clean the phone number
-            clean_number = re.sub(r'[^\d+]', '', match)
-            
-            # Validate phone number length and format
-            if len(clean_number) >= 7:  # Minimum valid phone number length
-                # Remove country code if it's just +1 (US) for simplicity
-                if clean_number.startswith('+1') and len(clean_number) == 12:
-                    clean_number = clean_number[2:]  # Remove +1
-                
-                # Format the number nicely
-                if len(clean_number) == 10:
-                    return f"({clean_number[:3]}) {clean_number[3:6]}-{clean_number[6:]}"
-                elif len(clean_number) == 7:
-                    return f"{clean_number[:3]}-{clean_number[3:]}"
-                else:
-                    return clean_number
-    
+
+    for pattern in REPLY_PHONE_PATTERNS:
+        for match in pattern.findall(text):
+            formatted = format_phone(match)
+            if formatted:
+                return formatted
+
     return ""
 
 def is_valid_phone_number(phone):
@@ -138,6 +126,29 @@ def extract_company_from_email(email_address):
     
     return "Unknown Company"
 
+def placeholder_values(name, position="", company="", phone="", sender_name="", sender_email="", sender_phone=""):
+    """Field values for utils.templating; sender details fall back to app_state"""
+    if not (sender_name and sender_email and sender_phone):
+        try:
+            from config import app_state
+            sender_name = sender_name or app_state.email_content.get("sender_name", "")
+            sender_email = sender_email or app_state.email_content.get("sender_email", "")
+            sender_phone = sender_phone or app_state.email_content.get("phone_number", "")
+        except Exception:
+            pass
+
+    sender_phone = sender_phone or ""
+    return {
+        "name": name or "",
+        "position": position or "",
+        "company": company or "",
+        "phone": phone or "",
+        "sender_name": sender_name or "",
+        "sender_email": sender_email or "",
+        "sender_phone": sender_phone,
+        "phone_number": sender_phone,
+    }
+
 def replace_placeholders(text, name, position="", company="", phone="", sender_name="", sender_email="", sender_phone=""):
     """
     Replace placeholders in text with actual values.
@@ -146,119 +157,21 @@ def replace_placeholders(text, name, position="", company="", phone="", sender_n
     if not text:
         return ""
 
-    # Handle name placeholders
-    name_placeholder_map = {
-        "{{name}}": name,
-        "{name}": name,
-        "[Name]": name,
-        "[Candidate Name]": name,
-        "[Client Name]": name,
-        "[name]": name,
-        "[client name]": name
-    }
-    for placeholder, value in name_placeholder_map.items():
-        text = text.replace(placeholder, value)
-
-    # Handle position placeholders
-    position_placeholder_map = {
-        "{{position}}": position,
-        "{position}": position,
-        "[Position]": position,
-        "[position]": position,
-        "[Job Title]": position,
-        "[job title]": position,
-        "[Role]": position,
-        "[role]": position
-    }
-    for placeholder, value in position_placeholder_map.items():
-        text = text.replace(placeholder, value)
-
-    # Handle company placeholders
-    company_placeholder_map = {
-        "{{company}}": company,
-        "{company}": company,
-        "[Company]": company,
-        "[company]": company,
-        "[Organization]": company,
-        "[organization]": company,
-        "[Business]": company,
-        "[business]": company
-    }
-    for placeholder, value in company_placeholder_map.items():
-        text = text.replace(placeholder, value)
-
-    # Handle recipient phone placeholders
-    phone_placeholder_map = {
-        "{{phone}}": phone,
-        "{phone}": phone,
-        "[Phone]": phone,
-        "[phone]": phone,
-        "[Mobile]": phone,
-        "[mobile]": phone
-    }
-    for placeholder, value in phone_placeholder_map.items():
-        text = text.replace(placeholder, value)
-
-    # Dynamic catch-all for names like [something name]
-    text = re.sub(r"\[(.*?name.*?)\]", name, text, flags=re.IGNORECASE)
-    # Dynamic catch-all for positions like [something position] or [something title]
-    text = re.sub(r"\[(.*?position.*?)\]", position, text, flags=re.IGNORECASE)
-    text = re.sub(r"\[(.*?title.*?)\]", position, text, flags=re.IGNORECASE)
-
-    # Add Sender Details
-    if sender_name:
-        text = text.replace("{{sender_name}}", sender_name)
-    if sender_email:
-        text = text.replace("{{sender_email}}", sender_email)
-    if sender_phone:
-        text = text.replace("{{sender_phone}}", sender_phone)
-        text = text.replace("{{phone_number}}", sender_phone)
-
-    # Fallback to app_state for sender info if not provided
-    try:
-        from config import app_state
-        if not sender_name:
-            sender_name = app_state.email_content.get("sender_name", "")
-            text = text.replace("{{sender_name}}", sender_name)
-        if not sender_email:
-            sender_email = app_state.email_content.get("sender_email", "")
-            text = text.replace("{{sender_email}}", sender_email)
-            text = text.replace("[Sender Email]", sender_email)
-        if not sender_phone:
-            sender_phone = app_state.email_content.get("phone_number", "")
-            text = text.replace("{{sender_phone}}", sender_phone)
-            text = text.replace("[Sender Phone]", sender_phone)
-            text = text.replace("{{phone_number}}", sender_phone)
-            text = text.replace("[Phone Number]", sender_phone)
-    except Exception:
-        pass
-
-    return text
+    values = placeholder_values(name, position, company, phone, sender_name, sender_email, sender_phone)
+    return compile_template(text).render(values)
 
 def replace_name_placeholders(text, name):
     """Fallback for backward compatibility"""
     return replace_placeholders(text, name, "")
 
-def save_to_excel(data):
-    """Save reply data to Excel file with comprehensive lead information"""
-    filename = "email_replies.xlsx"
-    
+def save_to_excel(data, user_id=None):
+    """Record a captured reply in the reply event log (exported to Excel on download)"""
     try:
-        if os.path.exists(filename):
-            df = pd.read_excel(filename)
-        else:
-            df = pd.DataFrame(columns=[
-                "timestamp", "sender_email", "recipient_email", 
-                "subject", "body", "first_name", "last_name",
-                "company", "phone", "converted_to_lead", "zoho_lead_id"
-            ])
-        
-        new_row = pd.DataFrame([data])
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_excel(filename, index=False)
-        return True
+        if user_id is not None:
+            data = {**data, "user_id": user_id}
+        return reply_log.append(data)
     except Exception as e:
-        print(f"Error saving to Excel: {e}")
+        print(f"Error logging reply: {e}")
         return False
 
 def is_auto_response(email_data):
@@ -286,26 +199,14 @@ def is_auto_response(email_data):
         
     return False
 
-def save_sent_email(data):
-    """Save sent email data to a separate Excel file"""
-    filename = "sent_emails.xlsx"
-    
+def save_sent_email(data, user_id=None):
+    """Record a sent email in the sent-email event log (buffered append)"""
     try:
-        if os.path.exists(filename):
-            df = pd.read_excel(filename)
-        else:
-            df = pd.DataFrame(columns=[
-                "timestamp", "sender_email", "recipient_email", 
-                "subject", "body", "first_name", "last_name",
-                "company", "phone"
-            ])
-        
-        new_row = pd.DataFrame([data])
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_excel(filename, index=False)
-        return True
+        if user_id is not None:
+            data = {**data, "user_id": user_id}
+        return sent_email_log.append(data)
     except Exception as e:
-        print(f"Error saving sent email to Excel: {e}")
+        print(f"Error logging sent email: {e}")
         return False
     
     # Add to helpers.py
@@ -0,0 +1,213 @@
+"""
+Incremental post-processing for streamed Gemini output
+
+Streaming endpoints forward text as Gemini produces it, so the cleanup the
+blocking endpoints run on the full reply has to work on partial chunks:
+
+- MarkdownStreamCleaner strips headers, list/quote prefixes and inline
+  emphasis markers, holding back only the few characters that could still be
+  half of a marker.
+- JsonFieldStream pulls the values of selected string fields (e.g. "subject",
+  "body") out of a JSON reply while it is still being written.
+
+``stream_generation`` turns a streamed LLM call into Server-Sent Events:
+``start``, then ``delta`` events, then one ``done`` event carrying the same
+payload the blocking endpoint returns (or ``error``).
+"""
+
+import json
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import Response, stream_with_context
+
+_LINE_PREFIX = re.compile(r'[ \t]*(?:#+[ \t]*|>[ \t]*|[-*•][ \t]+|\d+\.[ \t]+)?')
+_PREFIX_CHARS = set(" \t#>-*•0123456789.")
+_INLINE_MARKERS = re.compile(r'\*+|__|~~|`+')
+_HELD_BACK = "*_~`"
+_FIELD_START = re.compile(r'"([A-Za-z_]+)"\s*:\s*"')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class MarkdownStreamCleaner:
+    """Markdown stripping that can be fed one chunk at a time"""
+
+    def __init__(self):
+        self._pending = ""
+        self._line_start = True
+
+    def feed(self, text: str) -> str:
+        self._pending += text
+        out = []
+        while self._pending:
+            if self._line_start:
+                # A line prefix ("## ", "- ", "12. ") is only known once a non-prefix character arrives
+                if all(ch in _PREFIX_CHARS for ch in self._pending):
+                    break
+                self._pending = self._pending[_LINE_PREFIX.match(self._pending).end():]
+                self._line_start = False
+                continue
+
+            newline = self._pending.find("\n")
+            if newline == -1:
+                ready = self._pending.rstrip(_HELD_BACK)
+                self._pending = self._pending[len(ready):]
+                out.append(_INLINE_MARKERS.sub("", ready))
+                break
+
+            out.append(_INLINE_MARKERS.sub("", self._pending[:newline + 1]))
+            self._pending = self._pending[newline + 1:]
+            self._line_start = True
+        return "".join(out)
+
+    def flush(self) -> str:
+        rest, self._pending = self._pending, ""
+        if self._line_start:
+            rest = rest[_LINE_PREFIX.match(rest).end():]
+        return _INLINE_MARKERS.sub("", rest)
+
+
+class JsonFieldStream:
+    """Yield decoded text of chosen top-level string fields from a JSON reply as it streams in"""
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = set(fields)
+        self._buffer = ""
+        self._field: Optional[str] = None
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        self._buffer += text
+        deltas = []
+        while self._buffer:
+            if self._field is None:
+                match = _FIELD_START.search(self._buffer)
+                if not match:
+                    # Keep enough of the tail to complete a key split across chunks
+                    self._buffer = self._buffer[-64:]
+                    break
+                self._buffer = self._buffer[match.end():]
+                if match.group(1) in self.fields:
+                    self._field = match.group(1)
+                else:
+                    self._skip_string()
+                continue
+
+            value, closed = self._read_string()
+            if value:
+                deltas.append((self._field, value))
+            if not closed:
+                break
+            self._field = None
+        return deltas
+
+    def _read_string(self) -> Tuple[str, bool]:
+        """Decode buffered string content up to the closing quote or an incomplete escape"""
+        out = []
+        i = 0
+        buffer = self._buffer
+        while i < len(buffer):
+            ch = buffer[i]
+            if ch == '"':
+                self._buffer = buffer[i + 1:]
+                return "".join(out), True
+            if ch != '\\':
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(buffer):
+                break
+            code = buffer[i + 1]
+            if code == 'u':
+                if i + 6 > len(buffer):
+                    break
+                try:
+                    out.append(chr(int(buffer[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                out.append(_ESCAPES.get(code, code))
+                i += 2
+        self._buffer = buffer[i:]
+        return "".join(out), False
+
+    def _skip_string(self):
+        # Unwanted field: drop its value; if it is not complete yet, it is re-scanned from the key
+        i = 0
+        while i < len(self._buffer):
+            if self._buffer[i] == '\\':
+                i += 2
+                continue
+            if self._buffer[i] == '"':
+                self._buffer = self._buffer[i + 1:]
+                return
+            i += 1
+        self._buffer = ""
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text or ""
+    except ValueError:
+        # Chunks without text parts (e.g. a final safety/finish chunk)
+        return ""
+
+
+def stream_generation(start: Callable, finalize: Callable[[str, object], Dict],
+                      fields: Optional[Iterable[str]] = None,
+                      fallback: Optional[Callable[[Exception], Dict]] = None) -> Iterator[str]:
+    """SSE events for one streamed generation
+
+    ``start()`` makes the gateway call with stream=True. ``fields`` selects JSON
+    string fields to stream; without it the text is streamed through the
+    markdown cleaner. ``finalize(full_text, response)`` builds the ``done``
+    payload. ``fallback(error)`` supplies a ``done`` payload if the call cannot
+    start at all.
+    """
+    try:
+        response = start()
+    except Exception as e:
+        print(f"⚠️ Streaming generation could not start: {e}")
+        if fallback:
+            yield sse("done", fallback(e))
+        else:
+            yield sse("error", {"error": str(e)})
+        return
+
+    yield sse("start", {"model": response.model})
+    extractor = JsonFieldStream(fields) if fields else None
+    cleaner = None if fields else MarkdownStreamCleaner()
+    parts = []
+    try:
+        for chunk in response.raw:
+            text = _chunk_text(chunk)
+            if not text:
+                continue
+            parts.append(text)
+            if extractor:
+                for field, delta in extractor.feed(text):
+                    yield sse("delta", {"field": field, "text": delta})
+            else:
+                delta = cleaner.feed(text)
+                if delta:
+                    yield sse("delta", {"field": "text", "text": delta})
+        if cleaner:
+            tail = cleaner.flush()
+            if tail:
+                yield sse("delta", {"field": "text", "text": tail})
+        yield sse("done", finalize("".join(parts), response))
+    except Exception as e:
+        print(f"❌ Streaming generation failed: {e}")
+        yield sse("error", {"error": str(e)})
+
+
+def event_stream_response(events: Iterator[str]) -> Response:
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,123 @@
+"""
+Compiled email templates
+
+A subject or body is parsed once into literal text and placeholder slots, so
+personalising it for a recipient is a single join instead of dozens of
+``str.replace``/``re.sub`` passes. Supported placeholder syntaxes:
+
+- ``{{key}}`` (spaces allowed, case-insensitive, spaces in the key become _)
+- ``{name}``, ``{position}``, ``{company}``, ``{phone}``
+- bracketed aliases such as ``[Client Name]``, ``[Job Title]``, ``[Organization]``
+- any other ``[... name ...]`` / ``[... position ...]`` / ``[... title ...]``
+- sender-side brackets such as ``[Your Name]`` / ``[Sender Name]`` (sender_name)
+
+Templates compiled with ``aliases=False`` only substitute ``{{key}}``; the
+single-brace and bracket forms are for the legacy replace_placeholders path.
+
+A placeholder whose field has no value is left in the output unchanged.
+Compiled templates are cached, so repeated calls with the same campaign text
+only parse it once.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Mapping, Optional, Tuple
+
+TEMPLATE_CACHE_SIZE = 256
+
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(.*?)\s*\}\}|\{(\w+)\}|\[([^\[\]\n]+)\]")
+
+SINGLE_BRACE_FIELDS = {"name", "position", "company", "phone"}
+
+BRACKET_FIELDS = {
+    "[Name]": "name",
+    "[name]": "name",
+    "[Candidate Name]": "name",
+    "[Client Name]": "name",
+    "[client name]": "name",
+    "[Position]": "position",
+    "[position]": "position",
+    "[Job Title]": "position",
+    "[job title]": "position",
+    "[Role]": "position",
+    "[role]": "position",
+    "[Company]": "company",
+    "[company]": "company",
+    "[Organization]": "company",
+    "[organization]": "company",
+    "[Business]": "company",
+    "[business]": "company",
+    "[Phone]": "phone",
+    "[phone]": "phone",
+    "[Mobile]": "phone",
+    "[mobile]": "phone",
+    "[Sender Email]": "sender_email",
+    "[Sender Phone]": "sender_phone",
+    "[Phone Number]": "phone_number",
+    # Signature placeholders belong to the sender, never the recipient
+    "[Your Name]": "sender_name",
+    "[your name]": "sender_name",
+    "[Sender Name]": "sender_name",
+    "[sender name]": "sender_name",
+    "[My Name]": "sender_name",
+    "[my name]": "sender_name",
+}
+
+
+def _bracket_field(placeholder: str, inner: str) -> Optional[str]:
+    field = BRACKET_FIELDS.get(placeholder)
+    if field:
+        return field
+    inner = inner.lower()
+    if "name" in inner:
+        return "name"
+    if "position" in inner or "title" in inner:
+        return "position"
+    return None
+
+
+class CompiledTemplate:
+    """Template text split into literal parts and (index, field, original) slots"""
+
+    __slots__ = ("source", "fields", "_parts", "_slots")
+
+    def __init__(self, source: str, aliases: bool = True):
+        self.source = source
+        parts: List[Optional[str]] = []
+        slots: List[Tuple[int, str, str]] = []
+        position = 0
+        for match in _PLACEHOLDER_PATTERN.finditer(source):
+            double, single, bracket = match.groups()
+            if double is not None:
+                field = double.lower().replace(" ", "_")
+            elif not aliases:
+                continue
+            elif single is not None:
+                field = single if single in SINGLE_BRACE_FIELDS else None
+            else:
+                field = _bracket_field(match.group(0), bracket)
+            if not field:
+                continue
+            parts.append(source[position:match.start()])
+            slots.append((len(parts), field, match.group(0)))
+            parts.append(None)
+            position = match.end()
+        parts.append(source[position:])
+
+        self._parts = parts
+        self._slots = slots
+        self.fields = {field for _, field, _ in slots}
+
+    def render(self, values: Mapping[str, str]) -> str:
+        if not self._slots:
+            return self.source
+        parts = list(self._parts)
+        for index, field, original in self._slots:
+            value = values.get(field)
+            parts[index] = original if value is None else value
+        return "".join(parts)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(text: str, aliases: bool = True) -> CompiledTemplate:
+    return CompiledTemplate(text or "", aliases)